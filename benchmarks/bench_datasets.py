@@ -0,0 +1,150 @@
+"""
+Synthetic datasets for the benchmark harness.
+
+Each writer produces a file with the same schema the agents expect and streams it
+to disk in chunks, so 10^7-row datasets can be generated without holding them in memory.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from fpdf import FPDF
+
+CHUNK_ROWS = 500_000
+
+GENERATORS_DIR = Path(__file__).resolve().parent.parent / "src_code" / "data_generation_scripts"
+if str(GENERATORS_DIR) not in sys.path:
+    sys.path.insert(0, str(GENERATORS_DIR))
+from batch_writer import write_batches  # noqa: E402
+from feedback_generator import generate_feedback_batches  # noqa: E402
+from performance_generator import generate_performance_batches  # noqa: E402
+from synthetic_catalog import format_ids  # noqa: E402
+
+JOB_TITLES = np.array([
+    "machine learning engineer", "data scientist", "ai research scientist", "nlp engineer",
+    "computer vision engineer", "data engineer", "ml ops engineer", "ai product manager",
+    "deep learning engineer", "data analyst",
+])
+SKILLS = np.array([
+    "python", "sql", "tensorflow", "kubernetes", "scala", "pytorch", "linux", "git", "java", "gcp",
+    "hadoop", "tableau", "r", "computer vision", "data visualization", "deep learning", "mlops",
+    "spark", "nlp", "azure", "aws", "mathematics", "docker", "statistics",
+])
+EXPERIENCE = np.array(["En", "Mi", "Se", "Ex"])
+INDUSTRIES = np.array([
+    "Automotive", "Media", "Education", "Consulting", "Healthcare", "Gaming", "Government",
+    "Telecommunications", "Manufacturing", "Energy", "Technology", "Real Estate", "Finance",
+    "Transportation", "Retail",
+])
+RAW_EXPERIENCE = np.array(["EN", "MI", "SE", "EX"])
+COUNTRIES = np.array([
+    "United States", "Canada", "United Kingdom", "Germany", "France", "India", "China", "Japan",
+    "Singapore", "Australia", "Netherlands", "Sweden", "Switzerland", "Ireland", "Israel",
+])
+SALARY_BINS = [0, 50000, 100000, 150000, 200000, 500000]
+SALARY_LABELS = ["<50K", "50–100K", "100–150K", "150–200K", "200K+"]
+
+
+def _skill_lists(rng: np.random.Generator, size: int, vocab: np.ndarray, per_row: int = 5) -> pa.Array:
+    """Comma-joined lists of ``per_row`` distinct skills, built with Arrow string kernels."""
+    # argsort of random keys is a vectorized sample without replacement.
+    picks = np.argsort(rng.random((size, len(vocab))), axis=1)[:, :per_row]
+    columns = [pa.array(vocab[picks[:, j]]) for j in range(per_row)]
+    return pc.binary_join_element_wise(*columns, ", ")
+
+
+def _write_chunked(path: Path, n_rows: int, make_chunk, seed: int) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_rows, CHUNK_ROWS):
+        size = min(CHUNK_ROWS, n_rows - start)
+        chunk = make_chunk(rng, start, size)
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    return path
+
+
+def write_feedback_csv(path: Path, n_rows: int, course: str = "Machine Learning", seed: int = 7) -> Path:
+    """Numeric feedback export in the format produced by ``transform_feedback_data``."""
+    write_batches(generate_feedback_batches(n_rows, courses=[course], batch_size=CHUNK_ROWS, seed=seed, numeric=True), path)
+    return Path(path)
+
+
+def write_performance_csv(path: Path, n_rows: int, course: str = "Machine Learning", seed: int = 11) -> Path:
+    """Performance export matching ``data/machine_learning_performance.csv``."""
+    write_batches(generate_performance_batches(n_rows, courses=[course], batch_size=CHUNK_ROWS, seed=seed), path)
+    return Path(path)
+
+
+def write_job_trends_csv(path: Path, n_rows: int, seed: int = 13) -> Path:
+    """Job postings in the transformed schema consumed by the trend agent."""
+    first_day = np.datetime64("2024-01-01")
+
+    def make_chunk(rng, start, size):
+        salary = np.round(rng.lognormal(11.6, 0.4, size), 0).clip(20000, 480000)
+        return pd.DataFrame({
+            "job_title": JOB_TITLES[rng.integers(0, len(JOB_TITLES), size)],
+            "required_skills": pd.Series(_skill_lists(rng, size, SKILLS), dtype=pd.ArrowDtype(pa.string())),
+            "salary_usd": salary,
+            "experience_level": EXPERIENCE[rng.integers(0, len(EXPERIENCE), size)],
+            "industry": INDUSTRIES[rng.integers(0, len(INDUSTRIES), size)],
+            "salary_bucket": pd.cut(salary, bins=SALARY_BINS, labels=SALARY_LABELS),
+            "posting_date": (first_day + rng.integers(0, 540, size).astype("timedelta64[D]")).astype(str),
+            "remote_ratio": rng.choice([0, 50, 100], size),
+            "years_experience": rng.integers(0, 20, size),
+            "company_location": COUNTRIES[rng.integers(0, len(COUNTRIES), size)],
+        })
+
+    return _write_chunked(Path(path), n_rows, make_chunk, seed)
+
+
+def write_raw_job_postings_csv(path: Path, n_rows: int, seed: int = 19) -> Path:
+    """Raw postings in the ``ai_job_market_2024_2025.csv`` schema, input to ``transform_job_trend_data``."""
+    raw_titles = np.char.title(JOB_TITLES)
+    raw_skills = np.char.title(SKILLS)
+    first_day = np.datetime64("2024-01-01")
+
+    def make_chunk(rng, start, size):
+        years = rng.integers(0, 20, size)
+        return pd.DataFrame({
+            "job_id": format_ids("AI", np.arange(start + 1, start + size + 1), 8),
+            "job_title": raw_titles[rng.integers(0, len(raw_titles), size)],
+            "salary_usd": np.round(rng.lognormal(11.6, 0.4, size), 0).astype(np.int64),
+            "salary_currency": "USD",
+            "experience_level": RAW_EXPERIENCE[np.minimum(years // 5, 3)],
+            "company_location": COUNTRIES[rng.integers(0, len(COUNTRIES), size)],
+            "remote_ratio": rng.choice([0, 50, 100], size),
+            "required_skills": pd.Series(_skill_lists(rng, size, raw_skills), dtype=pd.ArrowDtype(pa.string())),
+            "years_experience": years,
+            "industry": INDUSTRIES[rng.integers(0, len(INDUSTRIES), size)],
+            "posting_date": first_day + rng.integers(0, 540, size).astype("timedelta64[D]"),
+        })
+
+    return _write_chunked(Path(path), n_rows, make_chunk, seed)
+
+
+def write_curriculum_pdf(path: Path, n_pages: int, course: str = "Machine Learning", seed: int = 17) -> Path:
+    """Multi-page syllabus PDF with one topic per page, readable by ``PyPDFLoader``."""
+    rng = np.random.default_rng(seed)
+    topics = np.concatenate([SKILLS, JOB_TITLES])
+    pdf = FPDF()
+    pdf.set_font("Arial", size=11)
+    for page in range(1, n_pages + 1):
+        pdf.add_page()
+        topic = topics[(page - 1) % len(topics)]
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, f"{course} - Week {page}: {topic.title()}", ln=True)
+        pdf.set_font("Arial", size=11)
+        related = ", ".join(rng.choice(SKILLS, size=6, replace=False))
+        body = (
+            f"This unit covers {topic} and its role in modern {course.lower()} practice. "
+            f"Students work through lectures, readings and a lab exercise using {related}. "
+            f"Assessment consists of a short quiz and a practical assignment on {topic}. "
+        ) * 4
+        pdf.multi_cell(0, 6, body)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pdf.output(str(path))
+    return path
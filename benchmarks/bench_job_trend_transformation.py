@@ -0,0 +1,61 @@
+"""
+Throughput benchmark for the chunked job-trend transformation.
+
+Runs ``transform_job_trend_data`` on the bundled 15k-row postings export and on a
+synthetic raw export (10M rows by default) and reports rows/s and peak memory.
+
+Usage:
+    python benchmarks/bench_job_trend_transformation.py
+    python benchmarks/bench_job_trend_transformation.py --rows 1000000 --chunksize 500000
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(REPO_ROOT / "src_code" / "data_transformation_scripts"))
+
+from bench_datasets import write_raw_job_postings_csv  # noqa: E402
+from job_trend_transformation import transform_job_trend_data  # noqa: E402
+from run_benchmarks import Stage, measure, print_table  # noqa: E402
+
+BUNDLED_CSV = REPO_ROOT / "data" / "ai_job_market_2024_2025.csv"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark transform_job_trend_data throughput.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows in the synthetic raw export.")
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="acis_jobs_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    synthetic_csv = write_raw_job_postings_csv(workdir / f"raw_jobs_{args.rows}.csv", args.rows)
+
+    stages = []
+    for name, source, rows in [
+        ("job_transform@bundled", BUNDLED_CSV, 15_000),
+        (f"job_transform@{args.rows}", synthetic_csv, args.rows),
+    ]:
+        out = workdir / f"{Path(source).stem}_transformed.csv"
+        stages.append(Stage(name, rows, lambda s=source, o=out: transform_job_trend_data(
+            str(s), str(o), chunksize=args.chunksize)))
+
+    results = {"stages": {}}
+    for stage in stages:
+        stats, totals = measure(stage, args.repeats)
+        stats["duplicate_skills_removed"] = totals["duplicate_skills_removed"]
+        results["stages"][stage.name] = stats
+
+    print()
+    print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
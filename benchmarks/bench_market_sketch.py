@@ -0,0 +1,78 @@
+"""
+Streaming sketch versus exact aggregation of a job-postings CSV.
+
+For each worker count, builds the per-title market sketch of the file in one
+pass and reports build time, sketch size on disk, the latency of a per-course
+query and the error of p10/p50/p90 salary and top-10 skills of the whole
+market against an exact pandas computation.
+
+Usage:
+    python benchmarks/bench_market_sketch.py
+    python benchmarks/bench_market_sketch.py --rows 5000000 --workers 1 2 4 8
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "src_code" / "agents"))
+sys.path.insert(0, str(BENCH_DIR))
+
+import market_sketch  # noqa: E402
+from bench_datasets import write_job_trends_csv  # noqa: E402
+
+
+def exact_summary(path: Path) -> tuple[pd.Series, list[str], int]:
+    df = pd.read_csv(path)
+    skills = df["required_skills"].str.lower().str.split(",").explode().str.strip()
+    quantiles = df["salary_usd"].quantile([0.1, 0.5, 0.9])
+    return quantiles, skills.value_counts().head(10).index.tolist(), df["job_title"].str.strip().str.lower().nunique()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark streaming market sketches against exact aggregation.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--course", default="machine learning")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="acis_sketch_"))
+    source = write_job_trends_csv(workdir / f"postings_{args.rows}.csv", args.rows)
+    keywords = args.course.lower().split()
+
+    start = time.perf_counter()
+    quantiles, top_skills, titles = exact_summary(source)
+    exact_s = time.perf_counter() - start
+    print(f"{args.rows} postings ({source.stat().st_size / 2 ** 20:.0f} MB), {titles} titles; "
+          f"exact pandas pass {exact_s:.2f}s")
+
+    print(f"\n{'workers':>8} {'build_s':>8} {'sketch_KB':>9} {'query_ms':>8} "
+          f"{'p10_err':>8} {'p50_err':>8} {'p90_err':>8} {'top10':>6}")
+    for workers in args.workers:
+        root = workdir / f"sketches_{workers}"
+        start = time.perf_counter()
+        sketch = market_sketch.get_market_sketch(source, root, workers)
+        build_s = time.perf_counter() - start
+        size_kb = sum(f.stat().st_size for f in market_sketch.sketch_path(source, root).glob("*.parquet")) / 1024
+        start = time.perf_counter()
+        sketch.summarize(sketch.profile_weights(keywords))
+        query_ms = (time.perf_counter() - start) * 1000
+        summary = sketch.summarize()
+        errors = [abs(summary.salary_quantiles[k] / quantiles[q] - 1) * 100
+                  for k, q in (("p10", 0.1), ("p50", 0.5), ("p90", 0.9))]
+        overlap = len(set(summary.top_skills) & set(top_skills))
+        print(f"{workers:>8} {build_s:>8.2f} {size_kb:>9.1f} {query_ms:>8.1f} " + " ".join(f"{e:>7.2f}%" for e in errors)
+              + f" {overlap:>4}/10")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Scaling benchmark for batch report rendering on the process pool.
+
+Renders the same batch of course reports (300 by default) with 1, 2, 4 …
+cpu_count workers and reports wall time and speedup over a single worker.
+
+Usage:
+    python benchmarks/bench_report_batch.py
+    python benchmarks/bench_report_batch.py --courses 300 --pages 10 --archive
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(REPO_ROOT / "src_code" / "agents"))
+
+from bench_report_rendering import build_sections  # noqa: E402
+
+import report_mcp_server as report  # noqa: E402
+
+
+def worker_counts(max_workers: int) -> list[int]:
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+
+def run_batch(bundles: list[dict], output_dir: Path, workers: int, archive: bool) -> dict:
+    # Swap in a pool of the requested size; the tool picks it up through get_process_pool()
+    if report._process_pool is not None:
+        report._process_pool.shutdown()
+    report.BATCH_WORKERS = workers
+    report._process_pool = None
+    shutil.rmtree(output_dir, ignore_errors=True)
+    # Start the workers (and import the agent in each) before timing
+    list(report.get_process_pool().map(report.report_filename, range(workers), ["warmup"] * workers))
+    return asyncio.run(report.generate_reports_batch(bundles, str(output_dir), archive=archive))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark batch report rendering across worker counts.")
+    parser.add_argument("--courses", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=5, help="Approximate pages per report.")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--archive", action="store_true", help="Write a zip instead of a directory.")
+    args = parser.parse_args(argv)
+
+    sections, pages = build_sections(args.pages)
+    bundles = [{"course_name": f"Course {i:03d}", **sections} for i in range(args.courses)]
+    workdir = Path(tempfile.mkdtemp(prefix="acis_batch_"))
+    print(f"Rendering {args.courses} reports of {pages} pages each")
+
+    baseline = None
+    print(f"\n{'workers':>8} {'wall_s':>9} {'cpu_s':>9} {'reports/s':>10} {'speedup':>8}")
+    for workers in worker_counts(args.max_workers):
+        result = run_batch(bundles, workdir / f"batch_{workers}", workers, args.archive)
+        if "error" in result or result["failed"]:
+            print(f"❌ Batch with {workers} workers failed: {result.get('error') or result['failed'][:3]}")
+            return 1
+        wall = result["wall_seconds"]
+        baseline = baseline or wall
+        print(f"{workers:>8} {wall:>9.2f} {result['cpu_seconds']:>9.2f} "
+              f"{args.courses / wall:>10.1f} {baseline / wall:>7.2f}x")
+
+    if isinstance(report._process_pool, ProcessPoolExecutor):
+        report._process_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Rendering benchmark for the report agent on large (~100-page) reports.
+
+Compares a cold render (empty section cache), a warm render (all sections cached)
+and the streaming file output against the in-memory base64 path.
+
+Usage:
+    python benchmarks/bench_report_rendering.py
+    python benchmarks/bench_report_rendering.py --pages 300 --repeats 3
+"""
+import argparse
+import asyncio
+import base64
+import sys
+import tempfile
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(BENCH_DIR))
+sys.path.insert(0, str(REPO_ROOT / "src_code" / "agents"))
+
+from run_benchmarks import Stage, measure, print_table  # noqa: E402
+
+import report_mcp_server as report  # noqa: E402
+
+SAMPLE_SECTIONS = {
+    "feedback_summary": REPO_ROOT / "results" / "feedback_out.csv",
+    "performance_summary": REPO_ROOT / "results" / "perf_out.csv",
+    "trend_summary": REPO_ROOT / "results" / "trends_out.csv",
+    "recommendations": REPO_ROOT / "results" / "recommendations.txt",
+}
+
+
+def build_sections(target_pages: int) -> dict:
+    """Repeat the bundled agent outputs until the rendered report reaches ``target_pages``."""
+    samples = {key: path.read_text(encoding="utf-8") for key, path in SAMPLE_SECTIONS.items()}
+    repeats = 1
+    while True:
+        sections = {
+            key: "\n\n".join(f"## Part {i + 1}\n{text}" for i in range(repeats))
+            for key, text in samples.items()
+        }
+        pages = report.build_pdf("Machine Learning", **sections).page_no()
+        if pages >= target_pages:
+            return sections, pages
+        repeats = max(repeats + 1, int(repeats * target_pages / pages))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark report PDF rendering.")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    sections, pages = build_sections(args.pages)
+    out_path = Path(tempfile.mkdtemp(prefix="acis_report_")) / "report.pdf"
+    print(f"Rendering a {pages}-page report")
+
+    def in_memory():
+        data = base64.b64encode(report.create_pdf_in_memory("Machine Learning", **sections)).decode("utf-8")
+        return {"pdf_data": data}
+
+    def to_file():
+        return asyncio.run(report.generate_report("Machine Learning", output_path=str(out_path), **sections))
+
+    stages = [
+        Stage(f"report_cold_base64@{pages}p", pages, in_memory, setup=report.section_cache.clear),
+        Stage(f"report_warm_base64@{pages}p", pages, in_memory),
+        Stage(f"report_warm_file@{pages}p", pages, to_file),
+    ]
+    results = {"stages": {}}
+    for stage in stages:
+        results["stages"][stage.name], _ = measure(stage, args.repeats)
+
+    print()
+    print_table(results)
+    print(f"\nSection cache: {report.section_cache.hits} hits, {report.section_cache.misses} misses")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Recall-versus-latency benchmark for the FAISS index tiers.
+
+Builds flat, IVF and IVF-PQ indexes over clustered synthetic embeddings, then
+for a range of nprobe values reports recall@k against exact search, per-query
+latency, build time, file size and memory-mapped load time.
+
+Usage:
+    python benchmarks/bench_vector_index.py
+    python benchmarks/bench_vector_index.py --sizes 100000 1000000 --dim 384
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "src_code" / "agents"))
+
+from vector_index import build_index  # noqa: E402
+
+
+def clustered_vectors(n: int, dim: int, n_topics: int = 200, seed: int = 0) -> np.ndarray:
+    """Embedding-like data: unit vectors scattered around ``n_topics`` topic directions."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    x = topics[rng.integers(0, n_topics, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index tiers (recall vs latency).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 200_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="acis_faiss_"))
+    print(f"{'n':>9} {'index':>6} {'nprobe':>6} {f'recall@{args.k}':>9} {'ms/query':>9} "
+          f"{'build_s':>8} {'size_MB':>8} {'load_ms':>8}")
+
+    for n in args.sizes:
+        data = clustered_vectors(n + args.queries, args.dim)
+        vectors, queries = data[:n], data[n:]
+
+        for kind in ("flat", "ivf", "ivfpq"):
+            start = time.perf_counter()
+            index = build_index(vectors, kind)
+            build_s = time.perf_counter() - start
+
+            path = workdir / f"{kind}_{n}.faiss"
+            faiss.write_index(index, str(path))
+            start = time.perf_counter()
+            index = faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            load_ms = (time.perf_counter() - start) * 1000
+            size_mb = path.stat().st_size / 2 ** 20
+
+            if kind == "flat":
+                _, truth = index.search(queries, args.k)
+
+            for nprobe in ([None] if kind == "flat" else args.nprobe):
+                if nprobe is not None:
+                    faiss.extract_index_ivf(index).nprobe = nprobe
+                start = time.perf_counter()
+                _, found = index.search(queries, args.k)
+                ms = (time.perf_counter() - start) * 1000 / len(queries)
+                print(f"{n:>9} {kind:>6} {nprobe or '-':>6} {recall_at_k(found, truth):>9.3f} {ms:>9.3f} "
+                      f"{build_s:>8.2f} {size_mb:>8.1f} {load_ms:>8.1f}")
+            path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Deterministic local stand-ins for the remote models used by the agents.
+
+The benchmark harness patches these into the agent modules so every tool can run
+in-process without network access, API keys or model downloads.
+"""
+import hashlib
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+
+class FakeChatModel:
+    """Drop-in replacement for ``ChatGoogleGenerativeAI`` returning canned analyses."""
+
+    # Shared across instances: agents build a new client on every call.
+    calls: list[dict] = []
+    latency_s: float = 0.0
+
+    def __init__(self, model: str = "fake-llm", temperature: float = 0.0, **kwargs):
+        self.model = model
+        self.temperature = temperature
+
+    def _respond(self, prompt) -> AIMessage:
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        FakeChatModel.calls.append({"model": self.model, "prompt_chars": len(text)})
+        if FakeChatModel.latency_s:
+            time.sleep(FakeChatModel.latency_s)
+        content = (
+            f"### Executive Summary ({digest})\n"
+            "- Students value the practical components of the course.\n"
+            "- Assessment difficulty and pacing are recurring concerns.\n"
+            "### Recommendations\n"
+            "1. Add hands-on labs with modern tooling.\n"
+            "2. Introduce an MLOps and deployment module.\n"
+            "3. Publish grading rubrics ahead of each assessment.\n"
+        )
+        return AIMessage(content=content)
+
+    def invoke(self, prompt, *args, **kwargs) -> AIMessage:
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt, *args, **kwargs) -> AIMessage:
+        return self._respond(prompt)
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.calls = []
+
+
+class FakeEmbeddings(Embeddings):
+    """Feature-hashing embedder: token overlap gives a crude but stable notion of similarity."""
+
+    def __init__(self, model_name: str = "fake-embeddings", dim: int = 384, **kwargs):
+        self.model_name = model_name
+        self.dim = dim
+
+    def _embed(self, text: str) -> list[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            h = zlib.crc32(token.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
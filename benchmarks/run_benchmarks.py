@@ -0,0 +1,315 @@
+"""
+End-to-end benchmark harness for the ACIS agents.
+
+Generates synthetic datasets at the requested scales, runs every agent tool in-process
+against a deterministic fake LLM and a local embedding stub, and reports latency
+percentiles, throughput and peak memory per stage. Results can be saved as a baseline
+and later runs compared against it to catch regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --sizes 1000000 10000000 --repeats 1
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+AGENTS_DIR = REPO_ROOT / "src_code" / "agents"
+RESULTS_DIR = BENCH_DIR / "results"
+
+sys.path.insert(0, str(BENCH_DIR))
+from bench_datasets import (  # noqa: E402
+    write_curriculum_pdf,
+    write_feedback_csv,
+    write_job_trends_csv,
+    write_performance_csv,
+)
+from fakes import FakeChatModel, FakeEmbeddings  # noqa: E402
+
+COURSE = "Machine Learning"
+AGENT_MODULES = {
+    "feedback": "feedback_mcp_server",
+    "performance": "performance_mcp_server",
+    "trends": "trend_mcp_server",
+    "recommender": "recommender_mcp_server",
+    "report": "report_mcp_server",
+}
+
+
+@dataclass
+class Stage:
+    name: str
+    rows: int
+    run: Callable[[], dict]
+    setup: Callable[[], None] = field(default=lambda: None)
+
+
+# ============================================
+# 🧩 Agent Loading
+# ============================================
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def load_agents(workdir: Path) -> dict:
+    """Import the agent modules in-process and swap their remote models for local fakes."""
+    # The recommender refuses to import when its port is taken; it never binds it here.
+    os.environ["MCP_PORT"] = str(_free_port())
+    os.environ["VECTORSTORE_CACHE_DIR"] = str(workdir / "vectorstore_cache")
+    os.environ["MARKET_SNAPSHOT_DIR"] = str(workdir / "market_snapshots")
+    os.environ["PERFORMANCE_SCORES_DIR"] = str(workdir / "performance_scores")
+    if str(AGENTS_DIR) not in sys.path:
+        sys.path.insert(0, str(AGENTS_DIR))
+
+    agents = {}
+    for key, module_name in AGENT_MODULES.items():
+        # The feedback agent blanks GOOGLE_API_KEY on import; the recommender requires it to be set.
+        if not os.environ.get("GOOGLE_API_KEY"):
+            os.environ["GOOGLE_API_KEY"] = "benchmark-key"
+        module = importlib.import_module(module_name)
+        if hasattr(module, "ChatGoogleGenerativeAI"):
+            module.ChatGoogleGenerativeAI = FakeChatModel
+        if hasattr(module, "HuggingFaceEmbeddings"):
+            module.HuggingFaceEmbeddings = FakeEmbeddings
+        agents[key] = module
+    return agents
+
+
+# ============================================
+# 📊 Measurement
+# ============================================
+def _check(stage: Stage, result: dict) -> dict:
+    if not isinstance(result, dict) or result.get("error"):
+        raise RuntimeError(f"Stage {stage.name} failed: {result.get('error') if isinstance(result, dict) else result}")
+    return result
+
+
+def measure(stage: Stage, repeats: int) -> tuple[dict, dict]:
+    """Time ``repeats`` untraced runs, then one traced run for peak memory."""
+    latencies = []
+    result = {}
+    for _ in range(repeats):
+        stage.setup()
+        start = time.perf_counter()
+        result = _check(stage, stage.run())
+        latencies.append(time.perf_counter() - start)
+
+    stage.setup()
+    tracemalloc.start()
+    try:
+        _check(stage, stage.run())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    lat = np.array(latencies)
+    p50 = float(np.percentile(lat, 50))
+    stats = {
+        "rows": stage.rows,
+        "repeats": repeats,
+        "mean_s": float(lat.mean()),
+        "p50_s": p50,
+        "p95_s": float(np.percentile(lat, 95)),
+        "p99_s": float(np.percentile(lat, 99)),
+        "throughput_rows_s": stage.rows / p50 if p50 else float("inf"),
+        "peak_mem_mb": peak / 2**20,
+    }
+    return stats, result
+
+
+# ============================================
+# 🧪 Stage Definitions
+# ============================================
+def build_stages(agents: dict, workdir: Path, sizes: list[int], pdf_pages: int, selected: set[str],
+                 analysis: str = "full") -> list[Stage]:
+    data_dir = workdir / "data"
+    out_dir = workdir / "results"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stages: list[Stage] = []
+
+    for n in sizes:
+        if "feedback" in selected:
+            path = write_feedback_csv(data_dir / f"feedback_{n}.csv", n)
+            stages.append(Stage(f"feedback@{n}", n, lambda p=path: asyncio.run(agents["feedback"].analyze_feedback(
+                COURSE, str(p), str(out_dir / "feedback_out.md"), analysis=analysis))))
+        if "performance" in selected:
+            path = write_performance_csv(data_dir / f"performance_{n}.csv", n)
+            stages.append(Stage(f"performance@{n}", n, lambda p=path: asyncio.run(agents["performance"].evaluate_performance(
+                COURSE, str(p), str(out_dir / "perf_out.md"), analysis=analysis))))
+        if "trends" in selected:
+            path = write_job_trends_csv(data_dir / f"trends_{n}.csv", n)
+            run_trends = lambda p=path: asyncio.run(agents["trends"].analyze_job_trends(  # noqa: E731
+                COURSE, str(p), str(out_dir / "trends_out.md"), analysis=analysis))
+
+            def reset_trends():
+                # Cold: no snapshot or rollups on disk and no embedded vocabulary in the process
+                shutil.rmtree(os.environ["MARKET_SNAPSHOT_DIR"], ignore_errors=True)
+                agents["trends"]._relevance = None
+
+            # Cold builds the market snapshot from the CSV; warm answers from the stored aggregates
+            stages.append(Stage(f"trends_cold@{n}", n, run_trends, setup=reset_trends))
+            stages.append(Stage(f"trends@{n}", n, run_trends))
+
+    if selected & {"recommender", "report"}:
+        # Downstream agents consume the structured payloads of the smallest upstream run.
+        n = min(sizes)
+        summaries = {
+            "feedback_summary": asyncio.run(agents["feedback"].analyze_feedback(
+                COURSE, str(write_feedback_csv(data_dir / f"feedback_{n}.csv", n)), str(out_dir / "feedback_out.md"))),
+            "performance_summary": asyncio.run(agents["performance"].evaluate_performance(
+                COURSE, str(write_performance_csv(data_dir / f"performance_{n}.csv", n)), str(out_dir / "perf_out.md"))),
+            "trend_summary": asyncio.run(agents["trends"].analyze_job_trends(
+                COURSE, str(write_job_trends_csv(data_dir / f"trends_{n}.csv", n)), str(out_dir / "trends_out.md"))),
+        }
+        summaries = {k: v.get("data") or v.get("summary", "") for k, v in summaries.items()}
+
+    if "recommender" in selected:
+        pdf_path = write_curriculum_pdf(data_dir / f"curriculum_{pdf_pages}.pdf", pdf_pages)
+        cache_dir = Path(os.environ["VECTORSTORE_CACHE_DIR"])
+        recommend = agents["recommender"].recommend_curriculum_updates
+
+        def run_recommender():
+            return asyncio.run(recommend(
+                course_name=COURSE,
+                curriculum_paths=[str(pdf_path)],
+                output_path=str(out_dir / "recommendations.txt"),
+                **summaries,
+            ))
+
+        def reset_recommender():
+            # Cold: no store on disk, no prepared retriever and no embedding model in the process
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            agents["recommender"]._preparations.clear()
+            agents["recommender"]._embeddings = None
+
+        stages.append(Stage(f"recommender_cold@{pdf_pages}p", pdf_pages, run_recommender,
+                            setup=reset_recommender))
+        stages.append(Stage(f"recommender_warm@{pdf_pages}p", pdf_pages, run_recommender))
+
+    if "report" in selected:
+        generate = agents["report"].generate_report
+        recommendations = FakeChatModel().invoke("recommendations").content
+        stages.append(Stage("report", 1, lambda: asyncio.run(generate(
+            course_name=COURSE, recommendations=recommendations, **summaries))))
+
+    return stages
+
+
+# ============================================
+# 🗂️ Baseline Comparison
+# ============================================
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return one message per stage whose p50 latency or peak memory regressed beyond ``tolerance``."""
+    regressions = []
+    for name, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_s", "peak_mem_mb"):
+            if base[metric] > 0 and stats[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {metric} {stats[metric]:.4f} vs baseline {base[metric]:.4f} "
+                    f"(+{(stats[metric] / base[metric] - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    header = f"{'stage':<28}{'rows':>10}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'rows/s':>14}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, s in results["stages"].items():
+        print(f"{name:<28}{s['rows']:>10}{s['p50_s']:>10.4f}{s['p95_s']:>10.4f}{s['p99_s']:>10.4f}"
+              f"{s['throughput_rows_s']:>14,.0f}{s['peak_mem_mb']:>10.1f}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the ACIS agents with synthetic data and a fake LLM.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="Row counts for the feedback, performance and job-market datasets.")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="Pages in the synthetic curriculum PDF.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per stage.")
+    parser.add_argument("--stages", nargs="+", default=list(AGENT_MODULES), choices=list(AGENT_MODULES))
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated LLM latency in seconds.")
+    parser.add_argument("--analysis", default="full", choices=["full", "quantitative"],
+                        help="Narrative mode of the feedback, performance and trend stages.")
+    parser.add_argument("--workdir", type=Path, default=None, help="Where to write datasets (default: temp dir).")
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json")
+    parser.add_argument("--baseline", type=Path, default=RESULTS_DIR / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before failing.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="acis_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    agents = load_agents(workdir)
+    # Agents configure INFO logging on import; keep benchmark output readable.
+    logging.getLogger().setLevel(logging.WARNING)
+    FakeChatModel.latency_s = args.llm_latency
+
+    stages = build_stages(agents, workdir, sorted(args.sizes), args.pdf_pages, set(args.stages), args.analysis)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": {},
+    }
+    for stage in stages:
+        FakeChatModel.reset()
+        stats, _ = measure(stage, args.repeats)
+        stats["llm_prompt_chars"] = max((c["prompt_chars"] for c in FakeChatModel.calls), default=0)
+        results["stages"][stage.name] = stats
+        print(f"✔ {stage.name}: p50 {stats['p50_s']:.4f}s, peak {stats['peak_mem_mb']:.1f} MB", flush=True)
+
+    print()
+    print_table(results)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\n📁 Baseline saved to {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("\n⚠️ Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
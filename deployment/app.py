@@ -197,12 +197,16 @@
 #         st.stop()
 
 import base64
+import hashlib
+import json
 import streamlit as st
 import asyncio
 from utils.mcp_client import call_mcp_agent
+from utils.upload_store import prune_upload_store, store_upload
+from utils.workspace import create_run_workspace, prune_run_workspaces
 import os
-import shutil
 import logging
+import time
 from pathlib import Path
 
 # Set up logging
@@ -227,62 +231,184 @@ curriculum_files = st.sidebar.file_uploader(
     help="Upload one or more PDF or PPTX files for the curriculum."
 )
 job_trend_csv = st.sidebar.file_uploader("Upload Job Trends CSV", type=["csv"], help="Required: Upload custom job trends.")
+quantitative_only = st.sidebar.checkbox(
+    "Quantitative only", value=False,
+    help="Skip the AI narrative of the feedback, performance and trend reports; figures return immediately."
+)
+
+
+# Agent endpoints, tools and how their results are shown
+STAGES = {
+    "feedback": {"url": "http://localhost:9001/mcp", "tool": "analyze_feedback", "label": "Feedback",
+                 "spinner": "🗣️ Feedback Agent analyzing student sentiments..."},
+    "performance": {"url": "http://localhost:9002/mcp", "tool": "evaluate_performance", "label": "Performance",
+                    "spinner": "📊 Performance Agent evaluating academic data..."},
+    "trends": {"url": "http://localhost:9003/mcp", "tool": "analyze_job_trends", "label": "Trend",
+               "spinner": "💼 Trend Agent identifying industry-relevant skills..."},
+    "recommender": {"url": "http://localhost:9004/mcp", "tool": "finalize_recommendations", "label": "Recommender",
+                    "spinner": "🧩 Recommender Agent generating curriculum updates..."},
+    "report": {"url": "http://localhost:9005/mcp", "tool": "generate_report", "label": "Report",
+               "spinner": "📄 Generating final report..."},
+}
+# Arguments that do not change a stage's result: where output is written, and the
+# recommender's preparation handle (its inputs are keyed directly instead)
+UNKEYED_ARGUMENTS = {"output_path", "handle"}
+# Narrative states of a figures-only result that a later run should retry, not reuse
+INCOMPLETE_ANALYSIS = {"unavailable", "pending"}
+# Wall-clock budget of one analysis run; every agent call gets the run's deadline
+PIPELINE_BUDGET_SECONDS = float(os.getenv("PIPELINE_BUDGET_SECONDS", 600))
+# Extra wait past the deadline so an agent can report its own timeout
+DEADLINE_GRACE_SECONDS = 5.0
+
+
+def stage_fingerprint(name: str, arguments: dict) -> str:
+    keyed = {k: v for k, v in arguments.items() if k not in UNKEYED_ARGUMENTS}
+    return hashlib.sha256(json.dumps([name, keyed], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def time_left(deadline: float) -> float:
+    """Seconds the client waits on a call made now: the time to ``deadline`` plus a grace period."""
+    return max(deadline - time.time(), 0.0) + DEADLINE_GRACE_SECONDS
+
+
+def incomplete(value) -> bool:
+    """Whether a stage result or payload lacks the LLM narrative it asked for."""
+    if not isinstance(value, dict):
+        return False
+    payload = value.get("data") if isinstance(value.get("data"), dict) else value
+    return payload.get("analysis_status") in INCOMPLETE_ANALYSIS
+
+
+def memoized(name: str, arguments: dict, key_inputs: dict | None = None) -> dict | None:
+    """A stage's memoized result if its inputs are unchanged, else None."""
+    cached = st.session_state.get("stage_results", {}).get(name)
+    if cached and cached[0] == stage_fingerprint(name, {**arguments, **(key_inputs or {})}):
+        return cached[1]
+    return None
+
+
+def memoized_with(name: str, key_inputs: dict) -> bool:
+    """Whether a stage's memoized result, if any, was computed with these ``key_inputs``."""
+    cached = st.session_state.get("stage_results", {}).get(name)
+    return bool(cached) and cached[2] == key_inputs
+
+
+async def run_stage(name: str, arguments: dict, key_inputs: dict | None = None,
+                    deadline: float | None = None) -> dict:
+    """
+    Call a stage's agent, or return its memoized result when the stage's inputs
+    (uploads by content, upstream summaries, course name, plus ``key_inputs``)
+    are unchanged. Only successful results are memoized, and only if neither
+    they nor their upstream payloads are missing the LLM narrative, so a later
+    run retries the LLM once it is back.
+
+    ``deadline`` (Unix time) is passed to the agent and bounds the wait for it.
+    """
+    memo = st.session_state.setdefault("stage_results", {})
+    cached = memoized(name, arguments, key_inputs)
+    if cached is not None:
+        logger.info(f"Reusing {name} result; inputs unchanged")
+        return cached
+    fingerprint = stage_fingerprint(name, {**arguments, **(key_inputs or {})})
+    stage = STAGES[name]
+    if deadline is None:
+        result = await call_mcp_agent(stage["url"], stage["tool"], arguments)
+    elif deadline <= time.time():
+        result = {"error": f"Analysis budget of {PIPELINE_BUDGET_SECONDS:.0f}s used up before the {stage['label']} stage"}
+    else:
+        result = await call_mcp_agent(stage["url"], stage["tool"], {**arguments, "deadline": deadline},
+                                      timeout=time_left(deadline))
+    logger.info(f"{stage['label']} Agent Response: {result}")
+    if not result.get("error") and not incomplete(result) and not any(map(incomplete, arguments.values())):
+        memo[name] = (fingerprint, result, key_inputs)
+    return result
+
+
+def stage_output(result: dict) -> str | dict:
+    """What an analysis stage hands downstream: its structured payload, or its summary text."""
+    return result.get("data") or result.get("summary", "")
+
+
+def render_stage(name: str, result: dict) -> None:
+    """Show one stage's result; stops the script on an agent error."""
+    if result.get("error"):
+        st.error(f"{STAGES[name]['label']} Agent error: {result.get('error')}")
+        st.stop()
+    if (result.get("data") or {}).get("analysis_status") == "unavailable":
+        st.warning(f"{STAGES[name]['label']} AI analysis is unavailable right now; showing the figures only.")
+    if name == "feedback":
+        st.success("✅ Feedback analysis complete!")
+        st.markdown(result.get("summary", "No summary available"))
+    elif name == "performance":
+        st.success("✅ Performance analysis complete!")
+        st.markdown(result.get("summary", "No summary available"))
+    elif name == "trends":
+        st.success("✅ Job trend analysis complete!")
+        st.markdown(result.get("summary", "No summary available"))
+    elif name == "recommender":
+        st.success("✅ Curriculum recommendations ready!")
+        st.markdown("### ✨ Recommended Updates")
+        st.info(result.get("curriculum_recommendations", "No recommendations available"))
+    elif name == "report":
+        st.success("✅ Report generated successfully!")
+        pdf_data = result.get("pdf_data")
+        if pdf_data:
+            # Decode base64-encoded PDF data
+            pdf_bytes = base64.b64decode(pdf_data)
+            st.download_button(
+                "📥 Download Report",
+                pdf_bytes,
+                file_name="final_report.pdf",
+                mime="application/pdf"
+            )
+        else:
+            st.error("No PDF data returned by the server.")
+
+
+def stored_upload(uploaded_file) -> Path:
+    """
+    Store path of an uploaded file. Streamlit keeps the same ``file_id`` for an
+    upload across reruns, so an unchanged file is hashed and stored only once per session.
+    """
+    memo = st.session_state.setdefault("stored_uploads", {})
+    key = (getattr(uploaded_file, "file_id", None) or uploaded_file.name, uploaded_file.size)
+    if key not in memo or not memo[key].is_file():
+        memo[key], _ = store_upload(uploaded_file)
+    return memo[key]
+
 
 if st.sidebar.button("🚀 Run Analysis"):
     if not all([feedback_file, performance_file, curriculum_files, job_trend_csv]):
         st.error("Please upload all required files: Feedback CSV, Performance CSV, at least one Curriculum file (PDF/PPTX), and Job Trends CSV.")
         st.stop()
 
-    # Clean up and create temp and results directories with absolute paths
-    temp_dir = Path("temp_uploads").resolve()
-    results_dir = Path("results").resolve()
-    shutil.rmtree(temp_dir, ignore_errors=True)
-    shutil.rmtree(results_dir, ignore_errors=True)
-    temp_dir.mkdir(exist_ok=True)
-    results_dir.mkdir(exist_ok=True)
-
-    # Save uploads temporarily with absolute paths
-    feedback_path = temp_dir / f"{course_name}_feedback.csv"
-    performance_path = temp_dir / f"{course_name}_performance.csv"
-    job_trend_path = temp_dir / f"{course_name}_job_trends.csv"
-    curriculum_paths = []
+    # Each run gets its own results workspace so concurrent sessions never touch each other's files
+    prune_run_workspaces()
+    prune_upload_store()
+    results_dir = create_run_workspace()
 
-    # Validate and save files
-    for file_path, uploaded_file in [
-        (feedback_path, feedback_file),
-        (performance_path, performance_file),
-        (job_trend_path, job_trend_csv)
-    ]:
-        if uploaded_file:
-            try:
-                with open(file_path, "wb") as f:
-                    f.write(uploaded_file.read())
-                logger.info(f"Saved {file_path}")
-                if not file_path.is_file():
-                    raise RuntimeError(f"File not found after saving: {file_path}")
-            except Exception as e:
-                st.error(f"Failed to save {file_path.name}: {str(e)}")
-                st.stop()
-        else:
-            st.error(f"Upload failed for {file_path.name}")
-            st.stop()
+    # Stream uploads into the content-addressed store; unchanged files are not re-written
+    try:
+        feedback_path = stored_upload(feedback_file)
+        performance_path = stored_upload(performance_file)
+        job_trend_path = stored_upload(job_trend_csv)
+    except Exception as e:
+        st.error(f"Failed to save uploads: {str(e)}")
+        st.stop()
+    curriculum_paths = []
 
     # Save multiple curriculum files
-    for idx, curriculum_file in enumerate(curriculum_files, 1):
+    for curriculum_file in curriculum_files:
         ext = os.path.splitext(curriculum_file.name)[1].lower()
         if ext not in [".pdf", ".pptx", ".ppt"]:
             st.error(f"Unsupported file type for {curriculum_file.name}. Please upload PDF or PPTX files.")
             st.stop()
-        curriculum_path = temp_dir / f"{course_name}_curriculum_{idx}{ext}"
         try:
-            with open(curriculum_path, "wb") as f:
-                f.write(curriculum_file.read())
-            logger.info(f"Saved {curriculum_path}")
-            if not curriculum_path.is_file():
-                raise RuntimeError(f"File not found after saving: {curriculum_path}")
-            curriculum_paths.append(str(curriculum_path))
+            curriculum_path = str(stored_upload(curriculum_file))
+            if curriculum_path not in curriculum_paths:  # same deck uploaded twice
+                curriculum_paths.append(curriculum_path)
         except Exception as e:
-            st.error(f"Failed to save {curriculum_path.name}: {str(e)}")
+            st.error(f"Failed to save {curriculum_file.name}: {str(e)}")
             st.stop()
 
     if not curriculum_paths:
@@ -294,100 +420,65 @@ if st.sidebar.button("🚀 Run Analysis"):
 
     # Define async helper function
     async def run_agent_calls():
-        # Calling Feedback Agent
-        with st.spinner("🗣️ Feedback Agent analyzing student sentiments..."):
-            feedback_res = await call_mcp_agent(
-                "http://localhost:9001/mcp",
-                "analyze_feedback",
-                {"course_name": course_name, "file_path": str(feedback_path), "output_path": str(results_dir / "feedback_out.csv")}
-            )
-            logger.info(f"Feedback Agent Response: {feedback_res}")
-            if feedback_res.get("error"):
-                st.error(f"Feedback Agent error: {feedback_res.get('error')}")
-                st.stop()
-            st.success("✅ Feedback analysis complete!")
-            st.markdown(feedback_res.get("summary", "No summary available"))
-
-        # Performance Agent
-        with st.spinner("📊 Performance Agent evaluating academic data..."):
-            perf_res = await call_mcp_agent(
-                "http://localhost:9002/mcp",
-                "evaluate_performance",
-                {"course_name": course_name, "file_path": str(performance_path), "output_path": str(results_dir / "perf_out.csv")}
-            )
-            logger.info(f"Performance Agent Response: {perf_res}")
-            if perf_res.get("error"):
-                st.error(f"Performance Agent error: {perf_res.get('error')}")
-                st.stop()
-            st.success("✅ Performance analysis complete!")
-            st.markdown(perf_res.get("summary", "No summary available"))
-
-        # Trend Agent
-        with st.spinner("💼 Trend Agent identifying industry-relevant skills..."):
-            trend_res = await call_mcp_agent(
-                "http://localhost:9003/mcp",
-                "analyze_job_trends",
-                {"course_name": course_name, "file_path": str(job_trend_path), "output_path": str(results_dir / "trends_out.csv")}
-            )
-            logger.info(f"Trend Agent Response: {trend_res}")
-            if trend_res.get("error"):
-                st.error(f"Trend Agent error: {trend_res.get('error')}")
-                st.stop()
-            st.success("✅ Job trend analysis complete!")
-            st.markdown(trend_res.get("summary", "No summary available"))
-
-        # Recommender Agent
-        with st.spinner("🧩 Recommender Agent generating curriculum updates..."):
-            rec_res = await call_mcp_agent(
-                "http://localhost:9004/mcp",
-                "recommend_curriculum_updates",
-                {
-                    "course_name": course_name,
-                    "curriculum_paths": curriculum_paths,
-                    "feedback_summary": feedback_res.get("summary", ""),
-                    "performance_summary": perf_res.get("summary", ""),
-                    "trend_summary": trend_res.get("summary", ""),
-                    "output_path": str(results_dir / "recommendations.txt")
-                }
-            )
-            logger.info(f"Recommender Agent Response: {rec_res}")
-            if rec_res.get("error"):
-                st.error(f"Recommender Agent error: {rec_res.get('error')}")
-                st.stop()
-            st.success("✅ Curriculum recommendations ready!")
-            st.markdown("### ✨ Recommended Updates")
-            st.info(rec_res.get("curriculum_recommendations", "No recommendations available"))
-
-        # Report Agent
-        with st.spinner("📄 Generating final report..."):
-            report_res = await call_mcp_agent(
-                "http://localhost:9005/mcp",
-                "generate_report",
-                {
-                    "course_name": course_name,
-                    "feedback_summary": feedback_res.get("summary", ""),
-                    "performance_summary": perf_res.get("summary", ""),
-                    "trend_summary": trend_res.get("summary", ""),
-                    "recommendations": rec_res.get("curriculum_recommendations", "")
-                }
+        results = {}
+        deadline = time.time() + PIPELINE_BUDGET_SECONDS
+        curriculum = {"course_name": course_name, "curriculum_paths": curriculum_paths}
+
+        async def prepare_curriculum() -> dict:
+            preparation = await call_mcp_agent(
+                STAGES["recommender"]["url"], "prepare_curriculum", curriculum, timeout=time_left(deadline)
             )
-            logger.info(f"Report Agent Response: {report_res}")
-            if report_res.get("error"):
-                st.error(f"Report Agent error: {report_res.get('error')}")
-                st.stop()
-            st.success("✅ Report generated successfully!")
-            pdf_data = report_res.get("pdf_data")
-            if pdf_data:
-                # Decode base64-encoded PDF data
-                pdf_bytes = base64.b64decode(pdf_data)
-                st.download_button(
-                    "📥 Download Report",
-                    pdf_bytes,
-                    file_name="final_report.pdf",
-                    mime="application/pdf"
-                )
-            else:
-                st.error("No PDF data returned by the server.")
+            logger.info(f"Recommender preparation: {preparation}")
+            if preparation.get("error"):
+                render_stage("recommender", preparation)
+            return preparation
+
+        # For a new curriculum, start the recommender's loading and index build now
+        # so it overlaps with the feedback, performance and trend agents. For the
+        # curriculum of the memoized recommendations, wait until the summaries show
+        # whether those can be reused and preparing is needed at all.
+        preparation = None if memoized_with("recommender", curriculum) else await prepare_curriculum()
+
+        # Uploads are content-addressed, so their paths fingerprint their contents
+        analysis = "quantitative" if quantitative_only else "full"
+        upstream = [
+            ("feedback", {"course_name": course_name, "file_path": str(feedback_path), "output_path": str(results_dir / "feedback_out.csv"), "analysis": analysis}),
+            ("performance", {"course_name": course_name, "file_path": str(performance_path), "output_path": str(results_dir / "perf_out.csv"), "analysis": analysis}),
+            ("trends", {"course_name": course_name, "file_path": str(job_trend_path), "output_path": str(results_dir / "trends_out.csv"), "analysis": analysis}),
+        ]
+        for name, arguments in upstream:
+            with st.spinner(STAGES[name]["spinner"]):
+                results[name] = await run_stage(name, arguments, deadline=deadline)
+            render_stage(name, results[name])
+
+        with st.spinner(STAGES["recommender"]["spinner"]):
+            recommender_arguments = {
+                "feedback_summary": stage_output(results["feedback"]),
+                "performance_summary": stage_output(results["performance"]),
+                "trend_summary": stage_output(results["trends"]),
+                "output_path": str(results_dir / "recommendations.txt")
+            }
+            if preparation is None and memoized("recommender", recommender_arguments, curriculum) is None:
+                preparation = await prepare_curriculum()
+            recommender_arguments["handle"] = preparation["handle"] if preparation else None
+            results["recommender"] = await run_stage("recommender", recommender_arguments,
+                                                     key_inputs=curriculum, deadline=deadline)
+        render_stage("recommender", results["recommender"])
+
+        with st.spinner(STAGES["report"]["spinner"]):
+            results["report"] = await run_stage("report", {
+                "course_name": course_name,
+                "feedback_summary": stage_output(results["feedback"]),
+                "performance_summary": stage_output(results["performance"]),
+                "trend_summary": stage_output(results["trends"]),
+                "recommendations": results["recommender"].get("curriculum_recommendations", "")
+            }, deadline=deadline)
+        render_stage("report", results["report"])
+        # Like the memo, keep only runs with every narrative in place
+        if any(map(incomplete, results.values())):
+            st.session_state.pop("last_results", None)
+        else:
+            st.session_state["last_results"] = results
 
     # Run the async function in the event loop
     try:
@@ -395,4 +486,10 @@ if st.sidebar.button("🚀 Run Analysis"):
     except Exception as e:
         st.error(f"Analysis failed: {str(e)}")
         logger.error(f"💥 Analysis failed: {str(e)}")
-        st.stop()
\ No newline at end of file
+        st.stop()
+
+elif "last_results" in st.session_state:
+    # Any other widget interaction reruns the script; show the last run again without calling agents
+    st.subheader("🧠 Agentic Workflow Results")
+    for name, result in st.session_state["last_results"].items():
+        render_stage(name, result)
@@ -1,6 +1,7 @@
 # utils/mcp_client.py
 import asyncio
 import logging
+from datetime import timedelta
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 
@@ -8,21 +9,32 @@ from mcp.client.streamable_http import streamablehttp_client
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def call_mcp_agent(url: str, tool_name: str, arguments: dict) -> dict:
+async def _call_tool(url: str, tool_name: str, arguments: dict, timeout: float | None) -> dict:
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            read_timeout = timedelta(seconds=timeout) if timeout is not None else None
+            result = await session.call_tool(tool_name, arguments, read_timeout_seconds=read_timeout)
+            if result is None:
+                logger.error(f"No result from {tool_name} at {url}")
+                return {"summary": "Error: No response from server", "error": "No result"}
+            return result.structuredContent if result.structuredContent else {"summary": "No structured content available", "error": "Empty response"}
+
+async def call_mcp_agent(url: str, tool_name: str, arguments: dict, timeout: float | None = None) -> dict:
+    """
+    Call ``tool_name`` on the agent at ``url``. With ``timeout`` (seconds) the
+    call, connection included, is abandoned once it runs that long.
+    """
     try:
-        async with streamablehttp_client(url) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                result = await session.call_tool(tool_name, arguments)
-                if result is None:
-                    logger.error(f"No result from {tool_name} at {url}")
-                    return {"summary": "Error: No response from server", "error": "No result"}
-                return result.structuredContent if result.structuredContent else {"summary": "No structured content available", "error": "Empty response"}
+        return await asyncio.wait_for(_call_tool(url, tool_name, arguments, timeout), timeout)
+    except TimeoutError:
+        logger.error(f"Timed out calling {tool_name} at {url} after {timeout:.0f}s")
+        return {"summary": f"Error: {tool_name} timed out", "error": f"{tool_name} timed out after {timeout:.0f}s"}
     except Exception as e:
         logger.error(f"Error calling {tool_name} at {url}: {str(e)}")
         return {"summary": f"Error: {str(e)}", "error": str(e)}
 
-def sync_call_mcp_agent(url: str, tool_name: str, arguments: dict) -> dict:
-    return asyncio.run(call_mcp_agent(url, tool_name, arguments))
+def sync_call_mcp_agent(url: str, tool_name: str, arguments: dict, timeout: float | None = None) -> dict:
+    return asyncio.run(call_mcp_agent(url, tool_name, arguments, timeout))
 
 
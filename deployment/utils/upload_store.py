@@ -0,0 +1,74 @@
+# utils/upload_store.py
+"""
+Content-addressed store for uploaded files.
+
+Uploads are streamed to disk in fixed-size chunks while being hashed, then
+filed under their SHA-256 (``<store>/<ab>/<sha256><ext>``). Uploading the same
+file again, from any session, resolves to the same path, so nothing is written
+twice and the agents' path- and content-keyed caches keep hitting.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STORE_DIR = Path(os.getenv("ACIS_UPLOAD_STORE", "upload_store")).resolve()
+# Stored files not used for this long are removed by prune_upload_store
+UPLOAD_RETENTION_DAYS = float(os.getenv("ACIS_UPLOAD_RETENTION_DAYS", 7))
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+
+def store_path(digest: str, suffix: str, root: Path = UPLOAD_STORE_DIR) -> Path:
+    return root / digest[:2] / f"{digest}{suffix.lower()}"
+
+
+def store_upload(uploaded_file, suffix: str | None = None, root: Path = UPLOAD_STORE_DIR,
+                 chunk_size: int = UPLOAD_CHUNK_BYTES) -> tuple[Path, str]:
+    """
+    Stream ``uploaded_file`` into the store and return (path, sha256 hex digest).
+
+    The file is copied chunk by chunk, never read whole, into a temp file that
+    is renamed into place only if that content is not stored yet.
+    """
+    suffix = suffix if suffix is not None else Path(getattr(uploaded_file, "name", "")).suffix
+    root.mkdir(parents=True, exist_ok=True)
+    sha = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(prefix=".upload_", suffix=".part", dir=root)
+    try:
+        uploaded_file.seek(0)
+        with os.fdopen(fd, "wb") as f:
+            while chunk := uploaded_file.read(chunk_size):
+                sha.update(chunk)
+                f.write(chunk)
+        digest = sha.hexdigest()
+        path = store_path(digest, suffix, root)
+        if path.exists():
+            os.remove(tmp)
+            os.utime(path)  # keep reused files out of the prune window
+            logger.info(f"Upload {getattr(uploaded_file, 'name', '')} already stored as {path.name}")
+        else:
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp, path)
+            logger.info(f"Stored upload {getattr(uploaded_file, 'name', '')} as {path.name}")
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path, digest
+
+
+def prune_upload_store(root: Path = UPLOAD_STORE_DIR, max_age_days: float = UPLOAD_RETENTION_DAYS) -> None:
+    """Remove stored uploads that have not been uploaded again within ``max_age_days``."""
+    if not root.is_dir():
+        return
+    cutoff = time.time() - max_age_days * 86400
+    for path in root.glob("*/*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,44 @@
+# utils/workspace.py
+"""
+Per-run workspaces for the Streamlit app.
+
+Every analysis run gets its own ``runs/<timestamp>-<id>/results/`` directory
+for the agents' reports, so concurrent sessions never share, clear or
+overwrite each other's files. Uploads live in the shared content-addressed
+store (see ``upload_store``).
+"""
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+RUNS_DIR = Path(os.getenv("ACIS_RUNS_DIR", "runs")).resolve()
+# Workspaces older than this are removed when a new run starts
+RUN_RETENTION_HOURS = float(os.getenv("ACIS_RUN_RETENTION_HOURS", 24))
+
+
+def create_run_workspace(root: Path = RUNS_DIR) -> Path:
+    """Create a fresh workspace and return its results directory."""
+    run_dir = root / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    results_dir = run_dir / "results"
+    results_dir.mkdir(parents=True)
+    logger.info(f"Created run workspace {run_dir}")
+    return results_dir
+
+
+def prune_run_workspaces(root: Path = RUNS_DIR, max_age_hours: float = RUN_RETENTION_HOURS) -> None:
+    """Remove workspaces of earlier runs once they are older than ``max_age_hours``."""
+    if not root.is_dir():
+        return
+    cutoff = time.time() - max_age_hours * 3600
+    for run_dir in root.iterdir():
+        try:
+            if run_dir.is_dir() and run_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(run_dir, ignore_errors=True)
+        except FileNotFoundError:
+            pass  # removed by another session's prune
+
@@ -0,0 +1,112 @@
+"""
+Theme extraction for free-text feedback.
+
+Comments are hashed into TF-IDF vectors batch by batch and clustered with
+MiniBatchKMeans, so memory is bounded by the batch size rather than the number
+of comments. Each cluster is reported by one representative comment (the one
+closest to its centroid) together with how many comments it stands for.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+N_FEATURES = 2 ** 16
+BATCH_SIZE = 4096
+# Distinct comments sampled to estimate IDF weights
+IDF_SAMPLE = 20_000
+
+
+@dataclass
+class Theme:
+    representative: str
+    count: int
+    share: float
+
+
+def _vectorizer() -> HashingVectorizer:
+    # Stateless, so every batch maps into the same feature space without a fitted vocabulary
+    return HashingVectorizer(
+        n_features=N_FEATURES,
+        alternate_sign=False,
+        norm=None,
+        stop_words="english",
+        ngram_range=(1, 2),
+    )
+
+
+def _batches(n: int, batch_size: int):
+    for start in range(0, n, batch_size):
+        yield slice(start, min(start + batch_size, n))
+
+
+def extract_themes(comments, max_themes: int = 12, batch_size: int = BATCH_SIZE, seed: int = 0) -> list[Theme]:
+    """
+    Cluster ``comments`` into at most ``max_themes`` themes, largest first.
+
+    Exact repeats are counted once and weighted by their frequency, which keeps
+    the vectorized set small for the typical export where many students write
+    the same sentence.
+    """
+    series = pd.Series(list(comments), dtype=object).dropna().astype(str).str.strip()
+    counts = series[series != ""].value_counts()
+    total = int(counts.sum())
+    if not total:
+        return []
+
+    texts = counts.index.to_numpy()
+    weights = counts.to_numpy().astype(np.float64)
+    if len(texts) <= max_themes:
+        return [Theme(t, int(c), c / total) for t, c in zip(texts, weights)]
+
+    vectorizer = _vectorizer()
+    # The first partial_fit batch must hold at least one sample per cluster
+    batch_size = max(batch_size, max_themes)
+
+    # IDF weights from a random sample; hashing is the dominant cost, so it is not
+    # worth a full extra pass
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(texts), min(IDF_SAMPLE, len(texts)), replace=False)
+    X = vectorizer.transform(texts[sample])
+    doc_freq = np.bincount(X.indices, weights=np.repeat(weights[sample], np.diff(X.indptr)), minlength=N_FEATURES)
+    idf = np.log((1 + weights[sample].sum()) / (1 + doc_freq)) + 1
+
+    def tfidf(batch):
+        X = vectorizer.transform(texts[batch])
+        X.data = np.log1p(X.data) * idf[X.indices]
+        return normalize(X)
+
+    # Pass 1: incremental clustering, each distinct comment weighted by its repeats
+    kmeans = MiniBatchKMeans(n_clusters=max_themes, random_state=seed, n_init=3, batch_size=batch_size)
+    for batch in _batches(len(texts), batch_size):
+        kmeans.partial_fit(tfidf(batch), sample_weight=weights[batch])
+
+    # Pass 2: assign, count, and keep the comment nearest to each centroid
+    cluster_count = np.zeros(max_themes)
+    best_dist = np.full(max_themes, np.inf)
+    best_row = np.zeros(max_themes, dtype=np.int64)
+    for batch in _batches(len(texts), batch_size):
+        distances = kmeans.transform(tfidf(batch))
+        labels = distances.argmin(axis=1)
+        nearest = distances[np.arange(len(labels)), labels]
+        cluster_count += np.bincount(labels, weights=weights[batch], minlength=max_themes)
+
+        order = np.lexsort((nearest, labels))
+        first = order[np.r_[True, labels[order][1:] != labels[order][:-1]]]
+        improved = nearest[first] < best_dist[labels[first]]
+        best_dist[labels[first[improved]]] = nearest[first[improved]]
+        best_row[labels[first[improved]]] = batch.start + first[improved]
+
+    return [
+        Theme(texts[best_row[k]], int(cluster_count[k]), cluster_count[k] / total)
+        for k in np.argsort(-cluster_count, kind="stable")
+        if cluster_count[k] > 0
+    ]
+
+
+def format_themes(themes: list[Theme]) -> list[str]:
+    """One prompt line per theme: representative comment, count and share."""
+    return [f'"{t.representative}" — {t.count} comments ({t.share:.0%})' for t in themes]
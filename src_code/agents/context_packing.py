@@ -0,0 +1,118 @@
+"""
+Token-budget context packing shared by the agents.
+
+Comments and retrieved chunks are deduplicated (exact after normalization, then
+near-duplicates by word overlap), ranked, and added whole until a token budget
+is reached, so prompts stay a predictable size and never end mid-sentence.
+"""
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+TOKENIZER_ENCODING = "cl100k_base"
+# Once less than this is left, no further item is worth tokenizing
+MIN_ITEM_TOKENS = 8
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#\-]*")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """The local tiktoken BPE, or None when it is not installed or its vocabulary is not cached."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens; without tiktoken, estimate ~4 tokens per 3 words and punctuation marks."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(re.findall(r"\w+|[^\w\s]", text)) * 4 / 3)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    items: int  # items included
+    duplicates: int  # exact and near-duplicate items merged away
+    skipped: int  # distinct items left out for lack of budget
+
+
+def _content_words(text: str) -> frozenset:
+    return frozenset(w for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in ENGLISH_STOP_WORDS)
+
+
+def _is_near_duplicate(words: frozenset, selected: list[frozenset], threshold: float) -> bool:
+    for other in selected:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def pack_context(
+    texts,
+    budget_tokens: int,
+    rank: bool = True,
+    show_counts: bool = False,
+    near_duplicate_threshold: float = 0.8,
+    separator: str = "\n",
+) -> PackedContext:
+    """
+    Fill ``budget_tokens`` with whole items from ``texts``.
+
+    Items that are identical after lowercasing and stripping punctuation are
+    merged and counted. With ``rank`` the distinct items are ordered by
+    informativeness (distinct content words, boosted by how often the item was
+    repeated); otherwise the input order is kept, e.g. for pre-ranked retrieval
+    hits. ``show_counts`` suffixes merged items with "(×n)" so the model still
+    sees how common a comment was.
+    """
+    series = pd.Series(list(texts), dtype=object).dropna().astype(str).str.strip()
+    # Count exact repeats first so the normalization below only sees distinct strings
+    exact = series[series != ""].value_counts(sort=False)
+    if exact.empty:
+        return PackedContext("", 0, 0, 0, 0)
+
+    keys = exact.index.str.lower().str.replace(r"[^\w\s]", "", regex=True).str.split().str.join(" ")
+    groups = (
+        pd.DataFrame({"text": exact.index, "key": keys, "count": exact.to_numpy()})
+        .groupby("key", sort=False)
+        .agg(text=("text", "first"), count=("count", "sum"))
+    )
+    words = [_content_words(text) for text in groups["text"]]
+    duplicates = int(groups["count"].sum()) - len(groups)
+
+    order = range(len(groups))
+    if rank:
+        scores = [len(w) * (1 + math.log(c)) for w, c in zip(words, groups["count"])]
+        order = sorted(order, key=lambda i: -scores[i])
+
+    separator_tokens = count_tokens(separator) if separator else 0
+    parts, selected, used, skipped = [], [], 0, 0
+    for position, i in enumerate(order):
+        if budget_tokens - used < MIN_ITEM_TOKENS:
+            skipped += len(groups) - position
+            break
+        text, count = groups["text"].iat[i], int(groups["count"].iat[i])
+        if near_duplicate_threshold and words[i] and _is_near_duplicate(words[i], selected, near_duplicate_threshold):
+            duplicates += count
+            continue
+        item = f"{text} (×{count})" if show_counts and count > 1 else text
+        cost = count_tokens(item) + (separator_tokens if parts else 0)
+        if used + cost > budget_tokens:
+            skipped += 1
+            continue
+        parts.append(item)
+        selected.append(words[i])
+        used += cost
+
+    return PackedContext(separator.join(parts), used, len(parts), duplicates, skipped)
@@ -0,0 +1,92 @@
+"""
+Embedding-based course relevance over the job-market vocabulary.
+
+The distinct job titles and skills of a market snapshot, a few thousand
+strings at most, are embedded once through the on-disk embedding cache and
+kept per process as a unit-normalized matrix. Scoring a course is then one
+matrix-vector product over the vocabulary: terms whose cosine similarity to
+the course clears a threshold, best first and capped at top N, are relevant.
+Terms containing the whole course name always are, so an exact match is never
+lost to a strict threshold.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("trend_agent")
+
+RELEVANCE_THRESHOLD = float(os.getenv("TREND_RELEVANCE_THRESHOLD", 0.5))
+RELEVANCE_TOP_N = int(os.getenv("TREND_RELEVANCE_TOP_N", 20))
+# Vocabularies whose vectors are kept in memory (one per snapshot version)
+MAX_CACHED_VOCABULARIES = 8
+
+
+class VocabularyIndex:
+    """Unit-normalized embeddings of a list of terms."""
+
+    def __init__(self, terms: list[str], vectors: np.ndarray):
+        self.terms = list(terms)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(self.terms), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.vectors = vectors / np.maximum(norms, 1e-12)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every term to ``query``."""
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not len(self.terms) or not norm:
+            return np.zeros(len(self.terms), dtype=np.float32)
+        return self.vectors @ (query / norm)
+
+    def match(self, query: np.ndarray, threshold: float, top_n: int) -> np.ndarray:
+        """Boolean mask of the at most ``top_n`` terms scoring ``threshold`` or more."""
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > top_n:
+            candidates = candidates[np.argpartition(-scores[candidates], top_n - 1)[:top_n]]
+        mask = np.zeros(len(self.terms), dtype=bool)
+        mask[candidates] = True
+        return mask
+
+
+class CourseRelevance:
+    """Matches course names against vocabularies, embedding each distinct vocabulary once."""
+
+    def __init__(self, embeddings: Embeddings, threshold: float = RELEVANCE_THRESHOLD,
+                 top_n: int = RELEVANCE_TOP_N):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.top_n = top_n
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index(self, terms: list[str]) -> VocabularyIndex:
+        key = hashlib.sha256("\n".join(terms).encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._indexes:
+                self._indexes.move_to_end(key)
+                return self._indexes[key]
+        vectors = self.embeddings.embed_documents(list(terms)) if terms else []
+        index = VocabularyIndex(terms, vectors)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > MAX_CACHED_VOCABULARIES:
+                self._indexes.popitem(last=False)
+        logger.info(f"Embedded vocabulary of {len(terms)} terms")
+        return index
+
+    def match(self, course_name: str, terms: list[str]) -> np.ndarray:
+        """Boolean mask of the ``terms`` relevant to ``course_name``."""
+        course = course_name.strip().lower()
+        if not course:
+            # A blank name is contained in every term; nothing is relevant to it
+            return np.zeros(len(terms), dtype=bool)
+        # Through embed_documents so the course vector is cached on disk as well
+        query = np.asarray(self.embeddings.embed_documents([course])[0], dtype=np.float32)
+        mask = self.index(terms).match(query, self.threshold, self.top_n)
+        return mask | np.array([course in term for term in terms], dtype=bool)
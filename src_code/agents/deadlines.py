@@ -0,0 +1,58 @@
+"""
+End-to-end deadlines for agent tool calls.
+
+Callers pass ``deadline`` as an absolute Unix timestamp (``time.time()`` plus
+their budget), so it means the same in every agent process on the host. An
+agent checks it before each expensive stage, caps its LLM requests by the time
+left, and stops waiting on work that runs past it. Threads already running a
+stage cannot be interrupted; the stage checks and the LLM request timeout bound
+how long they keep going after the caller has been answered.
+"""
+import asyncio
+import os
+import time
+
+# Upper bound of a single LLM request, with or without a deadline
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 120))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's deadline passed before a stage could finish."""
+
+
+def remaining(deadline: float | None) -> float | None:
+    """Seconds left until ``deadline``, or None without one."""
+    return None if deadline is None else deadline - time.time()
+
+
+def check_deadline(deadline: float | None, stage: str) -> None:
+    """Raise ``DeadlineExceeded`` if ``deadline`` passed before ``stage`` starts."""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+
+def llm_options(deadline: float | None, stage: str = "LLM analysis") -> dict:
+    """Request timeout and retries for a chat model client, fitted to ``deadline``."""
+    check_deadline(deadline, stage)
+    left = remaining(deadline)
+    return {
+        "timeout": LLM_TIMEOUT_SECONDS if left is None else min(LLM_TIMEOUT_SECONDS, left),
+        "max_retries": LLM_MAX_RETRIES,
+    }
+
+
+async def run_until(deadline: float | None, awaitable, stage: str):
+    """Await ``awaitable``, giving up with ``DeadlineExceeded`` once ``deadline`` passes."""
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except DeadlineExceeded:
+        raise
+    except TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded during {stage}") from None
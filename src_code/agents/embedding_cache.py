@@ -0,0 +1,235 @@
+"""
+Persistent embedding cache keyed by chunk text hash and embedding model.
+
+Each model gets its own directory holding a raw float32/float16 matrix that is
+memory-mapped for reads, an append-only file of 16-byte text digests (row i of
+one belongs to row i of the other), and a small meta.json. Index builds wrap
+the embedding model in ``CachedEmbeddings`` so only cache misses are embedded.
+
+Usage:
+    python embedding_cache.py stats --cache-dir ./vectorstore_cache/embeddings
+    python embedding_cache.py compact --cache-dir ./vectorstore_cache/embeddings \\
+        --keep-store ./vectorstore_cache/program_faiss_index
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+from filelock import FileLock
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("recommender_agent")
+
+DIGEST_BYTES = 16
+DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()[:DIGEST_BYTES]
+
+
+def _model_dirname(model_name: str) -> str:
+    slug = re.sub(r"[^\w\-]+", "_", model_name).strip("_")[-60:]
+    return f"{slug}-{hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingCache:
+    """Append-only digest → vector store for one embedding model, safe across processes."""
+
+    def __init__(self, directory, model_name: str, dtype: str = "float32"):
+        self.path = Path(directory) / _model_dirname(model_name)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self._requested_dtype = dtype
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(str(self.path / ".lock"))
+        self._reset()
+
+    @property
+    def _keys_file(self) -> Path:
+        return self.path / "keys.bin"
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / "vectors.bin"
+
+    def _read_meta(self) -> dict:
+        meta_file = self.path / "meta.json"
+        return json.loads(meta_file.read_text(encoding="utf-8")) if meta_file.exists() else {}
+
+    def _write_meta(self, generation: int) -> None:
+        meta = {"model": self.model_name, "dim": self.dim, "dtype": self.dtype.name, "generation": generation}
+        tmp_file = self.path / "meta.json.tmp"
+        tmp_file.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_file, self.path / "meta.json")
+
+    def _reset(self) -> None:
+        self._rows = {}
+        self._n = 0
+        self._vectors = None
+        self._keys_inode = None
+        meta = self._read_meta()
+        # Bumped by every compaction, so readers drop row numbers of the old files
+        self._generation = meta.get("generation", 0)
+        if meta.get("dtype") and meta["dtype"] != self._requested_dtype:
+            logger.warning(f"Embedding cache {self.path} stores {meta['dtype']}; ignoring requested {self._requested_dtype}")
+        self.dtype = np.dtype(DTYPES[meta.get("dtype", self._requested_dtype)])
+        self.dim = meta.get("dim")
+
+    def _keys_stat(self) -> os.stat_result | None:
+        return self._keys_file.stat() if self._keys_file.exists() else None
+
+    def _replaced(self, stat: os.stat_result | None) -> bool:
+        """
+        Whether the files were reset or compacted since this process read them:
+        the keys file is a new one (inode), the generation changed or it shrank.
+        """
+        size = stat.st_size if stat else 0
+        return ((stat is not None and self._keys_inode not in (None, stat.st_ino))
+                or self._read_meta().get("generation", 0) != self._generation
+                or size < self._n * DIGEST_BYTES or bool(size and self.dim is None))
+
+    def _refresh(self) -> None:
+        """Pick up rows appended by other processes (or a reset/compaction of the files)."""
+        stat = self._keys_stat()
+        if not self._replaced(stat) and (stat.st_size if stat else 0) == self._n * DIGEST_BYTES:
+            return
+        # Appends and compactions hold the file lock, so keys and vectors are read as one version
+        with self._file_lock:
+            stat = self._keys_stat()
+            if self._replaced(stat):
+                self._reset()
+            size = stat.st_size if stat else 0
+            if size == self._n * DIGEST_BYTES:
+                return
+            with open(self._keys_file, "rb") as f:
+                f.seek(self._n * DIGEST_BYTES)
+                tail = f.read((size - self._n * DIGEST_BYTES) // DIGEST_BYTES * DIGEST_BYTES)
+            self._keys_inode = stat.st_ino
+            for i in range(0, len(tail), DIGEST_BYTES):
+                # Later rows win, so a re-appended key points at its newest vector
+                self._rows[tail[i:i + DIGEST_BYTES]] = self._n + i // DIGEST_BYTES
+            self._n += len(tail) // DIGEST_BYTES
+            self._vectors = np.memmap(self._vectors_file, dtype=self.dtype, mode="r", shape=(self._n, self.dim))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._n
+
+    def lookup(self, digests: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+        """Return (row per digest, -1 for misses) and the memory-mapped vector matrix."""
+        with self._lock:
+            self._refresh()
+            rows = np.fromiter((self._rows.get(d, -1) for d in digests), dtype=np.int64, count=len(digests))
+            return rows, self._vectors
+
+    def append(self, digests: list[bytes], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        with self._lock, self._file_lock:
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._write_meta(self._generation)
+            # Drop any vector bytes left behind by an interrupted append
+            with open(self._vectors_file, "ab") as f:
+                f.truncate(self._n * self.dim * self.dtype.itemsize)
+                f.write(vectors.tobytes())
+            # Keys last: a row only exists once its digest is written
+            with open(self._keys_file, "ab") as f:
+                f.write(b"".join(digests))
+            self._refresh()
+
+    def compact(self, keep: set[bytes] | None = None) -> dict:
+        """
+        Rewrite the cache without superseded rows and, if ``keep`` is given,
+        without rows whose digest is not in it. Returns row counts before/after.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            live = sorted(row for digest, row in self._rows.items() if keep is None or digest in keep)
+            digests = {row: digest for digest, row in self._rows.items()}
+            tmp_vectors = self.path / "vectors.bin.tmp"
+            tmp_keys = self.path / "keys.bin.tmp"
+            with open(tmp_vectors, "wb") as fv, open(tmp_keys, "wb") as fk:
+                for start in range(0, len(live), 65536):
+                    chunk = live[start:start + 65536]
+                    fv.write(np.ascontiguousarray(self._vectors[chunk]).tobytes())
+                    fk.write(b"".join(digests[row] for row in chunk))
+            before = self._n
+            self._vectors = None
+            os.replace(tmp_vectors, self._vectors_file)
+            os.replace(tmp_keys, self._keys_file)
+            self._write_meta(self._generation + 1)
+            self._reset()
+            self._refresh()
+            logger.info(f"Compacted embedding cache {self.path}: {before} -> {self._n} rows")
+            return {"rows_before": before, "rows_after": self._n}
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an ``EmbeddingCache``."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        digests = [text_digest(text) for text in texts]
+        rows, vectors = self.cache.lookup(digests)
+        missing = np.flatnonzero(rows < 0)
+
+        if len(missing):
+            # Each distinct missing text is embedded once, in a single call
+            first = {}
+            for i in missing:
+                first.setdefault(digests[i], i)
+            new_vectors = np.asarray(
+                self.embeddings.embed_documents([texts[i] for i in first.values()]), dtype=np.float32
+            )
+            self.cache.append(list(first), new_vectors)
+            rows, vectors = self.cache.lookup(digests)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return np.asarray(vectors[rows], dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+
+def _store_digests(store_path: Path) -> set[bytes]:
+    """Digests of every chunk text in a saved FAISS store."""
+    with open(Path(store_path) / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return {text_digest(docstore.search(doc_id).page_content) for doc_id in index_to_docstore_id.values()}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Inspect or compact the embedding cache.")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--cache-dir", required=True, type=Path)
+    parser.add_argument("--keep-store", type=Path, help="Keep only chunks of this FAISS store when compacting")
+    args = parser.parse_args()
+
+    keep = _store_digests(args.keep_store) if args.keep_store else None
+    for model_dir in sorted(p for p in args.cache_dir.iterdir() if (p / "meta.json").exists()):
+        meta = json.loads((model_dir / "meta.json").read_text(encoding="utf-8"))
+        cache = EmbeddingCache(args.cache_dir, meta["model"], meta["dtype"])
+        if args.command == "compact":
+            print(meta["model"], cache.compact(keep))
+        else:
+            size_mb = cache._vectors_file.stat().st_size / 2 ** 20
+            print(f"{meta['model']}: {len(cache)} rows × {meta['dim']} {meta['dtype']} ({size_mb:.1f} MB)")
@@ -1,3 +1,5 @@
+import asyncio
+from typing import Any
 import datetime
 from mcp.server.fastmcp import FastMCP
 import os
@@ -11,6 +13,12 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 import json
 from mcp.types import Resource, Tool, TextContent
+from comment_themes import extract_themes, format_themes
+from context_packing import count_tokens, pack_context
+from deadlines import DeadlineExceeded, run_until
+from llm_fallback import check_mode, finish_report, narrative_result
+from payloads import PAYLOAD_VERSION, FeedbackPayload, number, records
+from rating_aggregation import RatingSchema, aggregate_ratings, classify, group_table
 
 import langchain
 langchain.verbose = True
@@ -28,6 +36,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Likert columns of the standard feedback form; override per call with rating_columns
+DEFAULT_RATING_COLUMNS = [
+    "course_content",
+    "lecture_delivery",
+    "teaching_materials",
+    "practicals",
+    "assessment",
+]
+
+# Token budget for each of the positive/negative comment blocks in the LLM prompt
+EXAMPLE_TOKEN_BUDGET = int(os.getenv("FEEDBACK_EXAMPLE_TOKENS", 600))
+# Maximum number of comment clusters (themes) per sentiment
+FEEDBACK_THEMES = int(os.getenv("FEEDBACK_THEMES", 12))
+
 server = FastMCP(name="feedback_agent")
 server.settings.port = 9001
 server.settings.host = "localhost"
@@ -38,32 +60,33 @@ sid = SentimentIntensityAnalyzer()
 # -------------------------------
 # 🧠 MCP Tool
 # -------------------------------
-@server.tool()
-def analyze_feedback(course_name: str, file_path: str, output_path: str) -> dict[str, str]:
+def build_feedback_report(
+    course_name: str,
+    file_path: str,
+    rating_columns: list[str] | None = None,
+    group_by: list[str] | None = None,
+    with_prompt: bool = True,
+) -> dict:
     """
-    Analyze student feedback quantitatively and qualitatively using both
-    statistical metrics and an LLM (OpenAI GPT via LangChain).
+    Blocking analysis behind ``analyze_feedback``; returns the structured result
+    without its LLM narrative, plus the narrative's prompt when ``with_prompt``.
     """
     try:
         logger.info(f"📂 Loading feedback data from: {file_path}")
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        # Load CSV
-        df = pd.read_csv(file_path)
-        expected_cols = {
-            "student_id",
-            "course",
-            "course_content",
-            "lecture_delivery",
-            "teaching_materials",
-            "practicals",
-            "assessment",
-            "text_feedback",
-        }
+        # Load CSV, or the int8-coded Parquet written by transform_feedback_data
+        if file_path.lower().endswith(".parquet"):
+            df = pd.read_parquet(file_path)
+        else:
+            df = pd.read_csv(file_path)
 
-        if set(df.columns) != expected_cols:
-            raise ValueError(f"Invalid CSV format. Expected columns: {expected_cols}")
+        schema = RatingSchema(columns=rating_columns or DEFAULT_RATING_COLUMNS)
+        schema.validate(df)
+        missing_groups = [col for col in group_by or [] if col not in df.columns]
+        if missing_groups:
+            raise ValueError(f"Unknown group_by columns: {missing_groups}")
 
         # Filter for the specific course
         # df = df[df["course"].str.lower() == course_name.lower()]
@@ -72,20 +95,15 @@ def analyze_feedback(course_name: str, file_path: str, output_path: str) -> dict
         # -------------------------------
         # 1️⃣ Quantitative Analysis
         # -------------------------------
-        rating_cols = [
-            "course_content",
-            "lecture_delivery",
-            "teaching_materials",
-            "practicals",
-            "assessment",
-        ]
+        # Code 0 marks a missing/unknown label and is excluded from the statistics
+        codes = schema.codes(df)
+        stats = aggregate_ratings(codes, schema.levels, schema.columns)
 
-        ratings = {col: df[col].astype(float).tolist() for col in rating_cols}
-
-        avg_rating = {k: np.mean(v) if v else 0 for k, v in ratings.items()}
-        std_dev = {k: np.std(v) if v else 0 for k, v in ratings.items()}
-        weak_areas = [k for k, v in avg_rating.items() if v < 3]
-        strong_areas = [k for k, v in avg_rating.items() if v >= 4]
+        avg_rating = dict(zip(schema.columns, stats.mean[0].tolist()))
+        std_dev = dict(zip(schema.columns, stats.std[0].tolist()))
+        rating_distribution = {col: stats.histogram[0, j].tolist() for j, col in enumerate(schema.columns)}
+        weak_areas, strong_areas = classify(stats.mean[0], schema)
+        group_means = group_table(df, codes, schema, group_by) if group_by else None
 
         logger.info(f"Average Ratings: {avg_rating}")
         logger.info(f"Rating StdDev: {std_dev}")
@@ -116,81 +134,147 @@ def analyze_feedback(course_name: str, file_path: str, output_path: str) -> dict
         )
 
         # -------------------------------
-        # 3️⃣ LLM Contextual Summary (LangChain + GPT)
+        # 3️⃣ LLM Prompt (LangChain + Gemini); the narrative itself is added by the tool
         # -------------------------------
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.4,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
-        prompt = ChatPromptTemplate.from_template("""
-        You are an educational data analyst AI.
-        You have analyzed student feedback for the course "{course_name}".
+        formatted_prompt = None
+        if with_prompt:
+            prompt = ChatPromptTemplate.from_template("""
+            You are an educational data analyst AI.
+            You have analyzed student feedback for the course "{course_name}".
         
-        Quantitative Summary:
-        Average Ratings: {avg_rating}
-        Rating StdDev: {std_dev}
-        Strong Areas: {strong_areas}
-        Weak Areas: {weak_areas}
-        Average Sentiment: {avg_sentiment:.2f}
+            Quantitative Summary:
+            Average Ratings: {avg_rating}
+            Rating StdDev: {std_dev}
+            Rating Distribution (count per level 1–{levels}): {rating_distribution}
+            Strong Areas: {strong_areas}
+            Weak Areas: {weak_areas}
+            Average Sentiment: {avg_sentiment:.2f}
         
-        Positive Feedback Examples:
-        {positive_examples}
+            Positive Feedback Examples:
+            {positive_examples}
         
-        Negative Feedback Examples:
-        {negative_examples}
-
-        Tasks:
-        1️⃣ Summarize major positive themes students mentioned.
-        2️⃣ Identify key areas needing improvement.
-        3️⃣ Suggest 3 actionable curriculum or teaching updates.
-        4️⃣ Give a 4-line executive summary for faculty.
-        """)
-
-        formatted_prompt = prompt.format(
-            course_name=course_name,
-            avg_rating=avg_rating,
-            std_dev=std_dev,
-            strong_areas=strong_areas,
-            weak_areas=weak_areas,
-            avg_sentiment=avg_sentiment,
-            positive_examples="\n".join(positive_feedback[:30]),
-            negative_examples="\n".join(negative_feedback[:30]),
-        )
-
-        logger.info("🤖 Sending summary request to LLM...")
-        llm_response = llm.invoke(formatted_prompt)
-        logger.info(f"LLM Response: {llm_response}")
-        ai_summary = llm_response.content
+            Negative Feedback Examples:
+            {negative_examples}
+
+            Tasks:
+            1️⃣ Summarize major positive themes students mentioned.
+            2️⃣ Identify key areas needing improvement.
+            3️⃣ Suggest 3 actionable curriculum or teaching updates.
+            4️⃣ Give a 4-line executive summary for faculty.
+            """)
+
+            # One representative comment per theme, with its count and share, instead
+            # of the first N raw comments
+            positive_themes = extract_themes(positive_feedback, FEEDBACK_THEMES)
+            negative_themes = extract_themes(negative_feedback, FEEDBACK_THEMES)
+            positive_examples = pack_context(format_themes(positive_themes), EXAMPLE_TOKEN_BUDGET, rank=False)
+            negative_examples = pack_context(format_themes(negative_themes), EXAMPLE_TOKEN_BUDGET, rank=False)
+            logger.info(
+                f"📦 Packed {positive_examples.items} positive / {negative_examples.items} negative themes "
+                f"({positive_examples.tokens + negative_examples.tokens} tokens)"
+            )
+
+            formatted_prompt = prompt.format(
+                course_name=course_name,
+                avg_rating=avg_rating,
+                std_dev=std_dev,
+                levels=schema.levels,
+                rating_distribution=rating_distribution,
+                strong_areas=strong_areas,
+                weak_areas=weak_areas,
+                avg_sentiment=avg_sentiment,
+                positive_examples=positive_examples.text,
+                negative_examples=negative_examples.text,
+            )
+            logger.info(f"Prompt size: {count_tokens(formatted_prompt)} tokens")
 
         # -------------------------------
-        # 4️⃣ Final Summary + Save Output
+        # 4️⃣ Structured Result
         # -------------------------------
-        # Prepare the formatted strings for average ratings and standard deviation outside the f-string
-        avg_rating_str = '\n'.join([f'  - {key.replace("_", " ").title()}: {value:.2f}' for key, value in avg_rating.items()])
-        std_dev_str = '\n'.join([f'  - {key.replace("_", " ").title()}: {value:.3f}' for key, value in std_dev.items()])
-        strong_areas_str = ', '.join(strong_areas) if strong_areas else 'None'
-        weak_areas_str = ', '.join(weak_areas) if weak_areas else 'None'
+        data: FeedbackPayload = {
+            "kind": "feedback",
+            "version": PAYLOAD_VERSION,
+            "course_name": course_name,
+            "responses": len(df),
+            "avg_rating": {col: number(v) for col, v in avg_rating.items()},
+            "std_dev": {col: number(v) for col, v in std_dev.items()},
+            "rating_distribution": {col: [int(c) for c in counts] for col, counts in rating_distribution.items()},
+            "strong_areas": strong_areas,
+            "weak_areas": weak_areas,
+            "group_by": group_by,
+            "group_means": records(group_means.reset_index()) if group_means is not None else None,
+            "avg_sentiment": number(avg_sentiment),
+            "positive_count": len(positive_feedback),
+            "negative_count": len(negative_feedback),
+            "analysis": "",
+            "analysis_status": "pending",
+        }
+
+        logger.info("✅ Feedback analysis generated.")
+        return {"data": data, "prompt": formatted_prompt}
 
-        full_summary = f"""# Feedback Report for {course_name}\n## 📊 Quantitative Insights\n### **Average Ratings**\n- **Course Content:** {avg_rating['course_content']:.2f}\n- **Lecture Delivery:** {avg_rating['lecture_delivery']:.2f}\n- **Teaching Materials:** {avg_rating['teaching_materials']:.2f}\n- **Practicals:** {avg_rating['practicals']:.2f}\n- **Assessment:** {avg_rating['assessment']:.2f}\n### **Standard Deviation**\n- **Course Content:** {std_dev['course_content']:.3f}\n- **Lecture Delivery:** {std_dev['lecture_delivery']:.3f}\n- **Teaching Materials:** {std_dev['teaching_materials']:.3f}\n- **Practicals:** {std_dev['practicals']:.3f}\n- **Assessment:** {std_dev['assessment']:.3f}\n**Strong Areas:** {strong_areas_str}\n**Weak Areas:** {weak_areas_str}\n---\n## 🧠 Sentiment Analysis\n- **Average Sentiment:** {avg_sentiment:.2f}\n- **Positive Feedback Count:** {len(positive_feedback)}\n- **Negative Feedback Count:** {len(negative_feedback)}\n---\n- {ai_summary}"""
+    except Exception as e:
+        logger.error(f"💥 Error in analyze_feedback: {str(e)}")
+        return {"error": str(e)}
 
 
+def analysis_llm(**options) -> ChatGoogleGenerativeAI:
+    """Chat model writing the feedback narrative; ``options`` carry the request timeout."""
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        temperature=0.4,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        **options,
+    )
 
 
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(full_summary)
+@server.tool()
+async def analyze_feedback(
+    course_name: str,
+    file_path: str,
+    output_path: str,
+    rating_columns: list[str] | None = None,
+    group_by: list[str] | None = None,
+    deadline: float | None = None,
+    analysis: str = "full",
+) -> dict[str, Any]:
+    """
+    Analyze student feedback quantitatively and qualitatively using both
+    statistical metrics and an LLM (OpenAI GPT via LangChain).
 
-        logger.info("✅ Feedback analysis + LLM summary saved successfully.")
+    ``rating_columns`` declares the Likert (1–5) columns of the export; the
+    default is the standard five-criteria form. ``group_by`` (e.g.
+    ``["course", "section"]``) adds a per-group breakdown of mean ratings.
+    ``deadline`` (Unix time) bounds the whole call, LLM request included.
 
-        
-        return {
-            "summary": full_summary,
-        }
+    ``analysis`` is "full" (wait for the LLM narrative; the report is returned
+    without it if the LLM fails), "quantitative" (no narrative) or "deferred"
+    (return the figures now; fetch the narrative with ``get_analysis``).
 
-    except Exception as e:
-        logger.error(f"💥 Error in analyze_feedback: {str(e)}")
+    Returns the markdown report in ``summary`` and its figures and LLM analysis
+    as a structured payload in ``data``, for downstream agents.
+    """
+    try:
+        check_mode(analysis)
+        result = await run_until(deadline, asyncio.to_thread(
+            build_feedback_report, course_name, file_path, rating_columns, group_by, analysis != "quantitative"
+        ), "feedback analysis")
+    except (DeadlineExceeded, ValueError) as e:
+        logger.error(f"💥 {str(e)}")
         return {"error": str(e)}
+    if "error" in result:
+        return result
+    return await finish_report(result, analysis, analysis_llm, output_path, deadline, "feedback analysis")
+
+
+@server.tool()
+async def get_analysis(handle: str, wait_seconds: float = 0) -> dict[str, Any]:
+    """
+    Report of a deferred ``analyze_feedback`` call once its LLM narrative is
+    written: ``{"status": "ready", "summary", "data"}``, or ``{"status": "pending"}``
+    after waiting up to ``wait_seconds``.
+    """
+    return await narrative_result(handle, wait_seconds)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+"""
+Async, atomic writes for agent output files.
+
+Reports are written to a temporary file in the target directory and swapped in
+with os.replace, so a reader (or a concurrent run writing the same path) never
+sees a half-written file, and the event loop is not blocked on disk I/O.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+
+# Read once at import: os.umask can only be read by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+async def write_text_atomic(path, text: str, encoding: str = "utf-8") -> Path:
+    """Write ``text`` to ``path`` via a temp file + rename; returns the resolved path."""
+    path = Path(path).resolve()
+    await aiofiles.os.makedirs(path.parent, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    # mkstemp creates the file owner-only; give it the mode open(path, "w") would
+    os.chmod(tmp, 0o666 & ~_UMASK)
+    try:
+        async with aiofiles.open(tmp, "w", encoding=encoding) as f:
+            await f.write(text)
+        await aiofiles.os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
@@ -0,0 +1,177 @@
+"""
+Graceful degradation of the analysis agents' LLM narrative.
+
+The feedback, performance and trend agents compute their figures in
+milliseconds and then wait on the LLM for the narrative. Here the narrative is
+optional: a failed or timed-out request leaves the report quantitative-only
+(``analysis_status`` "unavailable") instead of failing the tool, and a circuit
+breaker stops calling the LLM at all after repeated failures until a cooldown
+has passed. Callers can also skip the narrative ("quantitative") or have it
+written in the background ("deferred") and fetch it later by handle.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+
+from context_packing import count_tokens
+from deadlines import llm_options, remaining, run_until
+from file_io import write_text_atomic
+from payloads import render_markdown
+
+logger = logging.getLogger(__name__)
+
+# full: wait for the narrative; quantitative: skip it; deferred: return now, narrate in the background
+ANALYSIS_MODES = ("full", "quantitative", "deferred")
+# Consecutive LLM failures that open the circuit, and how long it stays open
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 3))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", 60))
+# How long a finished deferred narrative can still be fetched
+NARRATIVE_TTL_SECONDS = float(os.getenv("NARRATIVE_TTL_SECONDS", 3600))
+
+
+class CircuitBreaker:
+    """
+    Closed until ``failures`` consecutive failures, then open for ``cooldown``
+    seconds. After the cooldown one trial call is let through (half-open): its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.cooldown else "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive, self._opened_at, self._trial = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or self._consecutive >= self.failures:
+                if self._opened_at is None or self._trial:
+                    logger.warning(f"⚡ LLM circuit opened after {self._consecutive} failures; "
+                                   f"retrying in {self.cooldown:.0f}s")
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+# One breaker per agent process, shared by all its LLM calls
+breaker = CircuitBreaker()
+
+# handle -> (monotonic start time, task writing the narrative)
+_narratives: dict[str, tuple[float, asyncio.Task]] = {}
+
+
+def check_mode(analysis: str) -> None:
+    if analysis not in ANALYSIS_MODES:
+        raise ValueError(f"analysis must be one of {', '.join(ANALYSIS_MODES)}, not {analysis!r}")
+
+
+async def narrate(make_llm, prompt: str, deadline: float | None, stage: str) -> tuple[str, str]:
+    """
+    The LLM narrative for ``prompt`` and its status: "complete", or "unavailable"
+    with an empty narrative when the circuit is open, the deadline has passed or
+    the request fails.
+    """
+    left = remaining(deadline)
+    if left is not None and left <= 0:
+        logger.warning(f"⏱️ No time left for the {stage} narrative; returning figures only.")
+        return "", "unavailable"
+    if not breaker.allow():
+        logger.warning(f"⚡ LLM circuit open; returning {stage} figures only.")
+        return "", "unavailable"
+    try:
+        llm = make_llm(**llm_options(deadline))
+        logger.info(f"🤖 Sending {stage} to the LLM ({count_tokens(prompt)} prompt tokens)...")
+        response = await run_until(deadline, asyncio.to_thread(llm.invoke, prompt), f"{stage} narrative")
+    except Exception as e:
+        breaker.record_failure()
+        logger.warning(f"⚠️ LLM narrative for {stage} unavailable ({str(e)}); returning figures only.")
+        return "", "unavailable"
+    breaker.record_success()
+    return response.content, "complete"
+
+
+async def _narrate_later(make_llm, prompt: str, data: dict, output_path: str, stage: str) -> dict:
+    data["analysis"], data["analysis_status"] = await narrate(make_llm, prompt, None, stage)
+    try:
+        summary = render_markdown(data)
+        await write_text_atomic(output_path, summary)
+    except Exception as e:
+        logger.error(f"💥 Error saving deferred {stage} report: {str(e)}")
+        return {"error": str(e)}
+    logger.info(f"✅ Deferred {stage} narrative saved to {output_path}")
+    return {"summary": summary, "data": data}
+
+
+def start_narrative(make_llm, prompt: str, data: dict, output_path: str, stage: str) -> str:
+    """Write the narrative of a returned report in the background and return its handle."""
+    now = time.monotonic()
+    for handle, (started, task) in list(_narratives.items()):
+        if now - started > NARRATIVE_TTL_SECONDS and task.done():
+            del _narratives[handle]
+    handle = uuid.uuid4().hex[:16]
+    _narratives[handle] = (now, asyncio.create_task(_narrate_later(make_llm, prompt, dict(data), output_path, stage)))
+    return handle
+
+
+async def narrative_result(handle: str, wait_seconds: float = 0) -> dict:
+    """The finished report of a deferred narrative, or ``{"status": "pending"}``."""
+    entry = _narratives.get(handle)
+    if entry is None:
+        return {"error": f"Unknown or expired analysis handle {handle}"}
+    task = entry[1]
+    if wait_seconds > 0 and not task.done():
+        await asyncio.wait({task}, timeout=wait_seconds)
+    if not task.done():
+        return {"status": "pending"}
+    return {"status": "ready", **task.result()}
+
+
+async def finish_report(result: dict, analysis: str, make_llm, output_path: str,
+                        deadline: float | None, stage: str) -> dict:
+    """
+    Add the narrative to a builder's result as ``analysis`` asks, save the
+    markdown report and return it with the payload. Deferred reports carry the
+    handle of their narrative in ``analysis_handle``.
+    """
+    data = result["data"]
+    if analysis == "full":
+        data["analysis"], data["analysis_status"] = await narrate(make_llm, result["prompt"], deadline, stage)
+    else:
+        data["analysis_status"] = "pending" if analysis == "deferred" else "skipped"
+    try:
+        summary = render_markdown(data)
+        await write_text_atomic(output_path, summary)
+        logger.info(f"✅ {stage.capitalize()} report saved to {output_path}")
+    except Exception as e:
+        logger.error(f"💥 Error saving {stage} report: {str(e)}")
+        return {"error": str(e)}
+    response = {"summary": summary, "data": data}
+    if analysis == "deferred":
+        # Started only now so the full report always replaces the quantitative one on disk
+        response["analysis_handle"] = start_narrative(make_llm, result["prompt"], data, output_path, stage)
+    return response
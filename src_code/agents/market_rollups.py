@@ -0,0 +1,248 @@
+"""
+Time-windowed rollups of a postings CSV for the trend agent.
+
+Postings are counted per calendar month and per week of ``posting_date`` for
+each skill and role, one small Parquet partition per period, listed in a
+manifest next to the market snapshot. When the CSV only grew since the last
+refresh, just the appended bytes are read and only the periods they touch get
+a new partition.
+
+Growth over a window is then a difference of cumulative sums over a periods ×
+values matrix, so "fastest-rising skills in the last 6 months" is answered from
+the rollups in milliseconds instead of rescanning the postings.
+
+Usage:
+    python market_rollups.py refresh ai_job_market_2024_2025_transformed.csv
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+from csv_ingest import HEAD_BYTES, head_digest, plan_ingest, read_csv_range, source_unchanged
+from market_snapshot import INGEST_CHUNK_ROWS, SNAPSHOT_DIR, snapshot_path
+
+logger = logging.getLogger("trend_agent")
+
+# Pandas period frequency of each granularity; weeks run Monday to Sunday
+GRANULARITIES = {"month": "M", "week": "W-SUN"}
+KINDS = ["skill", "role"]
+ROLLUP_COLUMNS = ["job_title", "required_skills", "posting_date"]
+# Values seen fewer times than this over both windows are too noisy to rank
+MIN_MOMENTUM_POSTINGS = int(os.getenv("TREND_MIN_MOMENTUM_POSTINGS", 30))
+
+# Rollups opened by this process: (rollups dir, granularity) -> (manifest mtime, MarketRollups)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def rollups_path(source: Path, root: Path = SNAPSHOT_DIR) -> Path:
+    return snapshot_path(source, root) / "rollups"
+
+
+def _aggregate_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Postings per (granularity, period, kind, value) of one chunk; undated postings are skipped."""
+    dates = pd.to_datetime(df["posting_date"], errors="coerce", format="ISO8601")
+    dated = dates.notna().to_numpy()
+    dates = dates[dated]
+    titles = df.loc[dated, "job_title"].astype(str).str.strip().str.lower()
+    skills = df.loc[dated, "required_skills"].astype(str).str.lower().str.split(",").explode().str.strip()
+    pairs = pd.DataFrame({"row": skills.index, "value": skills.to_numpy()})
+    pairs = pairs[pairs["value"].ne("") & pairs["value"].ne("nan")].drop_duplicates()
+
+    tables = []
+    for granularity, freq in GRANULARITIES.items():
+        period = dates.dt.to_period(freq).dt.start_time
+        rows = pd.concat([
+            pd.DataFrame({"period": period.to_numpy(), "kind": "total", "value": ""}),
+            pd.DataFrame({"period": period.to_numpy(), "kind": "role", "value": titles.to_numpy()}),
+            pd.DataFrame({"period": period.loc[pairs["row"]].to_numpy(), "kind": "skill", "value": pairs["value"].to_numpy()}),
+        ], ignore_index=True)
+        counts = rows.groupby(["period", "kind", "value"], sort=False).size().rename("postings").reset_index()
+        counts["period"] = counts["period"].dt.strftime("%Y-%m-%d")
+        tables.append(counts.assign(granularity=granularity))
+    return pd.concat(tables, ignore_index=True)
+
+
+def _merge(tables: list[pd.DataFrame], keys: list[str]) -> pd.DataFrame:
+    return pd.concat(tables, ignore_index=True).groupby(keys, sort=False)["postings"].sum().reset_index()
+
+
+def refresh_rollups(source, root: Path = SNAPSHOT_DIR) -> Path:
+    """
+    Bring the rollups of ``source`` up to date and return their directory.
+
+    Appended rows are merged into the partitions of the periods they fall in;
+    any other change to the file rebuilds all partitions.
+    """
+    source = Path(source).resolve()
+    path = rollups_path(source, root)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_file = path / "manifest.json"
+
+    with FileLock(str(path / ".lock")):
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8")) if manifest_file.exists() else None
+        if source_unchanged(source, manifest):
+            return path
+
+        # Taken before reading, so a change made while reading shows up on the next call
+        mtime_ns = source.stat().st_mtime_ns
+        header, incremental, end = plan_ingest(source, manifest, ROLLUP_COLUMNS)
+        offset = manifest["bytes_ingested"] if incremental else 0
+        if end <= offset:
+            return path
+
+        counts, rows = [], 0
+        for chunk in read_csv_range(source, header, offset, end, ROLLUP_COLUMNS, INGEST_CHUNK_ROWS):
+            counts.append(_aggregate_chunk(chunk))
+            rows += len(chunk)
+            if len(counts) > 8:
+                counts = [_merge(counts, ["granularity", "period", "kind", "value"])]
+
+        partitions = {g: dict(manifest["partitions"][g]) if incremental else {} for g in GRANULARITIES}
+        version = uuid.uuid4().hex[:8]
+        if counts:
+            new_counts = _merge(counts, ["granularity", "period", "kind", "value"])
+            for (granularity, period), table in new_counts.groupby(["granularity", "period"], sort=False):
+                table = table[["kind", "value", "postings"]]
+                if period in partitions[granularity]:
+                    table = _merge([pd.read_parquet(path / partitions[granularity][period]), table], ["kind", "value"])
+                name = f"{granularity}-{period}-{version}.parquet"
+                table.to_parquet(path / name, index=False)
+                partitions[granularity][period] = name
+
+        new_manifest = {
+            "source": str(source),
+            "columns": header,
+            "head_digest": head_digest(source, min(HEAD_BYTES, end)),
+            "bytes_ingested": end,
+            "source_mtime_ns": mtime_ns,
+            "rows_ingested": (manifest["rows_ingested"] if incremental else 0) + rows,
+            "partitions": partitions,
+        }
+        # The manifest switch is the commit point; untouched periods keep their files
+        tmp = path / f".manifest-{version}.json"
+        tmp.write_text(json.dumps(new_manifest), encoding="utf-8")
+        os.replace(tmp, manifest_file)
+        live = {name for periods in partitions.values() for name in periods.values()}
+        for stale in path.glob("*.parquet"):
+            if stale.name not in live:
+                stale.unlink(missing_ok=True)
+
+        logger.info(
+            f"{'Appended' if incremental else 'Built'} market rollups for {source.name}: "
+            f"{rows} postings read, {len(partitions['month'])} months"
+        )
+        return path
+
+
+@dataclass
+class Momentum:
+    window: int  # periods per window, at most half the history
+    since: str  # first period of the recent window
+    table: pd.DataFrame  # value, recent, previous, recent_share, previous_share, growth; fastest-rising first
+
+    def rising(self, top_n: int = 5) -> list[tuple[str, float]]:
+        rising = self.table[self.table["growth"] > 0].head(top_n)
+        return list(zip(rising["value"], rising["growth"]))
+
+
+class MarketRollups:
+    """Rollups of one granularity as periods × values count matrices."""
+
+    def __init__(self, counts: pd.DataFrame, granularity: str = "month"):
+        freq = GRANULARITIES[granularity]
+        periods = pd.PeriodIndex(pd.to_datetime(counts["period"]), freq=freq)
+        # Periods without postings are kept as zero rows so windows count calendar time
+        span = pd.period_range(periods.min(), periods.max(), freq=freq) if len(periods) else pd.PeriodIndex([], freq=freq)
+        self.granularity = granularity
+        self.periods = [p.start_time.strftime("%Y-%m-%d") for p in span]
+        rows = span.get_indexer(periods)
+        postings = counts["postings"].to_numpy(dtype=np.float64)
+
+        is_total = (counts["kind"] == "total").to_numpy()
+        self.totals = np.bincount(rows[is_total], weights=postings[is_total], minlength=len(span))
+        self.labels, self.counts = {}, {}
+        for kind in KINDS:
+            selected = (counts["kind"] == kind).to_numpy()
+            codes, labels = pd.factorize(counts.loc[selected, "value"], sort=True)
+            matrix = np.zeros((len(span), len(labels)))
+            np.add.at(matrix, (rows[selected], codes), postings[selected])
+            self.labels[kind], self.counts[kind] = list(labels), matrix
+
+    @classmethod
+    def load(cls, path: Path, granularity: str = "month") -> "MarketRollups":
+        manifest = json.loads((Path(path) / "manifest.json").read_text(encoding="utf-8"))
+        partitions = manifest["partitions"][granularity]
+        tables = [pd.read_parquet(Path(path) / name).assign(period=period) for period, name in partitions.items()]
+        counts = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(
+            {"period": [], "kind": [], "value": [], "postings": []})
+        return cls(counts, granularity)
+
+    def window_shares(self, kind: str, window: int) -> np.ndarray:
+        """Share of postings of each value over the ``window`` periods ending at each period."""
+        cumulative = np.vstack([np.zeros((1, len(self.labels[kind]))), np.cumsum(self.counts[kind], axis=0)])
+        total = np.concatenate([[0.0], np.cumsum(self.totals)])
+        sums = cumulative[window:] - cumulative[:-window]
+        totals = (total[window:] - total[:-window])[:, None]
+        return np.divide(sums, totals, out=np.zeros_like(sums), where=totals > 0)
+
+    def momentum(self, kind: str, window: int, min_postings: int = MIN_MOMENTUM_POSTINGS) -> Momentum | None:
+        """
+        Change in each value's share of postings over the last ``window``
+        periods against the ``window`` before, anchored at the latest period
+        with data. None when there are fewer than two periods.
+        """
+        window = min(window, len(self.periods) // 2)
+        if window < 1:
+            return None
+        counts = self.counts[kind]
+        shares = self.window_shares(kind, window)
+        recent_share, previous_share = shares[-1], shares[-1 - window]
+        recent = counts[-window:].sum(axis=0)
+        previous = counts[-2 * window:-window].sum(axis=0)
+        growth = np.divide(recent_share, previous_share, out=np.full_like(recent_share, np.inf),
+                           where=previous_share > 0) - 1
+        table = pd.DataFrame({
+            "value": self.labels[kind],
+            "recent": recent,
+            "previous": previous,
+            "recent_share": recent_share,
+            "previous_share": previous_share,
+            "growth": growth,
+        })
+        table = table[table["recent"] + table["previous"] >= min_postings]
+        table = table.sort_values(["growth", "recent"], ascending=False, kind="stable").reset_index(drop=True)
+        return Momentum(window=window, since=self.periods[-window], table=table)
+
+
+def get_rollups(source, granularity: str = "month", root: Path = SNAPSHOT_DIR) -> MarketRollups:
+    """Refresh the rollups of ``source`` if the file changed and return one granularity, cached per process."""
+    path = refresh_rollups(source, root)
+    stamp = (path / "manifest.json").stat().st_mtime_ns
+    key = (str(path), granularity)
+    with _loaded_lock:
+        cached = _loaded.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        rollups = MarketRollups.load(path, granularity)
+        _loaded[key] = (stamp, rollups)
+        return rollups
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Build or refresh the time-windowed rollups of a postings CSV.")
+    parser.add_argument("command", choices=["refresh"])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--snapshot-dir", type=Path, default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    print(refresh_rollups(args.source, args.snapshot_dir))
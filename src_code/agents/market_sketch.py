@@ -0,0 +1,354 @@
+"""
+Streaming market summaries built from mergeable per-title sketches.
+
+For postings feeds too large for the exact snapshot, one pass over the CSV
+builds, for every job title:
+
+* a log-bucketed salary histogram (DDSketch) whose quantiles are within
+  ``relative_accuracy`` of the true salary;
+* Misra-Gries summaries of its industries and skills, keeping the
+  ``capacity`` most frequent with counts within postings/(capacity + 1) of the
+  truth;
+* exact experience-level counts and salary count, sum, min and max.
+
+Like the snapshot's profiles, the sketches are keyed by title rather than by
+course, so a file is sketched once and every course is answered at query
+time from the titles and skills relevant to it. All parts merge, so byte
+ranges of the file are sketched on separate cores and combined, and a grown
+file only needs its appended bytes sketched. Size is bounded by the number of
+distinct titles times the sketch capacity, whatever the feed size.
+
+Usage:
+    python market_sketch.py build postings.csv --course "machine learning" --workers 8
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+from csv_ingest import HEAD_BYTES, complete_end, head_digest, plan_ingest, read_csv_range, source_unchanged
+from market_snapshot import REQUIRED_COLUMNS, SNAPSHOT_DIR, MarketSummary, snapshot_path
+
+logger = logging.getLogger("trend_agent")
+
+SKETCH_WORKERS = int(os.getenv("MARKET_SKETCH_WORKERS", os.cpu_count() or 1))
+SKETCH_CHUNK_ROWS = int(os.getenv("MARKET_SKETCH_CHUNK_ROWS", 250_000))
+SKETCH_RELATIVE_ACCURACY = float(os.getenv("MARKET_SKETCH_RELATIVE_ACCURACY", 0.01))
+# Industries and skills kept per title
+SKETCH_CAPACITY = int(os.getenv("MARKET_SKETCH_CAPACITY", 128))
+# Smallest byte range worth its own worker
+MIN_RANGE_BYTES = 8 * 2 ** 20
+
+# Table name -> key columns besides job_title
+TABLE_KEYS = {"salary": ["bucket"], "industries": ["industry"], "levels": ["experience_level"], "skills": ["skill"]}
+# Tables summarized by their most frequent values only
+PRUNED_TABLES = ("industries", "skills")
+
+# Sketches opened by this process: sketch dir -> (manifest mtime, MarketSketch)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def _chunk_tables(df: pd.DataFrame, gamma: float) -> dict[str, pd.DataFrame]:
+    """Per-title stats and counts of one chunk of postings."""
+    title = df["job_title"].fillna("").str.strip().str.lower()
+    salary = pd.to_numeric(df["salary_usd"], errors="coerce")
+    tables = {"stats": pd.DataFrame({"job_title": title, "salary": salary}).groupby("job_title", sort=False).agg(
+        postings=("salary", "size"),
+        salaried=("salary", "count"),
+        salary_sum=("salary", "sum"),
+        salary_min=("salary", "min"),
+        salary_max=("salary", "max"),
+    ).reset_index()}
+
+    def counts(frame: pd.DataFrame) -> pd.DataFrame:
+        return frame.groupby(list(frame.columns), sort=False).size().rename("count").reset_index()
+
+    positive = (salary > 0).to_numpy()
+    # Bucket i covers (gamma^(i-1), gamma^i]
+    buckets = np.ceil(np.log(salary.to_numpy()[positive]) / math.log(gamma)).astype(np.int64)
+    tables["salary"] = counts(pd.DataFrame({"job_title": title.to_numpy()[positive], "bucket": buckets}))
+    tables["industries"] = counts(pd.DataFrame({"job_title": title, "industry": df["industry"].astype(str)}))
+    tables["levels"] = counts(pd.DataFrame({"job_title": title, "experience_level": df["experience_level"].astype(str)}))
+
+    skills = df["required_skills"].fillna("").str.lower().str.split(",").explode().str.strip()
+    pairs = pd.DataFrame({"job_title": title[skills.index].to_numpy(), "skill": skills.to_numpy(), "row": skills.index})
+    pairs = pairs[pairs["skill"].ne("")].drop_duplicates(["row", "skill"])
+    tables["skills"] = counts(pairs[["job_title", "skill"]])
+    return tables
+
+
+def _prune(table: pd.DataFrame, capacity: int) -> pd.DataFrame:
+    """Misra-Gries step per title: keep the ``capacity`` largest counts, less the next largest."""
+    table = table.sort_values(["job_title", "count"], ascending=[True, False], kind="stable", ignore_index=True)
+    rank = table.groupby("job_title", sort=False).cumcount().to_numpy()
+    if (rank < capacity).all():
+        return table
+    cut = table["count"].where(rank == capacity).groupby(table["job_title"]).transform("max").fillna(0)
+    table = table.assign(count=table["count"] - cut)[rank < capacity]
+    return table[table["count"] > 0].reset_index(drop=True)
+
+
+def _merge_tables(parts: list[dict[str, pd.DataFrame]], capacity: int) -> dict[str, pd.DataFrame]:
+    stats = pd.concat([part["stats"] for part in parts], ignore_index=True)
+    merged = {"stats": stats.groupby("job_title").agg(
+        postings=("postings", "sum"),
+        salaried=("salaried", "sum"),
+        salary_sum=("salary_sum", "sum"),
+        salary_min=("salary_min", "min"),
+        salary_max=("salary_max", "max"),
+    ).reset_index()}
+    for name, keys in TABLE_KEYS.items():
+        table = pd.concat([part[name] for part in parts], ignore_index=True)
+        table = table.groupby(["job_title"] + keys, sort=False)["count"].sum().reset_index()
+        merged[name] = _prune(table, capacity) if name in PRUNED_TABLES else table
+    return merged
+
+
+class MarketSketch:
+    """Per-title sketches of one postings file, answering per-course queries."""
+
+    def __init__(self, tables: dict[str, pd.DataFrame] | None = None,
+                 relative_accuracy: float = SKETCH_RELATIVE_ACCURACY, capacity: int = SKETCH_CAPACITY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.capacity = capacity
+        self.tables = tables or _chunk_tables(pd.DataFrame(columns=REQUIRED_COLUMNS, dtype=str), self.gamma)
+        self._index()
+
+    def _index(self) -> None:
+        # Stats are sorted by title, so positions in ``titles`` line up with their rows
+        self.titles = self.tables["stats"]["job_title"].tolist()
+        self.skills = sorted(self.tables["skills"]["skill"].unique())
+        self.postings = int(self.tables["stats"]["postings"].sum())
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.merge_tables([_chunk_tables(df, self.gamma)])
+
+    def merge(self, other: "MarketSketch") -> None:
+        if (other.gamma, other.capacity) != (self.gamma, self.capacity):
+            raise ValueError("Cannot merge market sketches of different accuracy or capacity")
+        self.merge_tables([other.tables])
+
+    def merge_tables(self, parts: list[dict[str, pd.DataFrame]]) -> None:
+        self.tables = _merge_tables([self.tables] + parts, self.capacity)
+        self._index()
+
+    def profile_weights(self, keywords: list[str]) -> np.ndarray:
+        """Share of each title's postings whose title or a skill contains one of ``keywords``."""
+        title_match = np.array([any(k in t for k in keywords) for t in self.titles], dtype=bool)
+        skill_match = np.array([any(k in s for k in keywords) for s in self.skills], dtype=bool)
+        return self.match_weights(title_match, skill_match)
+
+    def match_weights(self, title_match: np.ndarray, skill_match: np.ndarray) -> np.ndarray:
+        """
+        Share of each title's postings relevant given boolean masks over
+        ``titles`` and ``skills``, as in ``MarketSnapshot.match_weights``.
+        Sketched skill counts are lower bounds, so skill-matched shares are too.
+        """
+        weights = np.asarray(title_match, dtype=np.float64)
+        if np.any(skill_match):
+            skills = self.tables["skills"]
+            matched = skills[skills["skill"].isin(np.asarray(self.skills, dtype=object)[skill_match])]
+            listed = matched.groupby("job_title")["count"].max().reindex(self.titles, fill_value=0)
+            postings = self.tables["stats"]["postings"].to_numpy(dtype=np.float64)
+            weights = np.maximum(weights, listed.to_numpy(dtype=np.float64) / np.maximum(postings, 1))
+        return weights
+
+    def summarize(self, weights: np.ndarray | None = None, top_n: int = 5, top_skills: int = 10) -> MarketSummary:
+        matched = weights is not None and bool(np.any(weights))
+        stats = self.tables["stats"]
+        if not matched:
+            weights = np.ones(len(stats))
+        by_title = pd.Series(weights, index=self.titles)
+
+        def weighted(name: str, key: str) -> pd.Series:
+            table = self.tables[name]
+            counts = table["count"] * table["job_title"].map(by_title).to_numpy()
+            return counts.groupby(table[key].to_numpy()).sum()
+
+        def top(counts: pd.Series, n: int) -> list[str]:
+            counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+            return counts.index[:n].tolist()
+
+        postings = stats["postings"] * weights
+        salaried = stats["salaried"] * weights
+        total = float(postings.sum())
+        levels = weighted("levels", "experience_level").sort_values(ascending=False, kind="stable")
+        has_salary = (salaried > 0).to_numpy()
+        return MarketSummary(
+            postings=total,
+            top_roles=top(pd.Series(postings.to_numpy(), index=self.titles), top_n),
+            top_industries=top(weighted("industries", "industry"), top_n),
+            top_skills=top(weighted("skills", "skill"), top_skills),
+            exp_dist={level: round(float(count / total * 100), 1) for level, count in levels.items() if count > 0},
+            avg_salary=float((stats["salary_sum"] * weights).sum() / salaried.sum()) if salaried.sum() else float("nan"),
+            salary_range=(
+                float(stats["salary_min"][has_salary].min()) if has_salary.any() else float("nan"),
+                float(stats["salary_max"][has_salary].max()) if has_salary.any() else float("nan"),
+            ),
+            salary_quantiles=self.salary_quantiles(weighted("salary", "bucket"), (0.1, 0.5, 0.9)),
+            matched=matched,
+        )
+
+    def salary_quantiles(self, buckets: pd.Series, qs) -> dict[str, float]:
+        """Quantiles of a weighted bucket histogram, within ``relative_accuracy`` of the true value."""
+        buckets = buckets[buckets > 0].sort_index()
+        cumulative = buckets.cumsum().to_numpy()
+        if not len(cumulative):
+            return {f"p{round(q * 100)}": float("nan") for q in qs}
+        result = {}
+        for q in qs:
+            i = min(int(np.searchsorted(cumulative, q * cumulative[-1])), len(cumulative) - 1)
+            # Bucket i covers (gamma^(i-1), gamma^i]; this estimate is within relative_accuracy of both ends
+            result[f"p{round(q * 100)}"] = float(2 * self.gamma ** int(buckets.index[i]) / (self.gamma + 1))
+        return result
+
+    def save(self, path: Path, version: str) -> dict[str, str]:
+        """Write the tables as Parquet files under ``path``; returns table name -> file name."""
+        files = {name: f"{name}-{version}.parquet" for name in self.tables}
+        for name, table in self.tables.items():
+            table.to_parquet(path / files[name], index=False)
+        return files
+
+    @classmethod
+    def load(cls, path: Path) -> "MarketSketch":
+        manifest = json.loads((Path(path) / "manifest.json").read_text(encoding="utf-8"))
+        tables = {name: pd.read_parquet(Path(path) / file) for name, file in manifest["tables"].items()}
+        return cls(tables, manifest["relative_accuracy"], manifest["capacity"])
+
+
+def sketch_range(source: str, header: list[str], start: int, end: int,
+                 chunk_rows: int = SKETCH_CHUNK_ROWS) -> MarketSketch:
+    """Sketch the complete CSV lines in bytes [start, end) of ``source`` (runs in worker processes)."""
+    sketch = MarketSketch()
+    text_columns = {"job_title": str, "required_skills": str, "industry": str, "experience_level": str}
+    parts = []
+    for chunk in read_csv_range(Path(source), header, start, end, REQUIRED_COLUMNS, chunk_rows, text_columns):
+        parts.append(_chunk_tables(chunk, sketch.gamma))
+        # Fold chunks in as we go so memory tracks titles, not postings
+        if len(parts) > 8:
+            sketch.merge_tables(parts)
+            parts = []
+    if parts:
+        sketch.merge_tables(parts)
+    return sketch
+
+
+def _byte_ranges(source: Path, start: int, end: int, parts: int) -> list[tuple[int, int]]:
+    """Split [start, end) into about ``parts`` ranges that each end on a line boundary."""
+    parts = max(1, min(parts, (end - start) // MIN_RANGE_BYTES))
+    cuts = [start]
+    for i in range(1, parts):
+        cut = complete_end(source, start + (end - start) * i // parts)
+        if cut > cuts[-1]:
+            cuts.append(cut)
+    cuts.append(end)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def sketch_file(source: Path, header: list[str], start: int, end: int,
+                workers: int = SKETCH_WORKERS) -> MarketSketch:
+    """Sketch bytes [start, end) of ``source``, split across ``workers`` processes and merged."""
+    ranges = _byte_ranges(source, start, end, workers)
+    if len(ranges) == 1:
+        return sketch_range(str(source), header, start, end)
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(sketch_range, str(source), header, lo, hi) for lo, hi in ranges]
+        sketch = MarketSketch()
+        sketch.merge_tables([future.result().tables for future in futures])
+    return sketch
+
+
+def sketch_path(source: Path, root: Path = SNAPSHOT_DIR) -> Path:
+    return snapshot_path(source, root) / "sketch"
+
+
+def refresh_sketch(source, root: Path = SNAPSHOT_DIR, workers: int = SKETCH_WORKERS) -> Path:
+    """
+    Bring the market sketch of ``source`` up to date and return its directory.
+
+    When the file only grew since the stored sketch, the appended bytes are
+    sketched and merged in; any other change re-sketches the whole file.
+    """
+    source = Path(source).resolve()
+    path = sketch_path(source, root)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_file = path / "manifest.json"
+
+    # Concurrent calls wait for one sketch pass instead of each running their own
+    with FileLock(str(path / ".lock")):
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8")) if manifest_file.exists() else None
+        if source_unchanged(source, manifest):
+            return path
+
+        # Taken before reading, so a change made while reading shows up on the next call
+        mtime_ns = source.stat().st_mtime_ns
+        header, incremental, end = plan_ingest(source, manifest, REQUIRED_COLUMNS)
+        incremental = incremental and (manifest["relative_accuracy"], manifest["capacity"]) == (
+            SKETCH_RELATIVE_ACCURACY, SKETCH_CAPACITY)
+        offset = manifest["bytes_ingested"] if incremental else 0
+        if end <= offset:
+            return path
+
+        sketch = MarketSketch.load(path) if incremental else MarketSketch()
+        sketch.merge(sketch_file(source, header, offset, end, workers))
+
+        version = uuid.uuid4().hex[:8]
+        new_manifest = {
+            "source": str(source),
+            "columns": header,
+            "head_digest": head_digest(source, min(HEAD_BYTES, end)),
+            "bytes_ingested": end,
+            "source_mtime_ns": mtime_ns,
+            "relative_accuracy": SKETCH_RELATIVE_ACCURACY,
+            "capacity": SKETCH_CAPACITY,
+            "tables": sketch.save(path, version),
+        }
+        # The manifest switch is the commit point; the tables it names are complete
+        tmp = path / f".manifest-{version}.json"
+        tmp.write_text(json.dumps(new_manifest), encoding="utf-8")
+        os.replace(tmp, manifest_file)
+        for stale in path.glob("*.parquet"):
+            if stale.name not in new_manifest["tables"].values():
+                stale.unlink(missing_ok=True)
+
+        logger.info(f"{'Extended' if incremental else 'Built'} market sketch of {source.name} "
+                    f"({sketch.postings} postings, {len(sketch.titles)} titles)")
+        return path
+
+
+def get_market_sketch(source, root: Path = SNAPSHOT_DIR, workers: int = SKETCH_WORKERS) -> MarketSketch:
+    """Refresh the market sketch of ``source`` if the file changed and return it, cached per process."""
+    path = refresh_sketch(source, root, workers)
+    stamp = (path / "manifest.json").stat().st_mtime_ns
+    with _loaded_lock:
+        cached = _loaded.get(str(path))
+        if cached and cached[0] == stamp:
+            return cached[1]
+        sketch = MarketSketch.load(path)
+        _loaded[str(path)] = (stamp, sketch)
+        return sketch
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Build or extend the streaming market sketch of a postings CSV.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--course", help="Summarize the postings relevant to this course")
+    parser.add_argument("--workers", type=int, default=SKETCH_WORKERS)
+    parser.add_argument("--snapshot-dir", type=Path, default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    sketch = get_market_sketch(args.source, args.snapshot_dir, args.workers)
+    print(sketch.summarize(sketch.profile_weights(args.course.lower().split()) if args.course else None))
@@ -0,0 +1,308 @@
+"""
+Precomputed job-market snapshot for the trend agent.
+
+A postings CSV (the ``transform_job_trend_data`` output) is ingested once into
+two aggregate tables, saved as Parquet next to a manifest:
+
+* profiles: postings per (job title, industry, experience level, salary
+  bucket, log-spaced salary bin) with salary count, sum, min and max;
+* profile skills: postings per profile and skill.
+
+Their size is bounded by the number of distinct profiles, not postings, so a
+per-course query costs the same for ten thousand or a hundred million rows.
+When the CSV only grew since the last refresh, just the appended bytes are
+read and merged in.
+
+Usage:
+    python market_snapshot.py refresh ai_job_market_2024_2025_transformed.csv
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+from scipy import sparse
+
+from csv_ingest import HEAD_BYTES, head_digest, plan_ingest, read_csv_range, source_unchanged
+
+logger = logging.getLogger("trend_agent")
+
+SNAPSHOT_DIR = Path(os.getenv("MARKET_SNAPSHOT_DIR", "./market_snapshots"))
+INGEST_CHUNK_ROWS = int(os.getenv("MARKET_SNAPSHOT_CHUNK_ROWS", 250_000))
+# Log-spaced salary histogram used for quantiles; ~7% wide bins over 1K–10M USD
+SALARY_HIST_BINS = 128
+SALARY_EDGES = np.logspace(3, 7, SALARY_HIST_BINS + 1)
+
+PROFILE_KEYS = ["job_title", "industry", "experience_level", "salary_bucket", "salary_bin"]
+REQUIRED_COLUMNS = ["job_title", "required_skills", "salary_usd", "experience_level", "industry", "salary_bucket"]
+
+# Snapshots opened by this process: snapshot dir -> (manifest mtime, MarketSnapshot)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def snapshot_path(source: Path, root: Path = SNAPSHOT_DIR) -> Path:
+    source = Path(source).resolve()
+    return Path(root) / f"{source.stem[:60]}-{hashlib.sha256(str(source).encode('utf-8')).hexdigest()[:10]}"
+
+
+def _aggregate_chunk(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Profile and profile-skill counts of one chunk of postings."""
+    df = pd.DataFrame({
+        "job_title": df["job_title"].astype(str).str.strip().str.lower(),
+        "industry": df["industry"].astype(str),
+        "experience_level": df["experience_level"].astype(str),
+        "salary_bucket": df["salary_bucket"].astype(str),
+        "salary_usd": pd.to_numeric(df["salary_usd"], errors="coerce"),
+        "required_skills": df["required_skills"].astype(str).str.lower(),
+    })
+    salary = df["salary_usd"].to_numpy(dtype=np.float64)
+    bins = np.searchsorted(SALARY_EDGES, salary, side="right") - 1
+    df["salary_bin"] = np.where(np.isnan(salary), -1, np.clip(bins, 0, SALARY_HIST_BINS - 1)).astype(np.int16)
+
+    profiles = df.groupby(PROFILE_KEYS, sort=False).agg(
+        postings=("salary_usd", "size"),
+        salaried=("salary_usd", "count"),
+        salary_sum=("salary_usd", "sum"),
+        salary_min=("salary_usd", "min"),
+        salary_max=("salary_usd", "max"),
+    ).reset_index()
+
+    skills = df["required_skills"].str.split(",").explode().str.strip()
+    pairs = df.loc[skills.index, PROFILE_KEYS].assign(skill=skills.to_numpy(), row=skills.index)
+    pairs = pairs[pairs["skill"].ne("") & pairs["skill"].ne("nan")].drop_duplicates(["row", "skill"])
+    profile_skills = pairs.groupby(PROFILE_KEYS + ["skill"], sort=False).size().rename("postings").reset_index()
+    return profiles, profile_skills
+
+
+def _merge(tables: list[pd.DataFrame], keys: list[str]) -> pd.DataFrame:
+    merged = pd.concat(tables, ignore_index=True)
+    aggs = {"postings": "sum"}
+    if "salary_sum" in merged.columns:
+        aggs.update(salaried="sum", salary_sum="sum", salary_min="min", salary_max="max")
+    return merged.groupby(keys, sort=False).agg(aggs).reset_index()
+
+
+def refresh_snapshot(source, root: Path = SNAPSHOT_DIR) -> Path:
+    """
+    Bring the snapshot of ``source`` up to date and return its directory.
+
+    Appended rows are merged into the existing aggregates; any other change to
+    the file (truncation, rewritten head, different columns) rebuilds them.
+    """
+    source = Path(source).resolve()
+    path = snapshot_path(source, root)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_file = path / "manifest.json"
+
+    with FileLock(str(path / ".lock")):
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8")) if manifest_file.exists() else None
+        if source_unchanged(source, manifest):
+            return path
+
+        # Taken before reading, so a change made while reading shows up on the next call
+        mtime_ns = source.stat().st_mtime_ns
+        header, incremental, end = plan_ingest(source, manifest, REQUIRED_COLUMNS)
+        incremental = incremental and manifest["salary_hist_bins"] == SALARY_HIST_BINS
+        offset = manifest["bytes_ingested"] if incremental else 0
+        if end <= offset:
+            return path
+
+        profiles, profile_skills = [], []
+        if incremental:
+            profiles.append(pd.read_parquet(path / manifest["profiles"]))
+            profile_skills.append(pd.read_parquet(path / manifest["profile_skills"]))
+        rows = 0
+        for chunk in read_csv_range(source, header, offset, end, REQUIRED_COLUMNS, INGEST_CHUNK_ROWS):
+            chunk_profiles, chunk_skills = _aggregate_chunk(chunk)
+            profiles.append(chunk_profiles)
+            profile_skills.append(chunk_skills)
+            rows += len(chunk)
+            # Fold chunks in as we go so memory tracks profiles, not postings
+            if len(profiles) > 8:
+                profiles = [_merge(profiles, PROFILE_KEYS)]
+                profile_skills = [_merge(profile_skills, PROFILE_KEYS + ["skill"])]
+
+        version = uuid.uuid4().hex[:8]
+        new_manifest = {
+            "source": str(source),
+            "columns": header,
+            "head_digest": head_digest(source, min(HEAD_BYTES, end)),
+            "bytes_ingested": end,
+            "source_mtime_ns": mtime_ns,
+            "rows_ingested": (manifest["rows_ingested"] if incremental else 0) + rows,
+            "salary_hist_bins": SALARY_HIST_BINS,
+            "profiles": f"profiles-{version}.parquet",
+            "profile_skills": f"profile_skills-{version}.parquet",
+        }
+        _merge(profiles, PROFILE_KEYS).to_parquet(path / new_manifest["profiles"], index=False)
+        _merge(profile_skills, PROFILE_KEYS + ["skill"]).to_parquet(path / new_manifest["profile_skills"], index=False)
+        # The manifest switch is the commit point; the tables it names are complete
+        tmp = path / f".manifest-{version}.json"
+        tmp.write_text(json.dumps(new_manifest), encoding="utf-8")
+        os.replace(tmp, manifest_file)
+        for stale in path.glob("*.parquet"):
+            if stale.name not in (new_manifest["profiles"], new_manifest["profile_skills"]):
+                stale.unlink(missing_ok=True)
+
+        logger.info(
+            f"{'Appended' if incremental else 'Built'} market snapshot for {source.name}: "
+            f"{rows} postings read, {new_manifest['rows_ingested']} total"
+        )
+        return path
+
+
+@dataclass
+class MarketSummary:
+    postings: float
+    top_roles: list[str]
+    top_industries: list[str]
+    top_skills: list[str]
+    exp_dist: dict[str, float]
+    avg_salary: float
+    salary_range: tuple[float, float]
+    salary_quantiles: dict[str, float]
+    matched: bool  # False when nothing matched and the whole market is reported
+
+
+class MarketSnapshot:
+    """Aggregate tables of one snapshot as arrays, answering per-course queries."""
+
+    def __init__(self, profiles: pd.DataFrame, profile_skills: pd.DataFrame):
+        self.titles, title_codes = _factorize(profiles["job_title"])
+        self.industries, self.industry_codes = _factorize(profiles["industry"])
+        self.levels, self.level_codes = _factorize(profiles["experience_level"])
+        self.title_codes = title_codes
+        self.salary_bin = profiles["salary_bin"].to_numpy()
+        self.postings = profiles["postings"].to_numpy(dtype=np.float64)
+        self.salaried = profiles["salaried"].to_numpy(dtype=np.float64)
+        self.salary_sum = profiles["salary_sum"].to_numpy(dtype=np.float64)
+        self.salary_min = profiles["salary_min"].to_numpy(dtype=np.float64)
+        self.salary_max = profiles["salary_max"].to_numpy(dtype=np.float64)
+
+        profile_index = pd.MultiIndex.from_frame(profiles[PROFILE_KEYS])
+        rows = profile_index.get_indexer(pd.MultiIndex.from_frame(profile_skills[PROFILE_KEYS]))
+        self.skills, skill_codes = _factorize(profile_skills["skill"])
+        # profiles × skills: postings of each profile listing each skill
+        self.skill_counts = sparse.csr_matrix(
+            (profile_skills["postings"].to_numpy(dtype=np.float64), (rows, skill_codes)),
+            shape=(len(profiles), len(self.skills)),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "MarketSnapshot":
+        manifest = json.loads((Path(path) / "manifest.json").read_text(encoding="utf-8"))
+        return cls(pd.read_parquet(Path(path) / manifest["profiles"]),
+                   pd.read_parquet(Path(path) / manifest["profile_skills"]))
+
+    def profile_weights(self, keywords: list[str]) -> np.ndarray:
+        """Share of each profile's postings whose title or a skill contains one of ``keywords``."""
+        title_match = np.array([any(k in t for k in keywords) for t in self.titles], dtype=bool)
+        skill_match = np.array([any(k in s for k in keywords) for s in self.skills], dtype=bool)
+        return self.match_weights(title_match, skill_match)
+
+    def match_weights(self, title_match: np.ndarray, skill_match: np.ndarray) -> np.ndarray:
+        """
+        Share of each profile's postings relevant given boolean masks over
+        ``titles`` and ``skills``.
+
+        A posting is relevant when its title or one of its skills matches.
+        Title matches count fully; skill matches count the profile's postings
+        listing the best-matching skill, which is exact for one matching skill
+        and a lower bound for several.
+        """
+        weights = title_match[self.title_codes].astype(np.float64)
+        if skill_match.any():
+            listed = self.skill_counts[:, np.flatnonzero(skill_match)].max(axis=1).toarray().ravel()
+            weights = np.maximum(weights, listed / np.maximum(self.postings, 1))
+        return weights
+
+    def summarize(self, weights: np.ndarray | None = None, top_n: int = 5, top_skills: int = 10) -> MarketSummary:
+        matched = weights is not None and bool(weights.any())
+        if not matched:
+            weights = np.ones_like(self.postings)
+        postings = self.postings * weights
+        salaried = self.salaried * weights
+        total = postings.sum()
+
+        def top(codes, labels, n):
+            counts = np.bincount(codes, weights=postings, minlength=len(labels))
+            order = np.argsort(-counts, kind="stable")[:n]
+            return [labels[i] for i in order if counts[i] > 0]
+
+        level_counts = np.bincount(self.level_codes, weights=postings, minlength=len(self.levels))
+        exp_dist = {
+            self.levels[i]: round(float(level_counts[i] / total * 100), 1)
+            for i in np.argsort(-level_counts, kind="stable") if level_counts[i] > 0
+        }
+        skill_totals = self.skill_counts.T @ weights
+        skill_order = np.argsort(-skill_totals, kind="stable")[:top_skills]
+
+        has_salary = (salaried > 0)
+        return MarketSummary(
+            postings=float(total),
+            top_roles=top(self.title_codes, self.titles, top_n),
+            top_industries=top(self.industry_codes, self.industries, top_n),
+            top_skills=[self.skills[i] for i in skill_order if skill_totals[i] > 0],
+            exp_dist=exp_dist,
+            avg_salary=float((self.salary_sum * weights).sum() / salaried.sum()) if salaried.sum() else float("nan"),
+            salary_range=(
+                float(self.salary_min[has_salary].min()) if has_salary.any() else float("nan"),
+                float(self.salary_max[has_salary].max()) if has_salary.any() else float("nan"),
+            ),
+            salary_quantiles=self.salary_quantiles(salaried, (0.1, 0.5, 0.9)),
+            matched=matched,
+        )
+
+    def salary_quantiles(self, salaried: np.ndarray, qs) -> dict[str, float]:
+        """Quantiles from the log-binned salary histogram, interpolated within bins."""
+        valid = self.salary_bin >= 0
+        hist = np.bincount(self.salary_bin[valid], weights=salaried[valid], minlength=SALARY_HIST_BINS)
+        cumulative = np.cumsum(hist)
+        if not cumulative[-1]:
+            return {f"p{round(q * 100)}": float("nan") for q in qs}
+        result = {}
+        for q in qs:
+            target = q * cumulative[-1]
+            b = int(np.searchsorted(cumulative, target))
+            before = cumulative[b - 1] if b else 0.0
+            fraction = (target - before) / hist[b] if hist[b] else 0.0
+            lo, hi = np.log(SALARY_EDGES[b]), np.log(SALARY_EDGES[b + 1])
+            result[f"p{round(q * 100)}"] = float(np.exp(lo + fraction * (hi - lo)))
+        return result
+
+
+def _factorize(values: pd.Series) -> tuple[list[str], np.ndarray]:
+    codes, labels = pd.factorize(values, sort=True)
+    return list(labels), codes
+
+
+def get_snapshot(source, root: Path = SNAPSHOT_DIR) -> MarketSnapshot:
+    """Refresh the snapshot of ``source`` if the file changed and return it, cached per process."""
+    path = refresh_snapshot(source, root)
+    stamp = (path / "manifest.json").stat().st_mtime_ns
+    with _loaded_lock:
+        cached = _loaded.get(str(path))
+        if cached and cached[0] == stamp:
+            return cached[1]
+        snapshot = MarketSnapshot.load(path)
+        _loaded[str(path)] = (stamp, snapshot)
+        return snapshot
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Build or refresh the market snapshot of a postings CSV.")
+    parser.add_argument("command", choices=["refresh"])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--snapshot-dir", type=Path, default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+    print(refresh_snapshot(args.source, args.snapshot_dir))
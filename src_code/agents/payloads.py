@@ -0,0 +1,227 @@
+"""
+Structured payloads of the analysis agents.
+
+The feedback, performance and trend tools return their results as a typed
+``data`` payload: aggregates and lists as separate fields, with the LLM's
+analysis as plain text in ``analysis``. Markdown is rendered from a payload
+only where it is shown or saved (``render_markdown``). Downstream agents take
+the payloads themselves, so the recommender prompt carries just the fields it
+needs as compact JSON instead of numbers re-read from prose.
+"""
+import json
+import math
+from typing import Literal, TypedDict
+
+import pandas as pd
+
+from rating_aggregation import format_group_table
+
+PAYLOAD_VERSION = 1
+
+# complete: ``analysis`` holds the LLM narrative; otherwise it is empty and the
+# report is quantitative-only for now (pending), by request (skipped) or because
+# the LLM failed or its circuit is open (unavailable)
+AnalysisStatus = Literal["complete", "pending", "skipped", "unavailable"]
+ANALYSIS_PLACEHOLDERS = {
+    "pending": "_AI analysis in progress; this report holds the figures only for now._",
+    "skipped": "_AI analysis skipped; quantitative report only._",
+    "unavailable": "_AI analysis unavailable right now; the figures above are complete._",
+}
+
+
+class FeedbackPayload(TypedDict):
+    kind: Literal["feedback"]
+    version: int
+    course_name: str
+    responses: int
+    avg_rating: dict[str, float]
+    std_dev: dict[str, float]
+    rating_distribution: dict[str, list[int]]
+    strong_areas: list[str]
+    weak_areas: list[str]
+    group_by: list[str] | None
+    group_means: list[dict] | None  # one row per group: its keys, "responses", the mean per rating column
+                                    # (None without ratings), "weak_areas" and "strong_areas"
+    avg_sentiment: float | None  # None without any feedback text
+    positive_count: int
+    negative_count: int
+    analysis: str
+    analysis_status: AnalysisStatus
+
+
+class PerformancePayload(TypedDict):
+    kind: Literal["performance"]
+    version: int
+    course_name: str
+    records: int
+    averages: dict[str, float]  # marks, gpa, attendance, percentage
+    grade_counts: dict[str, int]
+    correlations: dict[str, float]  # attendance_marks, gpa_marks
+    top_students: list[dict]
+    low_students: list[dict]
+    at_risk: dict  # records, flagged, share, cohorts, highest_risk
+    analysis: str
+    analysis_status: AnalysisStatus
+
+
+class TrendPayload(TypedDict):
+    kind: Literal["trends"]
+    version: int
+    course_name: str
+    scope: dict  # matched, postings, relevant_terms
+    top_industries: list[str]
+    top_roles: list[str]
+    top_skills: list[str]
+    avg_salary: float
+    salary_range: list[float]
+    salary_quantiles: dict[str, float]
+    exp_dist: dict[str, float]
+    momentum: dict  # months, rising_skills and rising_roles as [value, growth] pairs
+    analysis: str
+    analysis_status: AnalysisStatus
+
+
+# Fields of each payload the recommender's prompt needs; names and per-student lists stay out
+RECOMMENDER_FIELDS = {
+    "feedback": ["avg_rating", "strong_areas", "weak_areas", "avg_sentiment", "positive_count", "negative_count"],
+    "performance": ["records", "averages", "grade_counts", "correlations", "at_risk.flagged", "at_risk.share",
+                    "at_risk.cohorts"],
+    "trends": ["scope.matched", "top_roles", "top_skills", "top_industries", "avg_salary", "salary_quantiles",
+               "exp_dist", "momentum"],
+}
+
+
+def query_terms(payload: dict) -> list[str]:
+    """The listed weak areas and skills of a payload, each worth its own retrieval query."""
+    terms = list(payload.get("weak_areas") or []) + list(payload.get("top_skills") or [])
+    terms += [value for value, _ in (payload.get("momentum") or {}).get("rising_skills", [])]
+    return terms
+
+
+def number(value, digits: int = 4) -> float | None:
+    """A JSON-safe float: rounded, with NaN and infinities as None."""
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def records(frame: pd.DataFrame) -> list[dict]:
+    """JSON-safe rows of ``frame``, with NaN as None."""
+    return [{key: None if isinstance(value, float) and math.isnan(value) else value for key, value in row.items()}
+            for row in frame.to_dict(orient="records")]
+
+
+def as_payload(value) -> dict | None:
+    """The payload in ``value`` (a dict or its JSON text), or None for a plain markdown summary."""
+    if isinstance(value, dict):
+        return value if "kind" in value else None
+    if isinstance(value, str) and value.lstrip().startswith("{"):
+        try:
+            parsed = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) and "kind" in parsed else None
+    return None
+
+
+def select_fields(payload: dict, fields: list[str]) -> dict:
+    """The ``fields`` of ``payload``; "a.b" picks key b of dict field a."""
+    selected = {}
+    for field in fields:
+        head, _, tail = field.partition(".")
+        if head not in payload:
+            continue
+        if tail:
+            if isinstance(payload[head], dict) and tail in payload[head]:
+                selected.setdefault(head, {})[tail] = payload[head][tail]
+        else:
+            selected[head] = payload[head]
+    return selected
+
+
+def prompt_view(value, fields: dict[str, list[str]] = RECOMMENDER_FIELDS) -> str:
+    """
+    Prompt text for one agent result: the needed fields as compact JSON followed
+    by the analysis. Plain markdown summaries are passed through unchanged.
+    """
+    payload = as_payload(value)
+    if payload is None:
+        return str(value)
+    facts = json.dumps(select_fields(payload, fields.get(payload["kind"], [])), separators=(",", ":"))
+    return f"Facts: {facts}\nAnalysis:\n{payload.get('analysis', '')}"
+
+
+def _analysis(p: dict) -> str:
+    return ANALYSIS_PLACEHOLDERS.get(p.get("analysis_status", "complete"), p["analysis"])
+
+
+def _money(value) -> str:
+    return f"${value:,.2f}" if value is not None else "n/a"
+
+
+def _fixed(value, spec: str) -> str:
+    return format(value, spec) if value is not None else "n/a"
+
+
+def _percent(value) -> str:
+    return f"{value * 100:.1f}%" if value is not None else "new"
+
+
+def render_feedback(p: FeedbackPayload) -> str:
+    def label(col):
+        return col.replace("_", " ").title()
+
+    avg_rating_str = '\n'.join([f'- **{label(key)}:** {_fixed(value, ".2f")}' for key, value in p["avg_rating"].items()])
+    std_dev_str = '\n'.join([f'- **{label(key)}:** {_fixed(value, ".3f")}' for key, value in p["std_dev"].items()])
+    strong_areas_str = ', '.join(p["strong_areas"]) if p["strong_areas"] else 'None'
+    weak_areas_str = ', '.join(p["weak_areas"]) if p["weak_areas"] else 'None'
+    group_str = ""
+    if p.get("group_means"):
+        table = pd.DataFrame(p["group_means"]).set_index(p["group_by"])
+        group_str = f"### **Mean Ratings by {', '.join(p['group_by'])}**\n{format_group_table(table)}\n"
+
+    return f"""# Feedback Report for {p["course_name"]}\n## 📊 Quantitative Insights\n### **Average Ratings**\n{avg_rating_str}\n### **Standard Deviation**\n{std_dev_str}\n{group_str}**Strong Areas:** {strong_areas_str}\n**Weak Areas:** {weak_areas_str}\n---\n## 🧠 Sentiment Analysis\n- **Average Sentiment:** {_fixed(p["avg_sentiment"], ".2f")}\n- **Positive Feedback Count:** {p["positive_count"]}\n- **Negative Feedback Count:** {p["negative_count"]}\n---\n- {_analysis(p)}"""
+
+
+def render_performance(p: PerformancePayload) -> str:
+    averages, correlations, at_risk = p["averages"], p["correlations"], p["at_risk"]
+    grade_dist_str = '\n'.join([f'  - {grade}: {count}' for grade, count in p["grade_counts"].items()])
+    top_performers_str = '\n'.join([f'- {student["student_name"]}: {student["percentage"]:.1f}%' for student in p["top_students"]])
+    low_performers_str = '\n'.join([f'- {student["student_name"]}: {student["percentage"]:.1f}%' for student in p["low_students"]])
+    cohort_risk_str = '\n'.join([f'  - {c["course"]} ({c["semester"]}): {c["at_risk"]} of {c["records"]}' for c in at_risk["cohorts"]])
+    highest_risk_str = '\n'.join([f'- {student["student_name"]} ({student["semester"]}): {student["reasons"]}' for student in at_risk["highest_risk"]])
+
+    return f"""# Performance Report for {p["course_name"]}\n## 📊 Quantitative Summary\n- **Average Marks:** {_fixed(averages["marks"], ".2f")}\n- **GPA:** {_fixed(averages["gpa"], ".2f")}\n- **Attendance:** {_fixed(averages["attendance"], ".2f")}%\n- **Average Percentage:** {_fixed(averages["percentage"], ".2f")}%\n- **Grade Distribution:**\n{grade_dist_str}\n- **Correlation (Attendance vs Marks):** {_fixed(correlations["attendance_marks"], ".2f")}\n- **Correlation (GPA vs Marks):** {_fixed(correlations["gpa_marks"], ".2f")}\n---\n## 🏅 Top Performers\n{top_performers_str}\n---\n## ⚠️ Low Performers\n{low_performers_str}\n---\n## 🚨 At-Risk Students\n- **Flagged:** {at_risk["flagged"]} of {at_risk["records"]} ({at_risk["share"]:.1f}%)\n- **By Cohort:**\n{cohort_risk_str}\n- **Highest Risk:**\n{highest_risk_str}\n---\n## 💬 Gemini AI Summary\n{_analysis(p)}"""
+
+
+def format_rising(pairs: list) -> str:
+    """``"a (+12.0%), b (+8.5%)"`` for [value, growth] pairs, or ``"n/a"``."""
+    if not pairs:
+        return "n/a"
+    return ", ".join(f"{value} (+{_percent(growth)})" if growth is not None else f"{value} (new)"
+                     for value, growth in pairs)
+
+
+def render_trends(p: TrendPayload) -> str:
+    scope, quantiles, momentum = p["scope"], p["salary_quantiles"], p["momentum"]
+    if not scope["matched"]:
+        scope_str = "No postings matched this course; figures cover the whole market"
+    elif scope["relevant_terms"]:
+        scope_str = f"{scope['postings']:,.0f} postings matching {', '.join(scope['relevant_terms'][:10])}"
+    else:
+        scope_str = f"{scope['postings']:,.0f} postings matching the course keywords"
+    exp_dist_str = '\n'.join([f'  - {key}: {_fixed(value, ".1f")}%' for key, value in p["exp_dist"].items()])
+    low, high = p["salary_range"]
+    percentiles = " / ".join(f"${quantiles[k]:,.0f}" if quantiles.get(k) is not None else "n/a" for k in ("p10", "p50", "p90"))
+
+    return f"""# Industry Trend Report for {p["course_name"]}\n## 📊 Quantitative Insights\n- **Scope:** {scope_str}\n- **Top Industries:** {', '.join(p["top_industries"])}\n- **Top Roles:** {', '.join(p["top_roles"])}\n- **Top Skills:** {', '.join(p["top_skills"])}\n- **Average Salary:** {_money(p["avg_salary"])}\n- **Salary Range:** {_money(low)} - {_money(high)}\n- **Salary Percentiles (p10 / p50 / p90):** {percentiles}\n- **Experience Distribution:**\n{exp_dist_str}\n- **Fastest-Rising Skills (last {momentum["months"]} months):** {format_rising(momentum["rising_skills"])}\n- **Fastest-Rising Roles (last {momentum["months"]} months):** {format_rising(momentum["rising_roles"])}\n---\n## 💬 Gemini AI Analysis\n{_analysis(p)}"""
+
+
+RENDERERS = {"feedback": render_feedback, "performance": render_performance, "trends": render_trends}
+
+
+def render_markdown(value) -> str:
+    """Markdown report of a payload; plain markdown summaries are returned as they are."""
+    payload = as_payload(value)
+    if payload is None:
+        return "" if value is None else str(value)
+    return RENDERERS[payload["kind"]](payload)
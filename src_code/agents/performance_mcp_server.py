@@ -1,4 +1,6 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
+from typing import Any
 import os
 import pandas as pd
 import numpy as np
@@ -6,6 +8,10 @@ import logging
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from deadlines import DeadlineExceeded, run_until
+from llm_fallback import check_mode, finish_report, narrative_result
+from payloads import PAYLOAD_VERSION, PerformancePayload, number
+from risk_scores import at_risk_page, get_at_risk, risk_reasons
 
 # ============================================
 # 🚀 Setup
@@ -23,11 +29,10 @@ server.settings.host = "localhost"
 # ============================================
 # 🧠 Tool Definition
 # ============================================
-@server.tool()
-def evaluate_performance(course_name: str, file_path: str, output_path: str) -> dict[str, float | str]:
+def build_performance_report(course_name: str, file_path: str) -> dict:
     """
-    Analyze student performance in a given course using descriptive statistics and
-    Google Gemini for qualitative interpretation.
+    Blocking analysis behind ``evaluate_performance``; returns the structured
+    result without its LLM narrative, plus the narrative's prompt.
     """
     try:
         if not os.path.isfile(file_path):
@@ -74,15 +79,17 @@ def evaluate_performance(course_name: str, file_path: str, output_path: str) ->
         top_students = df.nlargest(3, "percentage")[["student_name", "percentage"]].to_dict(orient="records")
         low_students = df.nsmallest(3, "percentage")[["student_name", "percentage"]].to_dict(orient="records")
 
+        # At-risk students, scored against their course and semester cohort and kept up to date on disk
+        risk_manifest, at_risk = get_at_risk(file_path)
+        at_risk_share = risk_manifest["at_risk_records"] / max(risk_manifest["records"], 1) * 100
+        highest_risk = [
+            {"student_name": str(r["student_name"]), "semester": str(r["semester"]), "reasons": risk_reasons(r)}
+            for r in at_risk.head(5).to_dict(orient="records")
+        ]
+
         # ============================================
-        # 🧠 Gemini AI-Based Qualitative Analysis
+        # 🧠 Gemini Prompt; the narrative itself is added by the tool
         # ============================================
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.4,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
-
         prompt = ChatPromptTemplate.from_template("""
         You are an educational performance analyst AI using Google Gemini.
         Analyze the following quantitative data for the course "{course_name}".
@@ -97,6 +104,7 @@ def evaluate_performance(course_name: str, file_path: str, output_path: str) ->
 
         Top Performing Students: {top_students}
         Low Performing Students: {low_students}
+        At-Risk Students: {at_risk_count} of {record_count} ({at_risk_share:.1f}%); highest risk: {highest_risk}
 
         Tasks:
         1️⃣ Identify learning and performance trends.
@@ -115,37 +123,113 @@ def evaluate_performance(course_name: str, file_path: str, output_path: str) ->
             corr_gpa_marks=corr_gpa_marks,
             grade_counts=grade_counts,
             top_students=top_students,
-            low_students=low_students
+            low_students=low_students,
+            at_risk_count=risk_manifest["at_risk_records"],
+            record_count=risk_manifest["records"],
+            at_risk_share=at_risk_share,
+            highest_risk=highest_risk,
         )
 
-        logger.info("🤖 Sending analysis to Gemini...")
-        ai_response = llm.invoke(formatted_prompt)
-        ai_summary = ai_response.content
-
         # ============================================
-        # 🗂️ Save Report
+        # 🗂️ Structured Result
         # ============================================
-        
-        # Prepare the formatted strings for grade_counts, top_students, and low_students outside the f-string
-        grade_dist_str = '\n'.join([f'  - {grade}: {count}' for grade, count in grade_counts.items()])
-        top_performers_str = '\n'.join([f'- {student["student_name"]}: {student["percentage"]:.1f}%' for student in top_students])
-        low_performers_str = '\n'.join([f'- {student["student_name"]}: {student["percentage"]:.1f}%' for student in low_students])
+        data: PerformancePayload = {
+            "kind": "performance",
+            "version": PAYLOAD_VERSION,
+            "course_name": course_name,
+            "records": len(df),
+            "averages": {
+                "marks": number(avg_marks),
+                "gpa": number(avg_gpa),
+                "attendance": number(avg_attendance),
+                "percentage": number(avg_percentage),
+            },
+            "grade_counts": {str(grade): int(count) for grade, count in grade_counts.items()},
+            "correlations": {"attendance_marks": number(corr_attendance_marks), "gpa_marks": number(corr_gpa_marks)},
+            "top_students": [{"student_name": s["student_name"], "percentage": number(s["percentage"])} for s in top_students],
+            "low_students": [{"student_name": s["student_name"], "percentage": number(s["percentage"])} for s in low_students],
+            "at_risk": {
+                "records": risk_manifest["records"],
+                "flagged": risk_manifest["at_risk_records"],
+                "share": number(at_risk_share),
+                "cohorts": risk_manifest["cohorts"],
+                "highest_risk": highest_risk,
+            },
+            "analysis": "",
+            "analysis_status": "pending",
+        }
 
-        report_text = f"""# Performance Report for {course_name}\n## 📊 Quantitative Summary\n- **Average Marks:** {avg_marks:.2f}\n- **GPA:** {avg_gpa:.2f}\n- **Attendance:** {avg_attendance:.2f}%\n- **Average Percentage:** {avg_percentage:.2f}%\n- **Grade Distribution:**\n{grade_dist_str}\n- **Correlation (Attendance vs Marks):** {corr_attendance_marks:.2f}\n- **Correlation (GPA vs Marks):** {corr_gpa_marks:.2f}\n---\n## 🏅 Top Performers\n{top_performers_str}\n---\n## ⚠️ Low Performers\n{low_performers_str}\n---\n## 💬 Gemini AI Summary\n{ai_summary}"""
+        logger.info("✅ Performance report successfully generated.")
+        return {"data": data, "prompt": formatted_prompt}
 
+    except Exception as e:
+        logger.error(f"💥 Error in performance analysis: {str(e)}")
+        return {"error": str(e)}
 
 
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(report_text)
+def analysis_llm(**options) -> ChatGoogleGenerativeAI:
+    """Chat model writing the performance narrative; ``options`` carry the request timeout."""
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        temperature=0.4,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        **options,
+    )
 
-        logger.info("✅ Performance report successfully generated and saved.")
-        return {
-            "summary": report_text
-        }
 
+@server.tool()
+async def evaluate_performance(course_name: str, file_path: str, output_path: str,
+                               deadline: float | None = None, analysis: str = "full") -> dict[str, Any]:
+    """
+    Analyze student performance in a given course using descriptive statistics and
+    Google Gemini for qualitative interpretation.
+
+    Returns the markdown report in ``summary`` and the structured payload in ``data``.
+    ``deadline`` (Unix time) bounds the whole call, LLM request included.
+    ``analysis`` is "full", "quantitative" or "deferred", as for the feedback agent;
+    deferred narratives are fetched with ``get_analysis``.
+    """
+    try:
+        check_mode(analysis)
+        result = await run_until(deadline, asyncio.to_thread(
+            build_performance_report, course_name, file_path
+        ), "performance analysis")
+    except (DeadlineExceeded, ValueError) as e:
+        logger.error(f"💥 {str(e)}")
+        return {"error": str(e)}
+    if "error" in result:
+        return result
+    return await finish_report(result, analysis, analysis_llm, output_path, deadline, "performance analysis")
+
+
+@server.tool()
+async def get_analysis(handle: str, wait_seconds: float = 0) -> dict[str, Any]:
+    """
+    Report of a deferred ``evaluate_performance`` call once its LLM narrative is
+    written, or ``{"status": "pending"}`` after waiting up to ``wait_seconds``.
+    """
+    return await narrative_result(handle, wait_seconds)
+
+
+@server.tool()
+async def query_at_risk_students(
+    file_path: str,
+    course: str | None = None,
+    semester: str | None = None,
+    page: int = 1,
+    page_size: int = 50,
+) -> dict[str, Any]:
+    """
+    Page through the at-risk students of a performance export, highest risk first,
+    optionally for one course and/or semester. Each student carries their cohort
+    z-scores, risk score and outlier flags.
+    """
+    try:
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        return await asyncio.to_thread(at_risk_page, file_path, course, semester, page, page_size)
     except Exception as e:
-        logger.error(f"💥 Error in performance analysis: {str(e)}")
+        logger.error(f"💥 Error querying at-risk students: {str(e)}")
         return {"error": str(e)}
 
 # ============================================
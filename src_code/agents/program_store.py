@@ -0,0 +1,193 @@
+"""
+Program-wide curriculum vector store.
+
+All courses share one FAISS store whose docstore ids are content hashes, so a
+chunk that appears in several courses (a common prerequisite, a shared slide
+deck) is embedded and stored once. Each chunk carries the courses, files and
+pages it came from, and retrieval is restricted to a course through those tags.
+"""
+import hashlib
+import logging
+import re
+from pathlib import Path
+
+import faiss
+import numpy as np
+from filelock import FileLock
+from langchain_core.documents import Document
+
+from vector_index import (
+    build_index,
+    build_vectorstore,
+    choose_index_type,
+    embed_texts,
+    load_vectorstore,
+    read_vectorstore,
+    save_vectorstore,
+)
+
+logger = logging.getLogger("recommender_agent")
+
+PROGRAM_STORE_DIRNAME = "program_faiss_index"
+# Metadata fields holding every course / file / page a chunk was found in
+TAG_FIELDS = ("courses", "files", "pages")
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk, insensitive to whitespace differences between extractions."""
+    return hashlib.sha256(re.sub(r"\s+", " ", text).strip().encode("utf-8")).hexdigest()
+
+
+def _sources(metadata: dict) -> list[list]:
+    """
+    The [course, file, page] entries of a chunk. Chunks stored before these
+    were recorded get every combination of their course, file and page tags.
+    """
+    if "sources" in metadata:
+        return metadata["sources"]
+    return [[course, file, page] for course in metadata.get("courses", [])
+            for file in metadata.get("files", []) for page in metadata.get("pages", [])]
+
+
+def _set_sources(metadata: dict, sources: list[list]) -> None:
+    """Store a chunk's sources and the course, file and page tags derived from them."""
+    metadata["sources"] = sources
+    for position, field in enumerate(TAG_FIELDS):
+        metadata[field] = list(dict.fromkeys(source[position] for source in sources))
+
+
+def _same_sources(a: list[list], b: list[list]) -> bool:
+    return {tuple(source) for source in a} == {tuple(source) for source in b}
+
+
+def _tagged_chunks(course_name: str, documents: list[Document]) -> dict[str, Document]:
+    """Deduplicate a course's pages by content hash and tag them with course, file and page."""
+    chunks = {}
+    for doc in documents:
+        if not doc.page_content.strip():
+            continue
+        key = chunk_hash(doc.page_content)
+        chunk = chunks.get(key)
+        if chunk is None:
+            chunk = chunks[key] = Document(page_content=doc.page_content, metadata={"sources": []})
+        source = [course_name, Path(doc.metadata.get("source", "")).name, doc.metadata.get("page")]
+        if source not in chunk.metadata["sources"]:
+            _set_sources(chunk.metadata, chunk.metadata["sources"] + [source])
+    return chunks
+
+
+def _course_changes(store, course_name: str, chunks: dict[str, Document]) -> dict[str, list[list]]:
+    """
+    New sources of every stored chunk whose sources for ``course_name`` differ
+    from ``chunks``: replaced by the incoming ones, or dropped when the course
+    no longer has the chunk. An empty list means no course has it any more.
+    """
+    changes = {}
+    for key in store.index_to_docstore_id.values():
+        metadata = store.docstore.search(key).metadata
+        incoming = chunks[key].metadata["sources"] if key in chunks else []
+        if not incoming and course_name not in metadata.get("courses", []):
+            continue
+        stored = _sources(metadata)
+        sources = [source for source in stored if source[0] != course_name] + incoming
+        if "sources" not in metadata or not _same_sources(sources, stored):
+            changes[key] = sources
+    return changes
+
+
+def _drop_chunks(vectorstore, keys: list[str]) -> None:
+    """
+    Remove chunks from the store. IVF indexes keep their old row ids on
+    removal, so they are rebuilt from the remaining (reconstructed) vectors.
+    """
+    index = vectorstore.index
+    if isinstance(index, faiss.IndexFlat):
+        vectorstore.delete(keys)
+        return
+    dropped = set(keys)
+    kept = [(row, key) for row, key in sorted(vectorstore.index_to_docstore_id.items()) if key not in dropped]
+    if kept:
+        index.make_direct_map()
+        vectorstore.index = build_index(index.reconstruct_batch(np.asarray([row for row, _ in kept], dtype=np.int64)))
+    else:
+        vectorstore.index = faiss.IndexFlatL2(index.d)
+    vectorstore.docstore.delete(keys)
+    vectorstore.index_to_docstore_id = dict(enumerate(key for _, key in kept))
+
+
+def _rebuild_tier(vectorstore) -> None:
+    """Swap in a bigger index tier once the corpus outgrows a flat index."""
+    index = vectorstore.index
+    kind = choose_index_type(index.ntotal)
+    if kind == "flat" or not isinstance(index, faiss.IndexFlat):
+        return
+    logger.info(f"Program store reached {index.ntotal} chunks; rebuilding as {kind}")
+    vectorstore.index = build_index(index.reconstruct_n(0, index.ntotal), kind)
+
+
+def upsert_course(cache_dir: Path, course_name: str, documents: list[Document], embeddings):
+    """
+    Replace a course's curriculum pages in the program store and return the store.
+
+    Pages already in the store (from this or any other course) only get the
+    new course/file/page tags; only unseen content is embedded. Pages the course
+    no longer has lose its tags, and chunks left without any course are
+    removed. The store is saved atomically under a file lock, so concurrent
+    agents do not lose updates.
+    """
+    store_path = Path(cache_dir) / PROGRAM_STORE_DIRNAME
+    store_path.mkdir(parents=True, exist_ok=True)
+    chunks = _tagged_chunks(course_name, documents)
+
+    with FileLock(str(store_path / ".lock")):
+        if not (store_path / "index.faiss").exists():
+            logger.info(f"Building program store with {len(chunks)} chunks from {course_name}")
+            build_vectorstore(list(chunks.values()), embeddings, store_path, ids=list(chunks))
+            return load_vectorstore(store_path, embeddings)
+
+        store = load_vectorstore(store_path, embeddings)
+        stored = set(store.index_to_docstore_id.values())
+        new_keys = [key for key in chunks if key not in stored]
+        changes = _course_changes(store, course_name, chunks)
+        retagged = [key for key, sources in changes.items() if sources]
+        removed = [key for key, sources in changes.items() if not sources]
+        if not new_keys and not changes:
+            return store
+
+        # Work on a private writable copy; readers keep the mmap of the old files
+        writable = read_vectorstore(store_path, embeddings, mmap=False)
+        for key in retagged:
+            _set_sources(writable.docstore.search(key).metadata, changes[key])
+        if removed:
+            _drop_chunks(writable, removed)
+        if new_keys:
+            vectors = embed_texts(embeddings, [chunks[key].page_content for key in new_keys])
+            writable.add_embeddings(
+                zip([chunks[key].page_content for key in new_keys], vectors),
+                metadatas=[chunks[key].metadata for key in new_keys],
+                ids=new_keys,
+            )
+            _rebuild_tier(writable)
+        save_vectorstore(writable, store_path)
+        logger.info(
+            f"Program store: {len(new_keys)} new chunks embedded, {len(retagged)} chunks retagged and "
+            f"{len(removed)} removed for {course_name} ({writable.index.ntotal} total)"
+        )
+        return load_vectorstore(store_path, embeddings)
+
+
+def matching_rows(documents: list[Document], **conditions) -> np.ndarray:
+    """
+    Row ids whose metadata matches every condition, e.g. ``courses="Machine Learning"``.
+
+    A condition on a list-valued field matches when the value is in the list.
+    """
+    rows = []
+    for row, doc in enumerate(documents):
+        for field, value in conditions.items():
+            actual = doc.metadata.get(field)
+            if not (value in actual if isinstance(actual, list) else actual == value):
+                break
+        else:
+            rows.append(row)
+    return np.asarray(rows, dtype=np.int64)
@@ -0,0 +1,127 @@
+"""
+Single-pass aggregation kernel for Likert rating columns.
+
+Ratings are an int8 code matrix (rows × columns, 1..levels, 0 = missing). One
+bincount over (group, column, level) yields the full histogram, and means,
+standard deviations and weak/strong labels all derive from it, so every column
+and group is covered by a single scan of the matrix.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Rows per bincount batch; bounds the int64 index buffer to ~40 MB per batch and column
+BATCH_ROWS = 5_000_000
+
+
+@dataclass
+class RatingSchema:
+    """Declared Likert columns of a feedback export and how their means are classified."""
+
+    columns: list[str]
+    levels: int = 5
+    weak_below: float = 3.0
+    strong_at: float = 4.0
+    text_column: str = "text_feedback"
+
+    def validate(self, df: pd.DataFrame) -> None:
+        missing = [col for col in self.columns + [self.text_column] if col not in df.columns]
+        if missing:
+            raise ValueError(f"Invalid feedback file. Missing columns: {missing}")
+
+    def codes(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Rating columns as an int8 matrix. Fractional ratings are rounded to the
+        nearest level; anything outside 1..levels becomes 0 (missing).
+        """
+        codes = np.zeros((len(df), len(self.columns)), dtype=np.int8)
+        for j, col in enumerate(self.columns):
+            values = df[col]
+            if values.dtype.kind not in "iu":
+                values = np.rint(pd.to_numeric(values, errors="coerce").fillna(0))
+            values = values.to_numpy()
+            valid = (values >= 1) & (values <= self.levels)
+            codes[:, j] = np.where(valid, values, 0)
+        return codes
+
+
+@dataclass
+class RatingStats:
+    columns: list[str]
+    histogram: np.ndarray  # groups × columns × levels
+    count: np.ndarray  # groups × columns, non-missing ratings
+    mean: np.ndarray
+    std: np.ndarray
+
+
+def aggregate_ratings(codes: np.ndarray, levels: int, columns: list[str],
+                      groups: np.ndarray | None = None, n_groups: int = 1) -> RatingStats:
+    """
+    Histogram, count, mean and (population) standard deviation per group and column.
+
+    ``groups`` holds a group id in ``[0, n_groups)`` per row; without it all
+    rows form one group. Mean and standard deviation are NaN where a group has
+    no valid rating in a column.
+    """
+    n_rows, n_cols = codes.shape
+    bins = levels + 1
+    column_offset = np.arange(n_cols, dtype=np.int64) * bins
+    flat = np.zeros(n_groups * n_cols * bins, dtype=np.int64)
+
+    for start in range(0, n_rows, BATCH_ROWS):
+        batch = codes[start:start + BATCH_ROWS].astype(np.int64) + column_offset
+        if groups is not None:
+            batch += (groups[start:start + BATCH_ROWS].astype(np.int64) * (n_cols * bins))[:, None]
+        flat += np.bincount(batch.ravel(), minlength=flat.size)
+
+    histogram = flat.reshape(n_groups, n_cols, bins)[..., 1:]  # drop the missing (0) bin
+    values = np.arange(1, bins, dtype=np.float64)
+    count = histogram.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, histogram @ values / count, np.nan)
+        second = np.where(count > 0, histogram @ values ** 2 / count, np.nan)
+    std = np.sqrt(np.maximum(second - mean ** 2, 0.0))
+    return RatingStats(columns, histogram, count, mean, std)
+
+
+def classify(mean: np.ndarray, schema: RatingSchema) -> tuple[list[str], list[str]]:
+    """Weak and strong columns for one group's means; columns without ratings (NaN) are neither."""
+    weak = [col for col, m in zip(schema.columns, mean) if m < schema.weak_below]
+    strong = [col for col, m in zip(schema.columns, mean) if m >= schema.strong_at]
+    return weak, strong
+
+
+def group_table(df: pd.DataFrame, codes: np.ndarray, schema: RatingSchema, group_by: list[str]) -> pd.DataFrame:
+    """
+    Mean rating per group (rows) and column, plus each group's response count
+    and its weak and strong columns (lists, as ``classify`` labels them).
+    """
+    group_ids, keys = pd.MultiIndex.from_frame(df[group_by].astype(str)).factorize()
+    stats = aggregate_ratings(codes, schema.levels, schema.columns, group_ids, len(keys))
+    index = pd.MultiIndex.from_tuples(keys, names=group_by)
+    table = pd.DataFrame(stats.mean.round(2), index=index, columns=schema.columns)
+    table.insert(0, "responses", np.bincount(group_ids, minlength=len(keys)))
+    labels = [classify(mean, schema) for mean in stats.mean]
+    table["weak_areas"] = [weak for weak, _ in labels]
+    table["strong_areas"] = [strong for _, strong in labels]
+    return table.sort_index()
+
+
+def _cell(value) -> str:
+    if isinstance(value, list):
+        return ", ".join(value) or "None"
+    if value is None or pd.isna(value):
+        return "n/a"
+    return f"{value:g}"
+
+
+def format_group_table(table: pd.DataFrame) -> str:
+    """Markdown table of ``group_table`` output."""
+    index_names = [name or "group" for name in table.index.names]
+    header = index_names + [col.replace("_", " ").title() for col in table.columns]
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for key, row in zip(table.index, table.itertuples(index=False)):
+        key = key if isinstance(key, tuple) else (key,)
+        lines.append("| " + " | ".join([str(k) for k in key] + [_cell(v) for v in row]) + " |")
+    return "\n".join(lines)
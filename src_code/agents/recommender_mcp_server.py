@@ -2,16 +2,27 @@ from mcp.server.fastmcp import FastMCP
 import os
 import logging
 import asyncio
-import aiofiles
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyPDFLoader, UnstructuredPowerPointLoader
 from langchain_core.prompts import ChatPromptTemplate
+import numpy as np
 from pathlib import Path
 import re
 import socket
+from context_packing import count_tokens, pack_context
+from deadlines import DeadlineExceeded, llm_options, run_until
+from file_io import write_text_atomic
+from payloads import as_payload, prompt_view
+from retrieval import HybridRetriever, extract_subqueries, load_or_build_bm25
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from program_store import PROGRAM_STORE_DIRNAME, matching_rows, upsert_course
 
 # ============================================================
 # 🚀 Setup
@@ -33,8 +44,14 @@ CONFIG = {
     "llm_model": os.getenv("LLM_MODEL", "gemini-2.0-flash"),
     "llm_temperature": float(os.getenv("LLM_TEMPERATURE", 0.4)),
     "embedding_model": os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
-    "context_limit": int(os.getenv("CONTEXT_LIMIT", 15000)),
+    "context_token_budget": int(os.getenv("CONTEXT_TOKEN_BUDGET", 3500)),
     "vectorstore_cache_dir": os.getenv("VECTORSTORE_CACHE_DIR", "./vectorstore_cache"),
+    "embedding_cache_dtype": os.getenv("EMBEDDING_CACHE_DTYPE", "float32"),  # or float16
+    "retrieval_k": int(os.getenv("RETRIEVAL_K", 5)),  # hits per sub-query and retriever
+    "retrieval_top_k": int(os.getenv("RETRIEVAL_TOP_K", 8)),  # chunks kept after fusion
+    "max_subqueries": int(os.getenv("MAX_SUBQUERIES", 8)),  # per summary
+    "rrf_k": int(os.getenv("RRF_K", 60)),
+    "prepared_ttl": int(os.getenv("PREPARED_TTL_SECONDS", 1800)),  # age at which a finished preparation is dropped
 }
 
 # Check if port is available
@@ -86,30 +103,305 @@ async def load_curriculum_files(curriculum_paths: list[str]) -> list:
         documents.extend(result)
     return documents
 
-def validate_inputs(course_name: str, feedback_summary: str, performance_summary: str, trend_summary: str, output_path: str) -> None:
-    """Validate input parameters."""
-    if not all(isinstance(x, str) and x.strip() for x in [course_name, feedback_summary, performance_summary, trend_summary]):
-        raise ValueError("All input summaries must be non-empty strings.")
+def validate_course_name(course_name: str) -> None:
+    if not isinstance(course_name, str) or not course_name.strip():
+        raise ValueError("Course name must be a non-empty string.")
     if not re.match(r'^[\w\s\-]+$', course_name):
         raise ValueError("Course name contains invalid characters.")
+
+def validate_inputs(course_name: str, feedback_summary: str | dict, performance_summary: str | dict, trend_summary: str | dict, output_path: str) -> None:
+    """Validate input parameters; each summary is markdown text or an analysis agent's payload."""
+    summaries = [feedback_summary, performance_summary, trend_summary]
+    if not (isinstance(course_name, str) and course_name.strip()) or not all(
+        as_payload(x) is not None or (isinstance(x, str) and x.strip()) for x in summaries
+    ):
+        raise ValueError("All input summaries must be non-empty strings or agent payloads.")
+    validate_course_name(course_name)
     if not output_path.endswith(".txt"):
         raise ValueError("Output path must be a .txt file.")
     output_path = Path(output_path).resolve()
     if not output_path.parent.exists():
         raise ValueError(f"Output directory does not exist: {output_path.parent}")
 
+def error_response(e: Exception) -> dict[str, str]:
+    """Map an exception to the tool's error payload."""
+    if isinstance(e, FileNotFoundError):
+        logger.error(f"💥 File error: {str(e)}")
+        return {"error": f"File error: {str(e)}"}
+    if isinstance(e, ValueError):
+        logger.error(f"💥 Input validation error: {str(e)}")
+        return {"error": f"Input validation error: {str(e)}"}
+    if isinstance(e, DeadlineExceeded):
+        logger.error(f"⏱️ {str(e)}")
+        return {"error": str(e)}
+    if isinstance(e, ConnectionResetError):
+        logger.warning(f"💥 Connection reset by client: {str(e)}")
+        return {"error": f"Connection reset by client: {str(e)}"}
+    logger.error(f"💥 Unexpected error: {str(e)}")
+    return {"error": f"Unexpected error: {str(e)}"}
+
+def get_embeddings() -> CachedEmbeddings:
+    """
+    The embedding model, loaded once per process.
+
+    Chunk embeddings are cached on disk by text hash, so rebuilds only embed new text.
+    """
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            _embeddings = CachedEmbeddings(
+                HuggingFaceEmbeddings(model_name=CONFIG["embedding_model"]),
+                EmbeddingCache(
+                    Path(CONFIG["vectorstore_cache_dir"]) / "embeddings",
+                    CONFIG["embedding_model"],
+                    CONFIG["embedding_cache_dtype"],
+                ),
+            )
+        return _embeddings
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+# ============================================================
+# 🔥 Curriculum Preparation (summary-independent)
 # ============================================================
-# 🧠 Tool Definition
+
+@dataclass
+class PreparedCurriculum:
+    course_name: str
+    retriever: HybridRetriever
+    course_rows: np.ndarray
+
+# handle -> (monotonic start time, task building the PreparedCurriculum)
+_preparations: dict[str, tuple[float, asyncio.Task]] = {}
+
+def preparation_handle(course_name: str, curriculum_paths: list[str]) -> str:
+    """Stable handle for a course's curriculum files; changes when any file changes."""
+    files = []
+    for path in sorted(curriculum_paths):
+        path = Path(path).resolve()
+        stat = path.stat() if path.is_file() else None
+        files.append([str(path), stat.st_size if stat else None, stat.st_mtime_ns if stat else None])
+    key = json.dumps([course_name, CONFIG["embedding_model"], files])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+async def prepare_retriever(course_name: str, curriculum_paths: list[str]) -> PreparedCurriculum:
+    """Load the curriculum, update the program store and build the hybrid retriever."""
+    curriculum_documents = await load_curriculum_files(curriculum_paths)
+    if not curriculum_documents:
+        raise ValueError("No content loaded from curriculum files.")
+
+    # One program-wide store: pages shared between courses are embedded once
+    # and tagged with every course, file and page they appear in.
+    embeddings = await asyncio.to_thread(get_embeddings)
+    vectorstore = await asyncio.to_thread(
+        upsert_course, CONFIG["vectorstore_cache_dir"], course_name, curriculum_documents, embeddings
+    )
+    store_path = Path(CONFIG["vectorstore_cache_dir"]) / PROGRAM_STORE_DIRNAME
+
+    retriever = HybridRetriever(
+        vectorstore,
+        await asyncio.to_thread(load_or_build_bm25, vectorstore, store_path),
+        k=CONFIG["retrieval_k"],
+        rrf_k=CONFIG["rrf_k"],
+    )
+    course_rows = matching_rows(retriever.documents, courses=course_name)
+    logger.info(f"Prepared retriever for {course_name}; embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+    return PreparedCurriculum(course_name, retriever, course_rows)
+
+def log_preparation_failure(task: asyncio.Task) -> None:
+    # Retrieving the exception here also keeps asyncio from warning about it
+    if not task.cancelled() and task.exception():
+        logger.error(f"💥 Curriculum preparation failed: {str(task.exception())}")
+
+def start_preparation(course_name: str, curriculum_paths: list[str]) -> str:
+    """Start (or join) the background preparation of a curriculum and return its handle."""
+    now = time.monotonic()
+    for handle, (started, task) in list(_preparations.items()):
+        if now - started > CONFIG["prepared_ttl"] and task.done():
+            del _preparations[handle]
+
+    handle = preparation_handle(course_name, curriculum_paths)
+    entry = _preparations.get(handle)
+    if entry is None or (entry[1].done() and (entry[1].cancelled() or entry[1].exception())):
+        task = asyncio.create_task(prepare_retriever(course_name, list(curriculum_paths)))
+        task.add_done_callback(log_preparation_failure)
+        _preparations[handle] = (now, task)
+        logger.info(f"Preparing curriculum for {course_name} (handle {handle})")
+    return handle
+
+async def await_preparation(handle: str) -> PreparedCurriculum:
+    entry = _preparations.get(handle)
+    if entry is None:
+        raise ValueError(f"Unknown or expired handle {handle}; call prepare_curriculum again.")
+    # Shielded so a cancelled finalize call does not cancel a preparation others may share
+    return await asyncio.shield(entry[1])
+
+# ============================================================
+# 🧠 Recommendation Generation (needs the summaries)
+# ============================================================
+
+async def generate_recommendations(
+    prepared: PreparedCurriculum,
+    feedback_summary: str | dict,
+    performance_summary: str | dict,
+    trend_summary: str | dict,
+    output_path: str,
+    deadline: float | None = None,
+) -> dict[str, str]:
+    course_name = prepared.course_name
+
+    # ---------------------------------------
+    # 1️⃣ Create Sub-Queries and Retrieve Context
+    # ---------------------------------------
+    # One focused query per weak area, skill and performance issue retrieves
+    # more relevant chunks than a single query holding all three summaries.
+    queries = [f"{course_name} curriculum: what to improve, expand or add"]
+    for summary in (feedback_summary, performance_summary, trend_summary):
+        queries += [f"{course_name}: {q}" for q in extract_subqueries(summary, CONFIG["max_subqueries"])]
+
+    try:
+        retrieved_docs = await run_until(deadline, asyncio.to_thread(
+            prepared.retriever.retrieve, queries, CONFIG["retrieval_top_k"], prepared.course_rows
+        ), "retrieval")
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"💥 Retriever error: {str(e)}")
+        return {"error": f"Retriever error: {str(e)}"}
+    # Chunks arrive best-first from the fusion, so keep their order and add whole chunks
+    packed = pack_context(
+        [d.page_content for d in retrieved_docs], CONFIG["context_token_budget"], rank=False, separator="\n\n"
+    )
+    context = packed.text
+    logger.info(
+        f"Retrieved {len(retrieved_docs)} documents from {len(queries)} sub-queries; "
+        f"packed {packed.items} into {packed.tokens} tokens"
+    )
+
+    # ---------------------------------------
+    # 2️⃣ Gemini LLM Reasoning
+    # ---------------------------------------
+    llm = ChatGoogleGenerativeAI(
+        model=CONFIG["llm_model"],
+        temperature=CONFIG["llm_temperature"],
+        google_api_key=GOOGLE_API_KEY,
+        **llm_options(deadline),
+    )
+
+    prompt = ChatPromptTemplate.from_template("""
+    You are an AI Curriculum Development Specialist.
+
+    Course: "{course_name}"
+
+    ---- Context from Curriculum ----
+    {context}
+
+    ---- Integrated Insights ----
+    Student Feedback Summary:
+    {feedback_summary}
+
+    Student Performance Summary:
+    {performance_summary}
+
+    Industry Trend Summary:
+    {trend_summary}
+
+    ---- Tasks ----
+    1️⃣ Suggest 3–5 detailed curriculum improvements (e.g., new topics, projects, or tools).
+    2️⃣ Highlight missing modern skills or industry-relevant modules.
+    3️⃣ Recommend case studies, hands-on labs, or emerging technologies to include.
+    4️⃣ Provide a concise 4-line executive summary for educators.
+
+    Ensure the output is structured with clear headings and actionable details.
+    """)
+
+    # Payloads contribute only the fields the recommendations need, as compact JSON
+    formatted_prompt = prompt.format(
+        course_name=course_name,
+        context=context,
+        feedback_summary=prompt_view(feedback_summary),
+        performance_summary=prompt_view(performance_summary),
+        trend_summary=prompt_view(trend_summary)
+    )
+
+    logger.info(f"🤖 Sending recommendation request to Gemini ({count_tokens(formatted_prompt)} prompt tokens)...")
+    try:
+        ai_response = await run_until(deadline, asyncio.to_thread(llm.invoke, formatted_prompt), "LLM analysis")
+        ai_summary = ai_response.content
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"💥 Gemini API error: {str(e)}")
+        return {"error": f"Gemini API error: {str(e)}"}
+
+    # ---------------------------------------
+    # 3️⃣ Save and Return
+    # ---------------------------------------
+    output_path = await write_text_atomic(output_path, ai_summary)
+
+    logger.info(f"✅ Curriculum recommendations saved to {output_path}")
+    return {"curriculum_recommendations": ai_summary}
+
+# ============================================================
+# 🧰 Tool Definitions
 # ============================================================
 
+@server.tool()
+async def prepare_curriculum(course_name: str, curriculum_paths: list[str]) -> dict[str, str]:
+    """
+    Start loading the curriculum files and building the course's retrieval index
+    in the background, and return a handle for ``finalize_recommendations``.
+
+    Call it as soon as the curriculum is uploaded so the index build overlaps
+    with the feedback, performance and trend analyses.
+    """
+    try:
+        validate_course_name(course_name)
+        missing = [p for p in curriculum_paths if not Path(p).is_file()]
+        if not curriculum_paths or missing:
+            raise FileNotFoundError(f"Curriculum files not found: {missing or curriculum_paths}")
+        handle = start_preparation(course_name, curriculum_paths)
+        task = _preparations[handle][1]
+        return {"handle": handle, "status": "ready" if task.done() else "preparing"}
+    except Exception as e:
+        return error_response(e)
+
+@server.tool()
+async def finalize_recommendations(
+    handle: str,
+    feedback_summary: str | dict,
+    performance_summary: str | dict,
+    trend_summary: str | dict,
+    output_path: str = "recommendations.txt",
+    deadline: float | None = None
+) -> dict[str, str]:
+    """
+    Generate curriculum recommendations for a curriculum prepared with
+    ``prepare_curriculum``, waiting for its preparation if still running.
+
+    ``deadline`` (Unix time) bounds the wait, retrieval and LLM request. A
+    preparation still running at the deadline keeps going, so a retry with the
+    same handle picks it up.
+    """
+    try:
+        prepared = await run_until(deadline, await_preparation(handle), "curriculum preparation")
+        validate_inputs(prepared.course_name, feedback_summary, performance_summary, trend_summary, output_path)
+        return await generate_recommendations(
+            prepared, feedback_summary, performance_summary, trend_summary, output_path, deadline
+        )
+    except Exception as e:
+        return error_response(e)
+
 @server.tool()
 async def recommend_curriculum_updates(
     course_name: str,
     curriculum_paths: list[str],
-    feedback_summary: str,
-    performance_summary: str,
-    trend_summary: str,
-    output_path: str = "recommendations.txt"
+    feedback_summary: str | dict,
+    performance_summary: str | dict,
+    trend_summary: str | dict,
+    output_path: str = "recommendations.txt",
+    deadline: float | None = None
 ) -> dict[str, str]:
     """
     Generate curriculum update recommendations using Gemini and RAG context from PDFs/PPTs.
@@ -117,141 +409,26 @@ async def recommend_curriculum_updates(
     Args:
         course_name: Name of the course.
         curriculum_paths: List of paths to curriculum files (PDF/PPTX).
-        feedback_summary: Summary of student feedback.
-        performance_summary: Summary of student performance.
-        trend_summary: Summary of industry trends.
+        feedback_summary: Summary of student feedback, as markdown or the feedback agent's ``data``.
+        performance_summary: Summary of student performance, as markdown or the performance agent's ``data``.
+        trend_summary: Summary of industry trends, as markdown or the trend agent's ``data``.
         output_path: Path to save recommendations (default: recommendations.txt).
+        deadline: Unix time by which to answer; bounds preparation, retrieval and the LLM request.
     
     Returns:
         Dict containing recommendations or error message.
     """
     try:
-        # ---------------------------------------
-        # 1️⃣ Validate Inputs
-        # ---------------------------------------
         validate_inputs(course_name, feedback_summary, performance_summary, trend_summary, output_path)
         logger.info(f"Starting recommendation process for course: {course_name}")
-
-        # ---------------------------------------
-        # 2️⃣ Load Files Asynchronously
-        # ---------------------------------------
-        curriculum_documents = await load_curriculum_files(curriculum_paths)
-        if not curriculum_documents:
-            raise ValueError("No content loaded from curriculum files.")
-
-        # ---------------------------------------
-        # 3️⃣ Build or Load Vector Store (RAG)
-        # ---------------------------------------
-        cache_path = Path(CONFIG["vectorstore_cache_dir"]) / f"{course_name}_faiss_index"
-        embeddings = HuggingFaceEmbeddings(model_name=CONFIG["embedding_model"])
-        
-        if cache_path.exists():
-            logger.info(f"Loading cached vector store from {cache_path}")
-            vectorstore = FAISS.load_local(str(cache_path), embeddings, allow_dangerous_deserialization=True)
-        else:
-            logger.info("Building new vector store...")
-            vectorstore = FAISS.from_documents(curriculum_documents, embeddings)
-            vectorstore.save_local(str(cache_path))
-            logger.info(f"Saved vector store to {cache_path}")
-
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-
-        # ---------------------------------------
-        # 4️⃣ Create Query and Retrieve Context
-        # ---------------------------------------
-        query = f"""
-        Course: {course_name}
-        Feedback Insights: {feedback_summary}
-        Performance Insights: {performance_summary}
-        Job Market Insights: {trend_summary}
-
-        Based on these insights, identify what content in the current curriculum should be
-        improved, expanded, or newly added to align with student needs and industry demand.
-        """
-
-        try:
-            retrieved_docs = retriever.invoke(query)
-        except Exception as e:
-            logger.error(f"💥 Retriever error: {str(e)}")
-            return {"error": f"Retriever error: {str(e)}"}
-        context = "\n".join([d.page_content for d in retrieved_docs])[:CONFIG["context_limit"]]
-        logger.info(f"Retrieved {len(retrieved_docs)} documents for context (truncated to {len(context)} chars)")
-
-        # ---------------------------------------
-        # 5️⃣ Gemini LLM Reasoning
-        # ---------------------------------------
-        llm = ChatGoogleGenerativeAI(
-            model=CONFIG["llm_model"],
-            temperature=CONFIG["llm_temperature"],
-            google_api_key=GOOGLE_API_KEY
+        prepared = await run_until(
+            deadline, await_preparation(start_preparation(course_name, curriculum_paths)), "curriculum preparation"
         )
-
-        prompt = ChatPromptTemplate.from_template("""
-        You are an AI Curriculum Development Specialist.
-
-        Course: "{course_name}"
-
-        ---- Context from Curriculum ----
-        {context}
-
-        ---- Integrated Insights ----
-        Student Feedback Summary:
-        {feedback_summary}
-
-        Student Performance Summary:
-        {performance_summary}
-
-        Industry Trend Summary:
-        {trend_summary}
-
-        ---- Tasks ----
-        1️⃣ Suggest 3–5 detailed curriculum improvements (e.g., new topics, projects, or tools).
-        2️⃣ Highlight missing modern skills or industry-relevant modules.
-        3️⃣ Recommend case studies, hands-on labs, or emerging technologies to include.
-        4️⃣ Provide a concise 4-line executive summary for educators.
-
-        Ensure the output is structured with clear headings and actionable details.
-        """)
-
-        formatted_prompt = prompt.format(
-            course_name=course_name,
-            context=context,
-            feedback_summary=feedback_summary,
-            performance_summary=performance_summary,
-            trend_summary=trend_summary
+        return await generate_recommendations(
+            prepared, feedback_summary, performance_summary, trend_summary, output_path, deadline
         )
-
-        logger.info("🤖 Sending recommendation request to Gemini...")
-        try:
-            ai_response = llm.invoke(formatted_prompt)  # Removed 'await' since invoke is synchronous
-            ai_summary = ai_response.content
-        except Exception as e:
-            logger.error(f"💥 Gemini API error: {str(e)}")
-            return {"error": f"Gemini API error: {str(e)}"}
-
-        # ---------------------------------------
-        # 6️⃣ Save and Return
-        # ---------------------------------------
-        output_path = Path(output_path).resolve()
-        os.makedirs(output_path.parent, exist_ok=True)
-        async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-            await f.write(ai_summary)
-
-        logger.info(f"✅ Curriculum recommendations saved to {output_path}")
-        return {"curriculum_recommendations": ai_summary}
-
-    except FileNotFoundError as e:
-        logger.error(f"💥 File error: {str(e)}")
-        return {"error": f"File error: {str(e)}"}
-    except ValueError as e:
-        logger.error(f"💥 Input validation error: {str(e)}")
-        return {"error": f"Input validation error: {str(e)}"}
-    except ConnectionResetError as e:
-        logger.warning(f"💥 Connection reset by client: {str(e)}")
-        return {"error": f"Connection reset by client: {str(e)}"}
     except Exception as e:
-        logger.error(f"💥 Unexpected error: {str(e)}")
-        return {"error": f"Unexpected error: {str(e)}"}
+        return error_response(e)
 
 # ============================================================
 # 🚀 Run MCP Server
@@ -1,5 +1,6 @@
 from mcp.server.fastmcp import FastMCP
 import asyncio
+from typing import Any
 from fpdf import FPDF, HTMLMixin
 import traceback
 import base64
@@ -7,6 +8,22 @@ import platform
 import markdown
 from fpdf.html import HTML2FPDF
 import html
+import hashlib
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from deadlines import DeadlineExceeded, remaining, run_until
+from payloads import render_markdown
 
 # Use SelectorEventLoop on Windows to avoid ConnectionResetError
 if platform.system() == "Windows":
@@ -19,52 +36,139 @@ server.settings.host = "localhost"
 
 class PDF(FPDF, HTMLMixin):
     pass
+HTML2FPDF.unescape = staticmethod(html.unescape)
 
+# Report layout: (tool argument, section heading)
+REPORT_SECTIONS = [
+    ("feedback_summary", "Feedback Summary"),
+    ("performance_summary", "Performance Summary"),
+    ("trend_summary", "Job Market Trends"),
+    ("recommendations", "Recommended Curriculum Updates"),
+]
+SECTION_TEMPLATE = "<h2>{title}</h2>{body}"
+SECTION_CACHE_SIZE = 256
+STREAM_CHUNK_CHARS = 1 << 20
+
+# Markdown and fpdf hold the GIL, so a small pool is enough to overlap the sections
+_render_pool = ThreadPoolExecutor(max_workers=len(REPORT_SECTIONS), thread_name_prefix="report-render")
+_markdown_local = threading.local()
+
+
+class SectionCache:
+    """Thread-safe LRU of rendered section HTML keyed by content hash."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+
+section_cache = SectionCache(SECTION_CACHE_SIZE)
 
-class PDF(FPDF, HTMLMixin):
-    pass
-HTML2FPDF.unescape = staticmethod(html.unescape)
 
 def sanitize_text(text):
     """Replace non-latin-1 characters with a placeholder or remove them."""
     return text.encode('latin-1', errors='replace').decode('latin-1')
 
 
+def _markdown_converter() -> markdown.Markdown:
+    # Building a Markdown instance loads every extension; reuse one per thread
+    converter = getattr(_markdown_local, "converter", None)
+    if converter is None:
+        converter = markdown.Markdown(extensions=['fenced_code', 'tables'])
+        _markdown_local.converter = converter
+    return converter
+
+
 def markdown_to_html(md_text: str) -> str:
     """Convert Markdown text to basic HTML."""
-    html = markdown.markdown(md_text, extensions=['fenced_code', 'tables'])
-    return html
+    return _markdown_converter().reset().convert(md_text)
+
+
+def render_section(title: str, md_text: str) -> str:
+    """Sanitize and convert one section, reusing the cached HTML when its content is unchanged."""
+    key = hashlib.sha256(f"{title}\0{md_text}".encode("utf-8")).hexdigest()
+    cached = section_cache.get(key)
+    if cached is not None:
+        return cached
+    rendered = SECTION_TEMPLATE.format(title=title, body=markdown_to_html(sanitize_text(md_text)))
+    section_cache.put(key, rendered)
+    return rendered
+
+
+def render_sections(sections: list[tuple[str, str]]) -> list[str]:
+    """Render (title, markdown) pairs concurrently, preserving order."""
+    return list(_render_pool.map(lambda section: render_section(*section), sections))
+
+
+def preload_fonts() -> None:
+    """Load the core font metrics once so the first report doesn't pay for it."""
+    pdf = PDF()
+    pdf.add_page()
+    for family in ("Arial", "Courier", "Times"):
+        for style in ("", "B", "I", "BI"):
+            pdf.set_font(family, style, 12)
+    _markdown_converter()
+
+
+def build_pdf(course_name, feedback_summary, performance_summary, trend_summary, recommendations) -> PDF:
+    """
+    Lay out the title and the four report sections into an fpdf document.
+    Summaries may be markdown or analysis agent payloads, rendered here.
+    """
+    contents = {
+        "feedback_summary": render_markdown(feedback_summary),
+        "performance_summary": render_markdown(performance_summary),
+        "trend_summary": render_markdown(trend_summary),
+        "recommendations": recommendations,
+    }
+    sections_html = render_sections([(title, contents[key]) for key, title in REPORT_SECTIONS])
+
+    pdf = PDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    # Add title
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, f"Curriculum Intelligence Report - {sanitize_text(course_name)}", ln=True, align="C")
+    pdf.ln(10)
+
+    # Write markdown-rendered sections
+    for i, section_html in enumerate(sections_html):
+        if i:
+            pdf.ln(5)
+        pdf.write_html(section_html)
+    return pdf
 
 
 def create_pdf_in_memory(course_name, feedback_summary, performance_summary, trend_summary, recommendations):
     """Generate PDF in memory from Markdown-formatted sections and return as bytes."""
     print("[create_pdf_in_memory] Starting PDF generation...")
     try:
-        pdf = PDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-
-        # Convert and sanitize all sections
-        course_name = sanitize_text(course_name)
-        feedback_html = markdown_to_html(sanitize_text(feedback_summary))
-        performance_html = markdown_to_html(sanitize_text(performance_summary))
-        trend_html = markdown_to_html(sanitize_text(sanitize_text(trend_summary)))
-        rec_html = markdown_to_html(sanitize_text(recommendations))
-
-        # Add title
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, f"Curriculum Intelligence Report - {course_name}", ln=True, align="C")
-        pdf.ln(10)
-
-        # Write markdown-rendered sections
-        pdf.write_html(f"<h2>Feedback Summary</h2>{feedback_html}")
-        pdf.ln(5)
-        pdf.write_html(f"<h2>Performance Summary</h2>{performance_html}")
-        pdf.ln(5)
-        pdf.write_html(f"<h2>Job Market Trends</h2>{trend_html}")
-        pdf.ln(5)
-        pdf.write_html(f"<h2>Recommended Curriculum Updates</h2>{rec_html}")
-
+        pdf = build_pdf(course_name, feedback_summary, performance_summary, trend_summary, recommendations)
         pdf_bytes = pdf.output(dest="S").encode("latin-1")
         print("[create_pdf_in_memory] PDF generation completed successfully.")
         return pdf_bytes
@@ -74,19 +178,136 @@ def create_pdf_in_memory(course_name, feedback_summary, performance_summary, tre
         raise
 
 
+def create_pdf_file(output_path, course_name, feedback_summary, performance_summary, trend_summary, recommendations):
+    """
+    Generate the PDF and stream it to ``output_path`` in chunks, returning the
+    file size. Written to a temp file and renamed so readers never see a partial PDF.
+    """
+    print(f"[create_pdf_file] Starting PDF generation -> {output_path}")
+    output_path = Path(output_path).resolve()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        pdf = build_pdf(course_name, feedback_summary, performance_summary, trend_summary, recommendations)
+        buffer = pdf.output(dest="S")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(buffer), STREAM_CHUNK_CHARS):
+                f.write(buffer[start:start + STREAM_CHUNK_CHARS].encode("latin-1"))
+        os.replace(tmp_path, output_path)
+        print("[create_pdf_file] PDF generation completed successfully.")
+        return output_path.stat().st_size
+    except Exception as e:
+        print(f"[create_pdf_file] Error while generating PDF: {e}")
+        traceback.print_exc()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+preload_fonts()
+
+
+# ============================================
+# 📚 Batch Rendering
+# ============================================
+BATCH_WORKERS = int(os.getenv("REPORT_BATCH_WORKERS", 0)) or os.cpu_count() or 1
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Lazily start the shared pool of render processes. fpdf holds the GIL, so only
+    separate processes render reports in parallel. "spawn" avoids forking a
+    process that already runs the event loop and render threads.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (e.g. a worker was OOM-killed) so the next batch starts a fresh one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def report_filename(index: int, course_name: str) -> str:
+    safe_name = re.sub(r"[^\w\-]+", "_", course_name).strip("_") or "course"
+    return f"{index:04d}_{safe_name}.pdf"
+
+
+def render_report_job(index: int, bundle: dict, output_dir: str) -> dict:
+    """Render one course report to ``output_dir``; runs inside a pool worker."""
+    start = time.perf_counter()
+    path = Path(output_dir) / report_filename(index, bundle["course_name"])
+    size = create_pdf_file(
+        path,
+        bundle["course_name"],
+        bundle.get("feedback_summary", ""),
+        bundle.get("performance_summary", ""),
+        bundle.get("trend_summary", ""),
+        bundle.get("recommendations", ""),
+    )
+    return {
+        "course_name": bundle["course_name"],
+        "pdf_path": str(path),
+        "pdf_size": size,
+        "seconds": round(time.perf_counter() - start, 4),
+        "worker_pid": os.getpid(),
+    }
+
+
+def write_zip(source_dir: Path, archive_path: Path) -> Path:
+    """Pack the rendered PDFs into ``archive_path``; PDFs are already compressed, so store them."""
+    tmp_path = archive_path.with_name(f".{archive_path.name}.tmp")
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for pdf_path in sorted(source_dir.glob("*.pdf")):
+            archive.write(pdf_path, arcname=pdf_path.name)
+    os.replace(tmp_path, archive_path)
+    return archive_path
+
+
 @server.tool()
-async def generate_report(course_name: str, feedback_summary: str, performance_summary: str,
-                         trend_summary: str, recommendations: str) -> dict[str, str]:
-    """Asynchronous FastMCP tool to generate Markdown-rendered PDF report in memory."""
+async def generate_report(course_name: str, feedback_summary: str | dict, performance_summary: str | dict,
+                         trend_summary: str | dict, recommendations: str, output_path: str | None = None,
+                         deadline: float | None = None) -> dict[str, str]:
+    """
+    Asynchronous FastMCP tool to generate Markdown-rendered PDF report.
+
+    By default the PDF is returned base64-encoded in ``pdf_data``. When
+    ``output_path`` is given it is streamed to that file instead and only the
+    path and size are returned. Each summary is markdown or the ``data``
+    payload of its analysis agent. ``deadline`` (Unix time) bounds the rendering.
+    """
     print("[generate_report] Tool invoked.")
     print(f"[generate_report] course_name: {course_name}")
 
     try:
+        if output_path:
+            pdf_size = await run_until(deadline, asyncio.to_thread(
+                create_pdf_file, output_path, course_name, feedback_summary,
+                performance_summary, trend_summary, recommendations
+            ), "PDF rendering")
+            print("[generate_report] Report written successfully.")
+            return {
+                "summary": "✅ Markdown-rendered report generated successfully",
+                "pdf_path": str(Path(output_path).resolve()),
+                "pdf_size": str(pdf_size),
+            }
+
         print("[generate_report] Starting background PDF generation...")
-        pdf_bytes = await asyncio.to_thread(
+        pdf_bytes = await run_until(deadline, asyncio.to_thread(
             create_pdf_in_memory, course_name, feedback_summary,
             performance_summary, trend_summary, recommendations
-        )
+        ), "PDF rendering")
 
         pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
         print("[generate_report] Report generated successfully.")
@@ -94,11 +315,96 @@ async def generate_report(course_name: str, feedback_summary: str, performance_s
             "summary": "✅ Markdown-rendered report generated successfully",
             "pdf_data": pdf_base64
         }
+    except DeadlineExceeded as e:
+        print(f"[generate_report] ⏱️ {e}")
+        return {"error": str(e)}
     except Exception as e:
         print(f"[generate_report] ❌ Error: {e}")
         traceback.print_exc()
         return {"error": str(e)}
 
 
+@server.tool()
+async def generate_reports_batch(reports: list[dict], output_dir: str, archive: bool = False,
+                                 deadline: float | None = None) -> dict[str, Any]:
+    """
+    Render one PDF report per course summary bundle on a process pool.
+
+    Each bundle holds ``course_name`` plus the same summary fields as
+    ``generate_report``. PDFs are written to ``output_dir``, or packed into
+    ``<output_dir>.zip`` when ``archive`` is true. Returns per-report timings;
+    a failing report is listed under ``failed`` without aborting the batch.
+    Reports not rendered by ``deadline`` (Unix time) are cancelled and listed
+    as failed; the ones already rendered are returned.
+    """
+    print(f"[generate_reports_batch] Tool invoked for {len(reports)} reports.")
+    try:
+        missing = [i for i, bundle in enumerate(reports) if not bundle.get("course_name")]
+        if missing:
+            raise ValueError(f"Report bundles without course_name at positions: {missing}")
+
+        output_dir = Path(output_dir).resolve()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        render_dir = Path(tempfile.mkdtemp(prefix=".batch_", dir=output_dir)) if archive else output_dir
+
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        start = time.perf_counter()
+        try:
+            jobs = [loop.run_in_executor(pool, render_report_job, i, bundle, str(render_dir))
+                    for i, bundle in enumerate(reports)]
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+        if jobs:
+            left = remaining(deadline)
+            _, pending = await asyncio.wait(jobs, timeout=None if left is None else max(left, 0))
+            # Jobs not yet started are dropped from the pool queue; running ones finish unobserved
+            for job in pending:
+                job.cancel()
+        wall_seconds = time.perf_counter() - start
+
+        rendered, failed = [], []
+        for bundle, job in zip(reports, jobs):
+            if job.cancelled():
+                failed.append({"course_name": bundle["course_name"], "error": "Deadline exceeded before rendering"})
+            elif job.exception():
+                failed.append({"course_name": bundle["course_name"], "error": str(job.exception())})
+            else:
+                rendered.append(job.result())
+        if any(isinstance(job.exception(), BrokenProcessPool) for job in jobs if not job.cancelled()):
+            discard_process_pool(pool)
+
+        result = {
+            "summary": f"✅ Rendered {len(rendered)} of {len(reports)} reports in {wall_seconds:.2f}s",
+            "reports": rendered,
+            "failed": failed,
+            "wall_seconds": round(wall_seconds, 4),
+            "cpu_seconds": round(sum(r["seconds"] for r in rendered), 4),
+            "workers": BATCH_WORKERS,
+        }
+        if archive:
+            archive_path = await asyncio.to_thread(write_zip, render_dir,
+                                                   output_dir.with_name(output_dir.name + ".zip"))
+            shutil.rmtree(render_dir, ignore_errors=True)
+            # output_dir only held the staging directory; keep it if it has anything else
+            try:
+                output_dir.rmdir()
+            except OSError:
+                pass
+            for report in rendered:
+                report["pdf_path"] = Path(report["pdf_path"]).name
+            result["archive_path"] = str(archive_path)
+        else:
+            result["output_dir"] = str(output_dir)
+
+        print(f"[generate_reports_batch] {result['summary']}")
+        return result
+    except Exception as e:
+        print(f"[generate_reports_batch] ❌ Error: {e}")
+        traceback.print_exc()
+        return {"error": str(e)}
+
+
 if __name__ == "__main__":
     server.run(transport="streamable-http")
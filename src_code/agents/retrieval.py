@@ -0,0 +1,247 @@
+"""
+Hybrid BM25 + FAISS retrieval for the recommender agent.
+
+The BM25 keyword index is built over the same chunks as the FAISS index (row i
+of one is row i of the other) and persisted next to it, so both rankings can be
+fused by row id without re-reading the curriculum files.
+"""
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+
+import faiss
+import numpy as np
+import scipy.sparse as sp
+from langchain_core.documents import Document
+from sklearn.feature_extraction.text import CountVectorizer
+
+from payloads import as_payload, query_terms
+from vector_index import NORMALIZE_L2
+
+logger = logging.getLogger("recommender_agent")
+
+BM25_DIRNAME = "bm25"
+# Keeps tokens such as "c++", "c#", "scikit-learn" and "ci/cd" intact
+TOKEN_PATTERN = r"(?u)\b\w[\w+#\-/]*"
+
+
+class BM25Index:
+    """Okapi BM25 over a sparse term matrix; scoring a batch of queries is one sparse product."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vectorizer = None
+        self.weights = None  # docs × terms, BM25 term weights
+        self.corpus = ""  # digest of the docstore ids, in row order, the index was built over
+
+    @property
+    def n_docs(self) -> int:
+        return 0 if self.weights is None else self.weights.shape[0]
+
+    def _vectorizer(self, vocabulary=None) -> CountVectorizer:
+        return CountVectorizer(
+            lowercase=True,
+            token_pattern=TOKEN_PATTERN,
+            stop_words="english",
+            vocabulary=vocabulary,
+            dtype=np.float32,
+        )
+
+    @property
+    def has_terms(self) -> bool:
+        return self.vectorizer is not None
+
+    def fit(self, texts: list[str]) -> "BM25Index":
+        self.vectorizer = self._vectorizer()
+        try:
+            tf = self.vectorizer.fit_transform(texts).tocsr()
+        except ValueError:
+            # Nothing but stop words or empty chunks (e.g. scanned PDFs without a text layer)
+            logger.warning("No keywords to index for BM25; retrieval falls back to vectors only.")
+            self.vectorizer = None
+            self.weights = sp.csr_matrix((len(texts), 0), dtype=np.float32)
+            return self
+
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if len(doc_len) else 0.0
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        idf = np.log1p((tf.shape[0] - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        # Precompute the saturated, length-normalized weight of every (doc, term) entry
+        norm = self.k1 * (1 - self.b + self.b * doc_len / max(avg_len, 1e-9))
+        row_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = tf.data * (self.k1 + 1) / (tf.data + row_norm) * idf[tf.indices]
+        self.weights = tf.astype(np.float32)
+        return self
+
+    def score(self, queries: list[str]) -> np.ndarray:
+        """BM25 scores as a (queries × docs) array."""
+        if not self.has_terms:
+            return np.zeros((len(queries), self.n_docs), dtype=np.float32)
+        q = self.vectorizer.transform(queries)
+        q.data[:] = 1.0  # each query term counts once
+        return np.asarray((q @ self.weights.T).todense())
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        sp.save_npz(directory / "weights.npz", self.weights)
+        vocabulary = self.vectorizer.vocabulary_ if self.has_terms else {}
+        meta = {"k1": self.k1, "b": self.b, "corpus": self.corpus, "vocabulary": {t: int(i) for t, i in vocabulary.items()}}
+        (directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "BM25Index":
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        index = cls(meta["k1"], meta["b"])
+        index.vectorizer = index._vectorizer(vocabulary=meta["vocabulary"]) if meta["vocabulary"] else None
+        index.weights = sp.load_npz(directory / "weights.npz").tocsr()
+        index.corpus = meta.get("corpus", "")
+        return index
+
+
+def faiss_documents(vectorstore) -> list[Document]:
+    """Documents of a FAISS store in index row order."""
+    return [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(vectorstore.index.ntotal)
+    ]
+
+
+def corpus_digest(vectorstore) -> str:
+    """Digest of a store's docstore ids in row order; changes when chunks are added, removed or moved."""
+    ids = (vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal))
+    return hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest()
+
+
+def load_or_build_bm25(vectorstore, cache_path: Path) -> BM25Index:
+    """Load the BM25 index persisted with a FAISS store, building it from the docstore if missing."""
+    bm25_dir = Path(cache_path) / BM25_DIRNAME
+    corpus = corpus_digest(vectorstore)
+    if (bm25_dir / "meta.json").exists():
+        index = BM25Index.load(bm25_dir)
+        if index.corpus == corpus:
+            return index
+        logger.warning("BM25 index is out of sync with the vector store; rebuilding.")
+
+    texts = [doc.page_content for doc in faiss_documents(vectorstore)]
+    index = BM25Index().fit(texts)
+    index.corpus = corpus
+    index.save(bm25_dir)
+    logger.info(f"Saved BM25 index ({index.n_docs} chunks) to {bm25_dir}")
+    return index
+
+
+# ---------------------------------------------------------------
+# Sub-query extraction
+# ---------------------------------------------------------------
+_LIST_FIELDS = re.compile(r"\*\*(Weak Areas|Top Skills|Missing Skills):\*\*\s*(.+)", re.IGNORECASE)
+_LABELLED_BULLET = re.compile(r"^[ \t]*(?:[-*]|\d+\.)[ \t]+\*\*([^*\n]+?):?\*\*:?[ \t]*(.*)$", re.MULTILINE)
+_METRIC = re.compile(r"^[\s$%:.,\d\-–]+$")
+
+
+def extract_subqueries(summary: str | dict, limit: int) -> list[str]:
+    """
+    Turn an agent summary into focused queries: one per listed weak area or
+    skill, then one per labelled bullet (e.g. "**Practical Application:** ...").
+    Purely numeric metric bullets are skipped. For a structured payload the
+    lists are read from its fields and the bullets from its analysis.
+    """
+    payload = as_payload(summary)
+    if payload is not None:
+        listed, summary = query_terms(payload), payload.get("analysis", "")
+    else:
+        listed = [value for _, values in _LIST_FIELDS.findall(summary) for value in values.split(",")]
+    queries = []
+    for value in listed:
+        value = value.strip().replace("_", " ")
+        if value and value.lower() != "none":
+            queries.append(value)
+    for label, text in _LABELLED_BULLET.findall(summary):
+        if not text or _METRIC.match(text):
+            continue
+        first_sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        queries.append(f"{label.strip()}: {first_sentence.replace('**', '')}")
+    return list(dict.fromkeys(queries))[:limit]
+
+
+# ---------------------------------------------------------------
+# Hybrid retrieval
+# ---------------------------------------------------------------
+def reciprocal_rank_fusion(rankings: list[np.ndarray], rrf_k: int = 60) -> list[int]:
+    """Fuse ranked lists of row ids; each list adds 1 / (rrf_k + rank) per row."""
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever:
+    """BM25 + FAISS retrieval over many sub-queries, merged with reciprocal-rank fusion."""
+
+    def __init__(self, vectorstore, bm25: BM25Index, k: int = 5, rrf_k: int = 60,
+                 normalize_L2: bool = NORMALIZE_L2):
+        self.vectorstore = vectorstore
+        self.normalize_L2 = normalize_L2
+        self.bm25 = bm25
+        self.k = k
+        self.rrf_k = rrf_k
+        self.documents = faiss_documents(vectorstore)
+
+    def _vector_rankings(self, queries: list[str], rows: np.ndarray | None) -> np.ndarray:
+        # One batched embedding call and one batched FAISS search for all sub-queries
+        vectors = np.asarray(self.vectorstore.embedding_function.embed_documents(queries), dtype=np.float32)
+        if self.normalize_L2:
+            faiss.normalize_L2(vectors)
+        k = min(self.k, self.bm25.n_docs)
+        if rows is None:
+            _, found = self.vectorstore.index.search(vectors, k)
+            return found
+
+        # Metadata filter applied inside FAISS, so k hits come from the allowed rows only
+        selector = faiss.IDSelectorBatch(rows)
+        index = self.vectorstore.index
+        if isinstance(index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        _, found = index.search(vectors, k, params=params)
+        return found
+
+    def _bm25_rankings(self, queries: list[str], rows: np.ndarray | None) -> list[np.ndarray]:
+        scores = self.bm25.score(queries)
+        if rows is not None:
+            allowed = np.zeros(scores.shape[1], dtype=bool)
+            allowed[rows] = True
+            scores[:, ~allowed] = 0
+        k = min(self.k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rankings = []
+        for q, candidates in enumerate(top):
+            candidates = candidates[scores[q, candidates] > 0]
+            rankings.append(candidates[np.argsort(-scores[q, candidates])])
+        return rankings
+
+    def retrieve(self, queries: list[str], top_k: int, rows: np.ndarray | None = None) -> list[Document]:
+        """Return up to ``top_k`` distinct chunks, best fused rank first, optionally only from ``rows``."""
+        if rows is not None and not len(rows):
+            return []
+        rankings = [found[found >= 0] for found in self._vector_rankings(queries, rows)]
+        if self.bm25.has_terms:
+            rankings += self._bm25_rankings(queries, rows)
+
+        results, seen = [], set()
+        for row in reciprocal_rank_fusion(rankings, self.rrf_k):
+            doc = self.documents[row]
+            # Identical chunks (e.g. a slide repeated across files) are sent once
+            digest = hashlib.sha1(doc.page_content.strip().encode("utf-8")).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            results.append(doc)
+            if len(results) == top_k:
+                break
+        return results
@@ -0,0 +1,274 @@
+"""
+At-risk student scoring for the performance agent.
+
+Every (student, course, semester) record of a registrar export is scored
+against its cohort, the other records of the same course and semester, in a
+few grouped, vectorized passes:
+
+* z-scores of percentage, grade points and attendance within the cohort;
+* an attendance-adjusted risk score: how far percentage and attendance fall
+  below the cohort mean, weighted by ``ATTENDANCE_WEIGHT``;
+* low-outlier flags by Tukey's IQR fences and by the median absolute deviation
+  (modified z-score below ``MAD_CUTOFF``).
+
+Scores are saved as Parquet next to a manifest. When the export only grew since
+the last refresh, just the appended rows are read and only the cohorts they
+touch are rescored. The at-risk records are also saved on their own, highest
+risk first, so queries page through them without loading every score.
+
+Usage:
+    python risk_scores.py refresh machine_learning_performance.csv
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from filelock import FileLock
+
+from csv_ingest import HEAD_BYTES, head_digest, plan_ingest, read_csv_range, source_unchanged
+
+logger = logging.getLogger("performance_agent")
+
+SCORES_DIR = Path(os.getenv("PERFORMANCE_SCORES_DIR", "./performance_scores"))
+INGEST_CHUNK_ROWS = int(os.getenv("PERFORMANCE_SCORES_CHUNK_ROWS", 500_000))
+# A record is at risk when its risk score reaches RISK_THRESHOLD, it is a low
+# outlier of its cohort, or attendance is below MIN_ATTENDANCE
+RISK_THRESHOLD = float(os.getenv("PERFORMANCE_RISK_THRESHOLD", 1.25))
+ATTENDANCE_WEIGHT = float(os.getenv("PERFORMANCE_ATTENDANCE_WEIGHT", 0.35))
+MIN_ATTENDANCE = float(os.getenv("PERFORMANCE_MIN_ATTENDANCE", 70))
+IQR_FENCE = 1.5
+MAD_CUTOFF = -3.5
+
+REQUIRED_COLUMNS = [
+    "student_id",
+    "student_name",
+    "course",
+    "marks_obtained",
+    "total_marks",
+    "grade",
+    "grade_points",
+    "attendance_percentage",
+    "semester",
+]
+COHORT_KEYS = ["course", "semester"]
+RECORD_KEYS = ["student_id", "course", "semester"]
+SETTINGS = {
+    "risk_threshold": RISK_THRESHOLD,
+    "attendance_weight": ATTENDANCE_WEIGHT,
+    "min_attendance": MIN_ATTENDANCE,
+    "iqr_fence": IQR_FENCE,
+    "mad_cutoff": MAD_CUTOFF,
+}
+
+# At-risk tables opened by this process: scores dir -> (manifest mtime, manifest, DataFrame)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def scores_path(source: Path, root: Path = SCORES_DIR) -> Path:
+    source = Path(source).resolve()
+    return Path(root) / f"{source.stem[:60]}-{hashlib.sha256(str(source).encode('utf-8')).hexdigest()[:10]}"
+
+
+def _zscore(values: pd.Series, codes: np.ndarray) -> np.ndarray:
+    grouped = values.groupby(codes)
+    mean = grouped.transform("mean").to_numpy()
+    std = grouped.transform("std").to_numpy()
+    valid = np.isfinite(std) & (std > 0)
+    return np.divide(values.to_numpy() - mean, std, out=np.zeros(len(values)), where=valid)
+
+
+def _as_categories(df: pd.DataFrame) -> pd.DataFrame:
+    # concat of categoricals with different categories falls back to object
+    return df.astype({"course": "category", "grade": "category", "semester": "category"})
+
+
+def score_records(df: pd.DataFrame) -> pd.DataFrame:
+    """Cohort z-scores, risk score and outlier flags of each record; ``df`` must hold whole cohorts."""
+    df = df.reset_index(drop=True)
+    total = pd.to_numeric(df["total_marks"], errors="coerce")
+    percentage = pd.to_numeric(df["marks_obtained"], errors="coerce") / total.where(total > 0) * 100
+    attendance = pd.to_numeric(df["attendance_percentage"], errors="coerce")
+    # A blank course or semester is a cohort of its own rather than a NaN code
+    codes = df.groupby(COHORT_KEYS, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+
+    z_percentage = _zscore(percentage, codes)
+    z_attendance = _zscore(attendance, codes)
+    risk = (1 - ATTENDANCE_WEIGHT) * -z_percentage + ATTENDANCE_WEIGHT * -z_attendance
+
+    grouped = percentage.groupby(codes)
+    q1 = grouped.quantile(0.25).to_numpy()[codes]
+    q3 = grouped.quantile(0.75).to_numpy()[codes]
+    median = grouped.transform("median").to_numpy()
+    mad = (percentage - median).abs().groupby(codes).transform("median").to_numpy()
+    deviation = percentage.to_numpy() - median
+    modified_z = np.divide(0.6745 * deviation, mad, out=np.zeros(len(df)), where=mad > 0)
+
+    scores = df.assign(
+        percentage=percentage,
+        cohort_size=np.bincount(codes)[codes],
+        z_percentage=z_percentage,
+        z_grade_points=_zscore(pd.to_numeric(df["grade_points"], errors="coerce"), codes),
+        z_attendance=z_attendance,
+        risk_score=risk,
+        iqr_outlier=percentage.to_numpy() < q1 - IQR_FENCE * (q3 - q1),
+        mad_outlier=modified_z < MAD_CUTOFF,
+        low_attendance=attendance.to_numpy() < MIN_ATTENDANCE,
+    )
+    scores["at_risk"] = (
+        (scores["risk_score"] >= RISK_THRESHOLD) | scores["iqr_outlier"] | scores["mad_outlier"] | scores["low_attendance"]
+    )
+    return scores
+
+
+def _cohort_summary(scores: pd.DataFrame) -> list[dict]:
+    summary = scores.groupby(COHORT_KEYS, sort=True, observed=True, dropna=False).agg(
+        records=("at_risk", "size"), at_risk=("at_risk", "sum")
+    ).reset_index()
+    return [
+        {"course": str(r.course), "semester": str(r.semester), "records": int(r.records), "at_risk": int(r.at_risk)}
+        for r in summary.itertuples(index=False)
+    ]
+
+
+def refresh_scores(source, root: Path = SCORES_DIR) -> Path:
+    """
+    Bring the risk scores of ``source`` up to date and return their directory.
+
+    Appended rows rescore only the cohorts they belong to; a later row for the
+    same student, course and semester replaces the earlier one. Any other change
+    to the file, or to the scoring settings, rescores everything.
+    """
+    source = Path(source).resolve()
+    path = scores_path(source, root)
+    path.mkdir(parents=True, exist_ok=True)
+    manifest_file = path / "manifest.json"
+
+    with FileLock(str(path / ".lock")):
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8")) if manifest_file.exists() else None
+        if manifest and manifest["settings"] != SETTINGS:
+            manifest = None
+        if source_unchanged(source, manifest):
+            return path
+
+        # Taken before reading, so a change made while reading shows up on the next call
+        mtime_ns = source.stat().st_mtime_ns
+        header, incremental, end = plan_ingest(source, manifest, REQUIRED_COLUMNS)
+        offset = manifest["bytes_ingested"] if incremental else 0
+        if end <= offset:
+            return path
+
+        # Few distinct courses, semesters and grades: categoricals group and save much faster
+        dtypes = {"student_id": str, "student_name": str, "course": "category", "grade": "category", "semester": "category"}
+        chunks = list(read_csv_range(source, header, offset, end, REQUIRED_COLUMNS, INGEST_CHUNK_ROWS, dtypes))
+        new_rows = _as_categories(pd.concat(chunks, ignore_index=True)) if chunks else pd.DataFrame(columns=REQUIRED_COLUMNS)
+
+        if incremental:
+            stored = pd.read_parquet(path / manifest["scores"])
+            touched = pd.MultiIndex.from_frame(new_rows[COHORT_KEYS].drop_duplicates())
+            in_touched = pd.MultiIndex.from_frame(stored[COHORT_KEYS]).isin(touched)
+            cohorts = _as_categories(pd.concat([stored.loc[in_touched, REQUIRED_COLUMNS], new_rows], ignore_index=True))
+            rescored = score_records(cohorts.drop_duplicates(RECORD_KEYS, keep="last"))
+            scores = _as_categories(pd.concat([stored[~in_touched], rescored], ignore_index=True))
+        else:
+            scores = score_records(new_rows.drop_duplicates(RECORD_KEYS, keep="last"))
+
+        at_risk = scores[scores["at_risk"]].sort_values("risk_score", ascending=False, kind="stable")
+        version = uuid.uuid4().hex[:8]
+        new_manifest = {
+            "source": str(source),
+            "columns": header,
+            "head_digest": head_digest(source, min(HEAD_BYTES, end)),
+            "bytes_ingested": end,
+            "source_mtime_ns": mtime_ns,
+            "rows_ingested": (manifest["rows_ingested"] if incremental else 0) + len(new_rows),
+            "settings": SETTINGS,
+            "records": len(scores),
+            "at_risk_records": len(at_risk),
+            "cohorts": _cohort_summary(scores),
+            "scores": f"scores-{version}.parquet",
+            "at_risk": f"at_risk-{version}.parquet",
+        }
+        scores.to_parquet(path / new_manifest["scores"], index=False)
+        at_risk.to_parquet(path / new_manifest["at_risk"], index=False)
+        # The manifest switch is the commit point; the tables it names are complete
+        tmp = path / f".manifest-{version}.json"
+        tmp.write_text(json.dumps(new_manifest), encoding="utf-8")
+        os.replace(tmp, manifest_file)
+        for stale in path.glob("*.parquet"):
+            if stale.name not in (new_manifest["scores"], new_manifest["at_risk"]):
+                stale.unlink(missing_ok=True)
+
+        logger.info(
+            f"{'Rescored appended cohorts of' if incremental else 'Scored'} {source.name}: "
+            f"{len(new_rows)} rows read, {len(at_risk)} of {len(scores)} records at risk"
+        )
+        return path
+
+
+def get_at_risk(source, root: Path = SCORES_DIR) -> tuple[dict, pd.DataFrame]:
+    """Refresh the scores of ``source`` if the file changed; returns (manifest, at-risk records), cached per process."""
+    path = refresh_scores(source, root)
+    manifest_file = path / "manifest.json"
+    stamp = manifest_file.stat().st_mtime_ns
+    with _loaded_lock:
+        cached = _loaded.get(str(path))
+        if cached and cached[0] == stamp:
+            return cached[1], cached[2]
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        at_risk = pd.read_parquet(path / manifest["at_risk"])
+        _loaded[str(path)] = (stamp, manifest, at_risk)
+        return manifest, at_risk
+
+
+def risk_reasons(record) -> str:
+    """Why a scored record is at risk, for reports."""
+    reasons = []
+    if record["risk_score"] >= RISK_THRESHOLD:
+        reasons.append(f"risk {record['risk_score']:.2f}")
+    if record["iqr_outlier"] or record["mad_outlier"]:
+        reasons.append(f"low outlier ({record['percentage']:.1f}%, z {record['z_percentage']:.2f})")
+    if record["low_attendance"]:
+        reasons.append(f"attendance {record['attendance_percentage']:.1f}%")
+    return ", ".join(reasons)
+
+
+def at_risk_page(source, course: str | None = None, semester: str | None = None, page: int = 1,
+                 page_size: int = 50, root: Path = SCORES_DIR) -> dict:
+    """One page of the at-risk records of ``source``, highest risk first, optionally for one course or semester."""
+    if page < 1 or not 1 <= page_size <= 1000:
+        raise ValueError("page must be >= 1 and page_size between 1 and 1000")
+    manifest, at_risk = get_at_risk(source, root)
+    selected = np.ones(len(at_risk), dtype=bool)
+    if course:
+        selected &= (at_risk["course"].str.lower() == course.strip().lower()).to_numpy()
+    if semester:
+        selected &= (at_risk["semester"].str.lower() == semester.strip().lower()).to_numpy()
+    matches = np.flatnonzero(selected)
+    rows = at_risk.iloc[matches[(page - 1) * page_size:page * page_size]]
+    return {
+        "total": int(len(matches)),
+        "records": manifest["records"],
+        "page": page,
+        "page_size": page_size,
+        "pages": math.ceil(len(matches) / page_size),
+        "students": json.loads(rows.to_json(orient="records")),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Build or refresh the at-risk scores of a performance export.")
+    parser.add_argument("command", choices=["refresh"])
+    parser.add_argument("source", type=Path)
+    parser.add_argument("--scores-dir", type=Path, default=SCORES_DIR)
+    args = parser.parse_args()
+    print(refresh_scores(args.source, args.scores_dir))
@@ -1,11 +1,24 @@
 from mcp.server.fastmcp import FastMCP
+import asyncio
+from typing import Any
 import os
-import pandas as pd
+import threading
+from pathlib import Path
 import numpy as np
 import logging
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_huggingface import HuggingFaceEmbeddings
+from course_relevance import CourseRelevance
+from csv_ingest import csv_header
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from market_rollups import get_rollups
+from market_sketch import MarketSketch, get_market_sketch
+from market_snapshot import MarketSnapshot, get_snapshot
+from deadlines import DeadlineExceeded, check_deadline, run_until
+from llm_fallback import check_mode, finish_report, narrative_result
+from payloads import PAYLOAD_VERSION, TrendPayload, format_rising, number
 
 # ============================================
 # 🚀 Setup
@@ -19,13 +32,57 @@ server = FastMCP(name="trend_agent")
 server.settings.port = 9003
 server.settings.host = "localhost"
 
+# Postings files at least this large use streaming sketches instead of the exact snapshot
+STREAMING_MIN_BYTES = int(os.getenv("TREND_STREAMING_MIN_BYTES", 2 * 2 ** 30))
+# Momentum compares the share of postings in the last N months with the N before
+TREND_MOMENTUM_MONTHS = int(os.getenv("TREND_MOMENTUM_MONTHS", 6))
+# Same model and on-disk vector cache as the recommender
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_CACHE_DIR = Path(os.getenv("VECTORSTORE_CACHE_DIR", "./vectorstore_cache")) / "embeddings"
+
+_relevance = None
+_relevance_lock = threading.Lock()
+
+
+def get_relevance() -> CourseRelevance:
+    """The course relevance engine, with its embedding model loaded once per process."""
+    global _relevance
+    with _relevance_lock:
+        if _relevance is None:
+            _relevance = CourseRelevance(CachedEmbeddings(
+                HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+                EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, os.getenv("EMBEDDING_CACHE_DTYPE", "float32")),
+            ))
+        return _relevance
+
+
+def course_weights(snapshot: MarketSnapshot | MarketSketch, course_name: str,
+                   deadline: float | None = None) -> tuple[np.ndarray, list[str]]:
+    """
+    Profile (or, for a sketch, title) weights of the postings relevant to
+    ``course_name`` and the titles and skills that made them relevant. Falls back to keyword matching when the
+    embedding model cannot be loaded or ``deadline`` has already passed.
+    """
+    try:
+        check_deadline(deadline, "course embedding")
+        relevance = get_relevance()
+        title_match = relevance.match(course_name, snapshot.titles)
+        skill_match = relevance.match(course_name, snapshot.skills)
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding relevance unavailable ({e}); using keyword matching.")
+        return snapshot.profile_weights(course_name.lower().split()), []
+    terms = [snapshot.titles[i] for i in np.flatnonzero(title_match)]
+    terms += [snapshot.skills[i] for i in np.flatnonzero(skill_match)]
+    logger.info(f"🎯 {len(terms)} titles and skills relevant to '{course_name}'")
+    return snapshot.match_weights(title_match, skill_match), terms
+
 # ============================================
 # 🧠 Tool Definition
 # ============================================
-@server.tool()
-def analyze_job_trends(course_name: str, file_path: str, output_path: str) -> dict[str, str]:
+def build_trend_report(course_name: str, file_path: str, deadline: float | None = None) -> dict:
     """
-    Analyze job market trends related to a course using Gemini,
+    Blocking analysis behind ``analyze_job_trends``; returns the structured
+    result without its LLM narrative, plus the narrative's prompt.
     """
     print("analyze_job_trends called")
     try:
@@ -37,64 +94,45 @@ def analyze_job_trends(course_name: str, file_path: str, output_path: str) -> di
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        df = pd.read_csv(file_path)
-        required_cols = [
-            "job_title",
-            "required_skills",
-            "salary_usd",
-            "experience_level",
-            "industry",
-            "salary_bucket"
-        ]
-        missing = [c for c in required_cols if c not in df.columns]
-        if missing:
-            raise ValueError(f"Missing columns in dataset: {', '.join(missing)}")
-
-        # ===============================
-        # 🔍 Preprocess
-        # ===============================
-        df["job_title"] = df["job_title"].astype(str).str.lower()
-        df["required_skills"] = df["required_skills"].astype(str).str.lower()
-        df["industry"] = df["industry"].astype(str)
-        df["salary_usd"] = pd.to_numeric(df["salary_usd"], errors="coerce")
-
-        course_keywords = course_name.lower().split()
-        df_relevant = df[
-            df["job_title"].apply(lambda t: any(k in t for k in course_keywords)) |
-            df["required_skills"].apply(lambda s: any(k in s for k in course_keywords))
-        ]
-
-        if df_relevant.empty:
-            logger.warning(f"⚠️ No direct job matches for '{course_name}', using all data.")
-            df_relevant = df.copy()
-
         # ===============================
         # 📊 Quantitative Analysis
         # ===============================
-        avg_salary = df_relevant["salary_usd"].mean()
-        salary_range = (df_relevant["salary_usd"].min(), df_relevant["salary_usd"].max())
-        top_roles = df_relevant["job_title"].value_counts().head(5).index.tolist()
-        top_industries = df_relevant["industry"].value_counts().head(5).index.tolist()
-
-        # Skill frequency
-        skills_series = df_relevant["required_skills"].str.split(",").explode().str.strip()
-        top_skills = skills_series.value_counts().head(10).index.tolist()
+        if os.path.getsize(file_path) >= STREAMING_MIN_BYTES:
+            # Feeds this large are sketched per title in one parallel pass, once per file
+            aggregates = get_market_sketch(file_path)
+        else:
+            # Aggregates are precomputed per postings file and refreshed when it changes
+            aggregates = get_snapshot(file_path)
+        weights, relevant_terms = course_weights(aggregates, course_name, deadline)
+        market = aggregates.summarize(weights)
+        if not market.matched:
+            logger.warning(f"⚠️ No direct job matches for '{course_name}', using all data.")
 
-        # Experience distribution
-        exp_dist = df_relevant["experience_level"].value_counts(normalize=True).mul(100).round(1).to_dict()
+        avg_salary = market.avg_salary
+        salary_range = market.salary_range
+        salary_quantiles = market.salary_quantiles
+        top_roles = market.top_roles
+        top_industries = market.top_industries
+        top_skills = market.top_skills
+        exp_dist = market.exp_dist
+
+        # Skill and role momentum from per-month rollups, when postings are dated
+        rising_skills, rising_roles, momentum_months = [], [], TREND_MOMENTUM_MONTHS
+        if "posting_date" in csv_header(file_path):
+            rollups = get_rollups(file_path, "month")
+            skill_momentum = rollups.momentum("skill", TREND_MOMENTUM_MONTHS)
+            role_momentum = rollups.momentum("role", TREND_MOMENTUM_MONTHS)
+            if skill_momentum is not None:
+                momentum_months = skill_momentum.window
+                rising_skills = [[value, number(growth)] for value, growth in skill_momentum.rising()]
+                rising_roles = [[value, number(growth)] for value, growth in role_momentum.rising()]
 
         logger.info(f"📊 Extracted {len(top_roles)} top roles, {len(top_skills)} top skills.")
 
 
         # ===============================
-        # 🧠 Gemini-Powered Industry Insights
+        # 🧠 Gemini Prompt; the narrative itself is added by the tool
         # ===============================
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.3,
-            google_api_key=os.getenv("GOOGLE_API_KEY"),
-        )
-
         prompt = ChatPromptTemplate.from_template("""
         You are an AI Industry Analyst specializing in curriculum-to-job-market alignment.
 
@@ -106,7 +144,10 @@ def analyze_job_trends(course_name: str, file_path: str, output_path: str) -> di
         Top Industries: {top_industries}
         Average Salary (USD): {avg_salary:.2f}
         Salary Range: {salary_range}
+        Salary Percentiles (p10/p50/p90): {salary_quantiles}
         Experience Level Distribution (%): {exp_dist}
+        Fastest-Rising Skills (share of postings, last {momentum_months} months vs the {momentum_months} before): {rising_skills}
+        Fastest-Rising Roles (same windows): {rising_roles}
 
         ---- Tasks ----
         1️⃣ Summarize how this course aligns with 2025 job market trends.
@@ -123,33 +164,82 @@ def analyze_job_trends(course_name: str, file_path: str, output_path: str) -> di
             top_industries=top_industries,
             avg_salary=avg_salary,
             salary_range=salary_range,
+            salary_quantiles=salary_quantiles,
             exp_dist=exp_dist,
+            momentum_months=momentum_months,
+            rising_skills=format_rising(rising_skills),
+            rising_roles=format_rising(rising_roles),
         )
 
-        logger.info("🤖 Sending market analysis request to Gemini...")
-        ai_response = llm.invoke(formatted_prompt)
-        ai_summary = ai_response.content
-
         # ===============================
-        # 🗂️ Save Report
+        # 🗂️ Structured Result
         # ===============================
-        
-        # Prepare the formatted string for exp_dist outside the f-string
-        exp_dist_str = '\n'.join([f'  - {key}: {value:.1f}%' for key, value in exp_dist.items()])
-
-        report = f"""# Industry Trend Report for {course_name}\n## 📊 Quantitative Insights\n- **Top Industries:** {', '.join(top_industries)}\n- **Top Roles:** {', '.join(top_roles)}\n- **Top Skills:** {', '.join(top_skills)}\n- **Average Salary:** ${avg_salary:,.2f}\n- **Salary Range:** ${salary_range[0]:,.2f} - ${salary_range[1]:,.2f}\n- **Experience Distribution:**\n{exp_dist_str}\n---\n## 💬 Gemini AI Analysis\n{ai_summary}"""
-
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(report)
+        data: TrendPayload = {
+            "kind": "trends",
+            "version": PAYLOAD_VERSION,
+            "course_name": course_name,
+            "scope": {"matched": market.matched, "postings": number(market.postings, 1), "relevant_terms": relevant_terms},
+            "top_industries": top_industries,
+            "top_roles": top_roles,
+            "top_skills": top_skills,
+            "avg_salary": number(avg_salary, 2),
+            "salary_range": [number(salary_range[0], 2), number(salary_range[1], 2)],
+            "salary_quantiles": {k: number(v, 2) for k, v in salary_quantiles.items()},
+            "exp_dist": {str(k): number(v, 1) for k, v in exp_dist.items()},
+            "momentum": {"months": momentum_months, "rising_skills": rising_skills, "rising_roles": rising_roles},
+            "analysis": "",
+            "analysis_status": "pending",
+        }
 
         logger.info("✅ Job trend analysis completed successfully.")
-        return {"summary": report}
+        return {"data": data, "prompt": formatted_prompt}
 
     except Exception as e:
         logger.error(f"💥 Error in trend analysis: {str(e)}")
         return {"error": str(e)}
 
+
+def analysis_llm(**options) -> ChatGoogleGenerativeAI:
+    """Chat model writing the market narrative; ``options`` carry the request timeout."""
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        temperature=0.3,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        **options,
+    )
+
+
+@server.tool()
+async def analyze_job_trends(course_name: str, file_path: str, output_path: str,
+                             deadline: float | None = None, analysis: str = "full") -> dict[str, Any]:
+    """
+    Analyze job market trends related to a course using Gemini,
+    returning the markdown report in ``summary`` and the structured payload in ``data``.
+    ``deadline`` (Unix time) bounds the whole call, embedding and LLM stages included.
+    ``analysis`` is "full", "quantitative" or "deferred", as for the feedback agent;
+    deferred narratives are fetched with ``get_analysis``.
+    """
+    try:
+        check_mode(analysis)
+        result = await run_until(deadline, asyncio.to_thread(
+            build_trend_report, course_name, file_path, deadline
+        ), "trend analysis")
+    except (DeadlineExceeded, ValueError) as e:
+        logger.error(f"💥 {str(e)}")
+        return {"error": str(e)}
+    if "error" in result:
+        return result
+    return await finish_report(result, analysis, analysis_llm, output_path, deadline, "trend analysis")
+
+
+@server.tool()
+async def get_analysis(handle: str, wait_seconds: float = 0) -> dict[str, Any]:
+    """
+    Report of a deferred ``analyze_job_trends`` call once its LLM narrative is
+    written, or ``{"status": "pending"}`` after waiting up to ``wait_seconds``.
+    """
+    return await narrative_result(handle, wait_seconds)
+
 # ============================================
 # 🚀 Run MCP Server
 # ============================================
@@ -0,0 +1,169 @@
+"""
+FAISS index tiers for the curriculum vector stores.
+
+Small corpora keep an exact flat index. Larger ones get an IVF index, and very
+large ones IVF-PQ, trained on a sample of the vectors. Indexes are read back
+memory-mapped and read-only: the inverted lists stay on disk and are shared
+through the OS page cache by every worker process that opens the same file.
+Loaded stores are cached per process and reloaded only when the files change.
+"""
+import logging
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger("recommender_agent")
+
+# Corpus sizes (in chunks) at which the index type changes
+IVF_MIN_VECTORS = int(os.getenv("FAISS_IVF_MIN_VECTORS", 20_000))
+IVFPQ_MIN_VECTORS = int(os.getenv("FAISS_IVFPQ_MIN_VECTORS", 500_000))
+# Vectors used to train the coarse quantizer / PQ codebooks
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", 100_000))
+# Fraction of IVF lists probed per query; the main recall-vs-latency knob
+NPROBE_FRACTION = float(os.getenv("FAISS_NPROBE_FRACTION", 1 / 16))
+# Bytes per vector stored by IVF-PQ (before the 8-bit code of each sub-vector)
+PQ_BYTES = int(os.getenv("FAISS_PQ_BYTES", 48))
+
+EMBED_BATCH_SIZE = 1024
+# Whether stores normalize vectors (cosine instead of L2 distance); queries must match
+NORMALIZE_L2 = False
+
+# Stores opened by this process: resolved path -> (file mtimes, FAISS)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def choose_index_type(n_vectors: int) -> str:
+    if n_vectors < IVF_MIN_VECTORS:
+        return "flat"
+    if n_vectors < IVFPQ_MIN_VECTORS:
+        return "ivf"
+    return "ivfpq"
+
+
+def _pq_subquantizers(dim: int) -> int:
+    # PQ needs the dimension to split evenly into sub-vectors
+    m = min(PQ_BYTES, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(vectors: np.ndarray, kind: str | None = None, seed: int = 0) -> faiss.Index:
+    """Build a flat, IVF or IVF-PQ L2 index over ``vectors`` (chosen by size if ``kind`` is None)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    kind = kind or choose_index_type(n)
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+        return index
+
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+    quantizer = faiss.IndexFlatL2(dim)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    elif kind == "ivfpq":
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+
+    rng = np.random.default_rng(seed)
+    sample = vectors[np.sort(rng.choice(n, min(n, TRAIN_SAMPLE), replace=False))]
+    index.train(sample)
+    for start in range(0, n, TRAIN_SAMPLE):
+        index.add(vectors[start:start + TRAIN_SAMPLE])
+    index.nprobe = max(1, int(nlist * NPROBE_FRACTION))
+    return index
+
+
+def embed_texts(embeddings, texts: list[str]) -> np.ndarray:
+    """Embed ``texts`` in batches into one float32 matrix."""
+    batches = [
+        np.asarray(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]), dtype=np.float32)
+        for start in range(0, len(texts), EMBED_BATCH_SIZE)
+    ]
+    return np.vstack(batches)
+
+
+def save_vectorstore(vectorstore: FAISS, cache_path: Path) -> None:
+    """
+    Save a store next to its final location and swap the files in with os.replace.
+
+    Processes that have the old index memory-mapped keep reading the old file
+    instead of seeing it truncated and rewritten under them.
+    """
+    cache_path = Path(cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".save_", dir=cache_path))
+    try:
+        vectorstore.save_local(str(tmp_dir))
+        for name in ("index.faiss", "index.pkl"):
+            os.replace(tmp_dir / name, cache_path / name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _loaded.pop(str(cache_path.resolve()), None)
+
+
+def build_vectorstore(documents, embeddings, cache_path: Path, kind: str | None = None, ids=None) -> FAISS:
+    """Embed ``documents``, index them with the tier that fits their count and save to ``cache_path``."""
+    vectors = embed_texts(embeddings, [doc.page_content for doc in documents])
+    if NORMALIZE_L2:
+        faiss.normalize_L2(vectors)
+    index = build_index(vectors, kind)
+    ids = list(ids) if ids is not None else [str(i) for i in range(len(documents))]
+    vectorstore = FAISS(
+        embeddings,
+        index,
+        InMemoryDocstore(dict(zip(ids, documents))),
+        dict(enumerate(ids)),
+        normalize_L2=NORMALIZE_L2,
+    )
+    save_vectorstore(vectorstore, cache_path)
+    logger.info(f"Saved {type(index).__name__} vector store ({len(documents)} chunks) to {cache_path}")
+    return vectorstore
+
+
+def read_vectorstore(cache_path: Path, embeddings, mmap: bool = True) -> FAISS:
+    """Read a saved store; ``mmap=False`` gives a private, writable copy for updates."""
+    cache_path = Path(cache_path)
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(str(cache_path / "index.faiss"), flags)
+    # Same file FAISS.save_local writes; only caches this process created are loaded
+    with open(cache_path / "index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id, normalize_L2=NORMALIZE_L2)
+
+
+def load_vectorstore(cache_path: Path, embeddings) -> FAISS:
+    """
+    Open a saved vector store with its index memory-mapped read-only.
+
+    The same store is returned on later calls in this process until its files
+    are rewritten.
+    """
+    cache_path = Path(cache_path).resolve()
+    index_file = cache_path / "index.faiss"
+    docstore_file = cache_path / "index.pkl"
+    stamp = (index_file.stat().st_mtime_ns, docstore_file.stat().st_mtime_ns)
+
+    with _loaded_lock:
+        cached = _loaded.get(str(cache_path))
+        if cached and cached[0] == stamp:
+            cached[1].embedding_function = embeddings
+            return cached[1]
+
+        vectorstore = read_vectorstore(cache_path, embeddings)
+        _loaded[str(cache_path)] = (stamp, vectorstore)
+        index = vectorstore.index
+        logger.info(f"Memory-mapped {type(index).__name__} vector store ({index.ntotal} chunks) from {cache_path}")
+        return vectorstore
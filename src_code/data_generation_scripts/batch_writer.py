@@ -0,0 +1,39 @@
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+
+def write_batches(batches: Iterable[pd.DataFrame], output_path, fmt: str | None = None) -> int:
+    """
+    Stream DataFrame batches to a single CSV or Parquet file without
+    materializing the full dataset. Returns the number of rows written.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fmt = (fmt or output_path.suffix.lstrip(".") or "csv").lower()
+
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for batch in batches:
+                table = pa.Table.from_pandas(batch, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(str(output_path), table.schema, compression="snappy")
+                writer.write_table(table)
+                rows += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif fmt == "csv":
+        for i, batch in enumerate(batches):
+            batch.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            rows += len(batch)
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    return rows
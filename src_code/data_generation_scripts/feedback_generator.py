@@ -0,0 +1,120 @@
+import argparse
+import time
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from batch_writer import write_batches
+from synthetic_catalog import course_catalog, format_ids, sample_courses
+
+RATING_LABELS = np.array(["Very Poor", "Poor", "Average", "Good", "Excellent"])
+
+CRITERIA = [
+    "course_content",
+    "lecture_delivery",
+    "teaching_materials",
+    "practicals",
+    "assessment",
+]
+
+# Text feedback templates grouped by tone; a row's tone follows its mean rating.
+NEGATIVE_FEEDBACK = [
+    "Too much theory, please add more practical sessions.",
+    "Content is repetitive, can be made concise.",
+    "Good material but assessments are tough.",
+    "Slides are good but explanations can be improved.",
+]
+NEUTRAL_FEEDBACK = [
+    "Needs more real-world projects.",
+    "More examples would make concepts clearer.",
+    "Include case studies from the industry.",
+    "Add more coding assignments.",
+]
+POSITIVE_FEEDBACK = [
+    "Excellent course! Loved the lectures.",
+    "Very interactive sessions, great learning experience!",
+]
+TEXT_FEEDBACK = np.array(NEGATIVE_FEEDBACK + NEUTRAL_FEEDBACK + POSITIVE_FEEDBACK)
+_TONE_OFFSETS = np.array([0, len(NEGATIVE_FEEDBACK), len(NEGATIVE_FEEDBACK) + len(NEUTRAL_FEEDBACK)])
+_TONE_SIZES = np.array([len(NEGATIVE_FEEDBACK), len(NEUTRAL_FEEDBACK), len(POSITIVE_FEEDBACK)])
+
+
+def generate_feedback_batches(
+    num_students: int,
+    courses=None,
+    courses_per_student: int = 1,
+    batch_size: int = 100_000,
+    seed: int = 42,
+    numeric: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield feedback records in batches of ``batch_size`` students.
+
+    Ratings come from a per-course quality profile plus per-student leniency and
+    noise, so criteria of the same course move together. With ``numeric=True`` the
+    ratings are written as 1–5 int8 codes (the ``transform_feedback_data`` format),
+    otherwise as "Very Poor"…"Excellent" labels.
+    """
+    rng = np.random.default_rng(seed)
+    courses = np.asarray(courses if courses is not None else course_catalog(1))
+    per_student = min(courses_per_student, len(courses))
+    width = max(3, len(str(num_students)))
+
+    course_quality = rng.normal(3.2, 0.5, (len(courses), len(CRITERIA)))
+
+    for start in range(0, num_students, batch_size):
+        size = min(batch_size, num_students - start)
+        n_rows = size * per_student
+        ids = np.repeat(np.arange(start + 1, start + size + 1), per_student)
+        leniency = np.repeat(rng.normal(0, 0.6, size), per_student)
+
+        course_idx = sample_courses(rng, size, len(courses), per_student).ravel()
+        latent = course_quality[course_idx] + leniency[:, None] + rng.normal(0, 0.9, (n_rows, len(CRITERIA)))
+        ratings = np.clip(np.rint(latent), 1, 5).astype(np.int8)
+
+        tone = np.digitize(ratings.mean(axis=1), [2.6, 3.6])
+        text_idx = _TONE_OFFSETS[tone] + (rng.random(n_rows) * _TONE_SIZES[tone]).astype(np.int64)
+
+        batch = pd.DataFrame({
+            "student_id": format_ids("S", ids, width),
+            "course": pd.Categorical.from_codes(course_idx, categories=courses),
+        })
+        for i, col in enumerate(CRITERIA):
+            if numeric:
+                batch[col] = ratings[:, i]
+            else:
+                batch[col] = pd.Categorical.from_codes(ratings[:, i] - 1, categories=RATING_LABELS)
+        batch["text_feedback"] = pd.Categorical.from_codes(text_idx, categories=TEXT_FEEDBACK)
+        yield batch
+
+
+def generate_feedback_data(output_path, num_students: int, n_courses: int = 1, courses_per_student: int = 1,
+                           batch_size: int = 100_000, seed: int = 42, numeric: bool = False) -> int:
+    """Generate and stream a feedback dataset to CSV or Parquet (by file suffix)."""
+    batches = generate_feedback_batches(
+        num_students,
+        courses=course_catalog(n_courses),
+        courses_per_student=courses_per_student,
+        batch_size=batch_size,
+        seed=seed,
+        numeric=numeric,
+    )
+    return write_batches(batches, output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic student course feedback.")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--courses", type=int, default=1)
+    parser.add_argument("--courses-per-student", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--numeric", action="store_true", help="Write 1–5 codes instead of rating labels")
+    parser.add_argument("--output", default="data/generated/feedback.csv", help="Output .csv or .parquet path")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate_feedback_data(args.output, args.students, args.courses, args.courses_per_student,
+                                  args.batch_size, args.seed, args.numeric)
+    print(f"✅ Generated {rows:,} feedback rows → {args.output} ({time.perf_counter() - start:.1f}s)")
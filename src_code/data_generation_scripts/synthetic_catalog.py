@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Base course list; larger catalogs get numbered sections of these.
+COURSE_NAMES = [
+    "Machine Learning",
+    "Data Structures",
+    "Algorithms",
+    "Database Systems",
+    "Operating Systems",
+    "Computer Networks",
+    "Software Engineering",
+    "Artificial Intelligence",
+    "Deep Learning",
+    "Natural Language Processing",
+    "Computer Vision",
+    "Linear Algebra",
+    "Probability and Statistics",
+    "Discrete Mathematics",
+    "Cloud Computing",
+    "Information Security",
+]
+
+
+def course_catalog(n_courses: int) -> np.ndarray:
+    """Return ``n_courses`` distinct course names."""
+    if n_courses <= len(COURSE_NAMES):
+        return np.array(COURSE_NAMES[:n_courses])
+    sections = np.arange(n_courses) // len(COURSE_NAMES) + 1
+    base = np.resize(np.array(COURSE_NAMES), n_courses)
+    return np.char.add(np.char.add(base, " "), np.char.add("S", sections.astype(str)))
+
+
+def semester_catalog(n_semesters: int, first_year: int = 2023) -> np.ndarray:
+    """Return ``n_semesters`` consecutive semesters alternating Fall/Spring."""
+    terms = np.arange(n_semesters)
+    years = first_year + (terms + 1) // 2
+    names = np.where(terms % 2 == 0, "Fall", "Spring")
+    return np.char.add(np.char.add(names, " "), years.astype(str))
+
+
+def format_ids(prefix: str, ids: np.ndarray, width: int = 0) -> pd.Series:
+    """
+    Vectorized ``f"{prefix}{i:0{width}d}"`` backed by Arrow strings; ``np.char``
+    loops per element in Python and dominates generation time at millions of rows.
+    """
+    digits = pc.cast(pa.array(ids), pa.string())
+    if width:
+        digits = pc.utf8_lpad(digits, width=width, padding="0")
+    return pd.Series(pc.binary_join_element_wise(prefix, digits, ""), dtype=pd.ArrowDtype(pa.string()))
+
+
+def sample_courses(rng: np.random.Generator, n_rows: int, n_courses: int, per_row: int) -> np.ndarray:
+    """Draw ``per_row`` distinct course indices for each row, shape ``(n_rows, per_row)``."""
+    if per_row == 1:
+        return rng.integers(0, n_courses, size=(n_rows, 1))
+    # argsort of random keys is a vectorized sample without replacement.
+    return np.argsort(rng.random((n_rows, n_courses)), axis=1)[:, :per_row]
@@ -1,93 +1,194 @@
+import os
 import pandas as pd
-import re
-
-def transform_job_trend_data(input_csv, output_csv):
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# Columns read from the raw postings export
+KEEP_COLS = [
+    "job_id",
+    "job_title",
+    "required_skills",
+    "salary_usd",
+    "experience_level",
+    "industry",
+]
+
+# Kept when the export has them; posting_date feeds the time-windowed rollups
+OPTIONAL_COLS = [
+    "posting_date",
+    "remote_ratio",
+    "years_experience",
+    "company_location",
+]
+
+SALARY_BINS = [0, 50000, 100000, 150000, 200000, 500000]
+SALARY_LABELS = ["<50K", "50–100K", "100–150K", "150–200K", "200K+"]
+
+
+def normalize_skills(skills: pd.Series) -> tuple[pd.Series, pd.DataFrame, int]:
     """
-    Transforms a raw job market trends dataset into a clean, analysis-ready form.
-    Keeps only relevant columns and standardizes text fields.
+    Clean and deduplicate comma-separated skill lists with vectorized string ops.
+
+    Returns the cleaned skill strings, the exploded (row, skill) table with
+    duplicates removed, and the number of duplicate skills dropped.
     """
+    # Standardize delimiters before stripping punctuation, otherwise ";" and "|" are
+    # deleted outright and glue neighbouring skills together.
+    cleaned = (
+        skills.str.lower()
+        .str.replace(r"\s*(?:;|\||\s/\s)\s*", ",", regex=True)
+        .str.replace(r"[^a-z0-9, +#\-/]", "", regex=True)
+        .str.replace(r"\s*,[\s,]*", ", ", regex=True)
+        .str.strip(" ,")
+    )
 
-    # Load dataset
-    df = pd.read_csv(input_csv)
+    exploded = cleaned.str.split(", ").explode()
+    exploded = exploded[exploded.notna() & (exploded != "")]
+    pairs = pd.DataFrame({"row": exploded.index, "skill": exploded.array})
+    duplicated = pairs.duplicated().to_numpy()
+    n_duplicates = int(duplicated.sum())
 
-    # ----------------------------
-    # 1️⃣ Keep only useful columns
-    # ----------------------------
-    keep_cols = [
-        "job_title",
-        "required_skills",
-        "salary_usd",
-        "experience_level",
-        "industry"
-    ]
-    df = df[keep_cols]
+    if n_duplicates:
+        # Only rows that actually contained duplicates need their string rebuilt.
+        pairs = pairs[~duplicated]
+        dirty_rows = pd.unique(exploded.index[duplicated])
+        rebuilt = pairs[pairs["row"].isin(dirty_rows)].groupby("row", sort=False)["skill"].agg(", ".join)
+        cleaned.loc[rebuilt.index] = rebuilt
+
+    return cleaned, pairs, n_duplicates
+
+
+def transform_job_trend_chunk(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """Transform one chunk of raw postings; returns (jobs, job_id × skill table, stats)."""
+    stats = {"rows_in": len(df)}
 
     # ----------------------------
-    # 2️⃣ Clean salary column
+    # 1️⃣ Clean salary column
     # ----------------------------
-    # Remove invalid or non-numeric salaries
-    df["salary_usd"] = (
-        df["salary_usd"]
-        .astype(str)
-        .str.replace(r"[^0-9.]", "", regex=True)
-        .replace("", None)
-        .astype(float)
+    df["salary_usd"] = pd.to_numeric(
+        df["salary_usd"].str.replace(r"[^0-9.]", "", regex=True),
+        errors="coerce",
     )
 
-    # Drop rows with missing salary or job title
+    # Drop rows with missing job title or skills
     df = df.dropna(subset=["job_title", "required_skills"])
+    stats["rows_dropped_missing"] = stats["rows_in"] - len(df)
+
+    # Remove outliers for unrealistic salaries
+    in_range = df["salary_usd"].between(1000, 500000)
+    stats["rows_dropped_salary"] = int((~in_range).sum())
+    df = df[in_range].copy()
 
     # ----------------------------
-    # 3️⃣ Normalize text fields
+    # 2️⃣ Normalize text fields
     # ----------------------------
     df["job_title"] = df["job_title"].str.strip().str.lower()
-    df["required_skills"] = (
-        df["required_skills"]
-        .str.lower()
-        .apply(lambda x: re.sub(r"[^a-z0-9, +#\-/]", "", x))
-    )
     df["experience_level"] = df["experience_level"].str.strip().str.title()
     df["industry"] = df["industry"].fillna("Unknown").str.title()
+    if "company_location" in df.columns:
+        df["company_location"] = df["company_location"].str.strip().str.title()
 
-    # ----------------------------
-    # 4️⃣ Expand multiple skills into list-like structure
-    # ----------------------------
-    # Standardize delimiters
-    df["required_skills"] = df["required_skills"].str.replace(";", ",")
-    df["required_skills"] = df["required_skills"].str.replace("|", ",", regex=False)
-    df["required_skills"] = df["required_skills"].str.replace(" / ", ",", regex=False)
-
-    # Deduplicate comma-separated skills
-    def clean_skill_list(skill_str):
-        skills = [s.strip() for s in skill_str.split(",") if s.strip()]
-        unique = list(dict.fromkeys(skills))  # preserve order, remove duplicates
-        return ", ".join(unique)
-
-    df["required_skills"] = df["required_skills"].apply(clean_skill_list)
+    # ISO dates and plain numbers whatever the export's formatting
+    if "posting_date" in df.columns:
+        dates = pd.to_datetime(df["posting_date"].astype(object), errors="coerce")
+        df["posting_date"] = dates.dt.strftime("%Y-%m-%d").astype(pd.ArrowDtype(pa.string()))
+    for column in ("remote_ratio", "years_experience"):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column].str.replace(r"[^0-9.\-]", "", regex=True), errors="coerce")
 
     # ----------------------------
-    # 5️⃣ Normalize salary scale (optional)
+    # 3️⃣ Clean + deduplicate skills
     # ----------------------------
-    # Remove outliers for unrealistic salaries
-    df = df[df["salary_usd"].between(1000, 500000)]
+    df["required_skills"], pairs, stats["duplicate_skills_removed"] = normalize_skills(df["required_skills"])
+    skills_table = pd.DataFrame({
+        "job_id": df["job_id"].array.take(df.index.get_indexer(pairs["row"])),
+        "skill": pairs["skill"].array,
+    })
+    stats["skill_rows"] = len(skills_table)
 
     # ----------------------------
-    # 6️⃣ Compute derived stats (for better filtering later)
+    # 4️⃣ Salary buckets (for better filtering later)
     # ----------------------------
-    # Example: salary buckets
-    bins = [0, 50000, 100000, 150000, 200000, 500000]
-    labels = ["<50K", "50–100K", "100–150K", "150–200K", "200K+"]
-    df["salary_bucket"] = pd.cut(df["salary_usd"], bins=bins, labels=labels)
+    df["salary_bucket"] = pd.cut(df["salary_usd"], bins=SALARY_BINS, labels=SALARY_LABELS)
 
-    # ----------------------------
-    # 7️⃣ Save transformed dataset
-    # ----------------------------
-    df.to_csv(output_csv, index=False)
+    stats["rows_out"] = len(df)
+    return df, skills_table, stats
+
+
+def _append_csv(writers: dict, path, df: pd.DataFrame) -> None:
+    """Append ``df`` to ``path`` through a streaming Arrow CSV writer opened on first use."""
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    if path not in writers:
+        writers[path] = (pacsv.CSVWriter(path, table.schema), table.schema)
+    writer, schema = writers[path]
+    writer.write_table(table.cast(schema))
+
+
+def transform_job_trend_data(input_csv, output_csv, skills_csv=None, chunksize=250_000):
+    """
+    Transforms a raw job market trends dataset into a clean, analysis-ready form.
+    Keeps only relevant columns and standardizes text fields.
+
+    The input is processed in chunks of ``chunksize`` rows and appended to
+    ``output_csv``, so memory stays flat regardless of input size. A normalized
+    job_id × skill table is written to ``skills_csv`` (defaults to
+    ``<output>_skills.csv``). Returns row and dedupe statistics.
+    """
+    if skills_csv is None:
+        root, ext = os.path.splitext(output_csv)
+        skills_csv = f"{root}_skills{ext or '.csv'}"
+
+    header = pd.read_csv(input_csv, nrows=0).columns
+    usecols = [c for c in KEEP_COLS + OPTIONAL_COLS if c in header]
+    optional = [c for c in OPTIONAL_COLS if c in header]
+    totals = {
+        "rows_in": 0,
+        "rows_out": 0,
+        "rows_dropped_missing": 0,
+        "rows_dropped_salary": 0,
+        "duplicate_skills_removed": 0,
+        "skill_rows": 0,
+    }
+
+    # Arrow-backed strings run the str accessor in Arrow compute kernels instead of a
+    # per-row Python loop over object values.
+    reader = pd.read_csv(input_csv, usecols=usecols, chunksize=chunksize, dtype=pd.ArrowDtype(pa.string()))
+
+    # Fixed output types so every chunk matches the schema of the first one.
+    output_types = {"salary_usd": "float64", "salary_bucket": pd.ArrowDtype(pa.string())}
+    output_types.update({c: "float64" for c in ("remote_ratio", "years_experience") if c in optional})
+    output_types.update({c: pd.ArrowDtype(pa.string()) for c in ("posting_date", "company_location") if c in optional})
+
+    writers = {}
+    row_offset = 0
+    try:
+        for chunk in reader:
+            if "job_id" not in chunk.columns:
+                ids = pd.RangeIndex(row_offset, row_offset + len(chunk)).astype(str)
+                chunk.insert(0, "job_id", ids.astype(pd.ArrowDtype(pa.string())))
+            row_offset += len(chunk)
+
+            jobs, skills_table, stats = transform_job_trend_chunk(chunk)
+            _append_csv(writers, output_csv, jobs[KEEP_COLS + ["salary_bucket"] + optional].astype(output_types))
+            _append_csv(writers, skills_csv, skills_table)
+
+            for key, value in stats.items():
+                totals[key] += value
+    finally:
+        for writer, _ in writers.values():
+            writer.close()
+
+    totals["output_csv"] = output_csv
+    totals["skills_csv"] = skills_csv
 
     print(f"✅ Job trends data transformed and saved to: {output_csv}")
-    print(f"📊 Shape: {df.shape[0]} rows, {df.shape[1]} columns")
+    print(f"🧩 Normalized skills table saved to: {skills_csv}")
+    print(
+        f"📊 {totals['rows_out']} of {totals['rows_in']} rows kept, "
+        f"{totals['duplicate_skills_removed']} duplicate skills removed"
+    )
 
-    return output_csv
+    return totals
 
 
 # Example usage
@@ -95,5 +196,5 @@ if __name__ == "__main__":
     transform_job_trend_data(
         input_csv=r"E:\Apps\DS hackathon\data\ai_job_market_2024_2025.csv",
         output_csv=r"E:\Apps\DS hackathon\data\ai_job_market_2024_2025_transformed.csv"
-        
+
 )
@@ -1,37 +1,122 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def transform_feedback_data(input_csv, output_csv):
+# Likert scale for feedback ratings; code 0 marks a missing or unknown label
+RATING_LEVELS = ["Very Poor", "Poor", "Average", "Good", "Excellent"]
+MISSING_RATING = 0
+
+ID_COLUMNS = ["student_id", "course"]
+TEXT_COLUMN = "text_feedback"
+
+# Accept both labels and already-numeric codes (e.g. a previously transformed file)
+_LEVEL_CODES = {label.lower(): code for code, label in enumerate(RATING_LEVELS, start=1)}
+_LEVEL_CODES.update({str(code): code for code in _LEVEL_CODES.values()})
+
+
+def encode_ratings(df: pd.DataFrame, rating_columns: list[str]) -> tuple[np.ndarray, dict]:
     """
-    Transforms qualitative feedback (Very Poor → Excellent)
-    into numeric format, retains text feedback,
-    and saves as a clean new CSV.
+    Convert "Very Poor"…"Excellent" rating columns into an int8 code matrix (1–5).
+
+    Columns are handled as categoricals, so only the handful of distinct labels is
+    looked up in Python; the per-row work is a single integer take per column.
+    Unrecognized labels and out-of-range numeric codes become MISSING_RATING and
+    are returned as ``{column: {label: count}}``.
     """
-    df = pd.read_csv(input_csv)
+    codes = np.empty((len(df), len(rating_columns)), dtype=np.int8)
+    unknown = {}
+    for j, col in enumerate(rating_columns):
+        values = df[col]
+        if values.dtype.kind in "iuf":
+            numeric = values.fillna(MISSING_RATING).to_numpy()
+            valid = np.isin(numeric, np.arange(1, len(RATING_LEVELS) + 1))
+            codes[:, j] = np.where(valid, numeric, MISSING_RATING)
+            # Out-of-range codes (not blanks) are reported like unknown labels
+            bad_values, counts = np.unique(values.to_numpy()[~valid & values.notna().to_numpy()], return_counts=True)
+            if len(bad_values):
+                unknown[col] = {f"{value:g}": int(count) for value, count in zip(bad_values, counts)}
+            continue
+
+        cat = values.astype("category").cat
+        labels = cat.categories.astype(str)
+        lookup = np.array(
+            [_LEVEL_CODES.get(label.strip().lower().removesuffix(".0"), MISSING_RATING) for label in labels]
+            + [MISSING_RATING],
+            dtype=np.int8,
+        )
+        # NaN has category code -1, which indexes the trailing MISSING_RATING entry
+        codes[:, j] = lookup[cat.codes.to_numpy()]
+
+        bad = np.flatnonzero(lookup[:-1] == MISSING_RATING)
+        if len(bad):
+            counts = np.bincount(cat.codes.to_numpy()[cat.codes.to_numpy() >= 0], minlength=len(labels))
+            unknown[col] = {labels[i]: int(counts[i]) for i in bad if counts[i]}
+    return codes, unknown
 
-    # Define mapping for feedback ratings
-    rating_to_score = {
-        "Very Poor": 1,
-        "Poor": 2,
-        "Average": 3,
-        "Good": 4,
-        "Excellent": 5
-    }
 
-    # Columns to transform (ignore ID, course, and text feedback)
-    feedback_columns = [col for col in df.columns if col not in ["student_id", "course", "text_feedback"]]
+def transform_feedback_frame(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """Transform an in-memory feedback frame into int8 rating codes; returns (frame, unknown labels)."""
+    feedback_columns = [col for col in df.columns if col not in ID_COLUMNS + [TEXT_COLUMN]]
+    codes, unknown = encode_ratings(df, feedback_columns)
 
-    # Map ratings to numeric values directly (replace the text columns)
-    for col in feedback_columns:
-        df[col] = df[col].map(rating_to_score)
+    transformed = df[ID_COLUMNS].copy()
+    for j, col in enumerate(feedback_columns):
+        transformed[col] = codes[:, j]
+    transformed[TEXT_COLUMN] = df[TEXT_COLUMN]
+    return transformed, unknown
+
+
+def _merge_unknown(total: dict, chunk: dict) -> None:
+    for col, labels in chunk.items():
+        for label, count in labels.items():
+            total.setdefault(col, {})
+            total[col][label] = total[col].get(label, 0) + count
+
+
+def transform_feedback_data(input_csv, output_csv, chunksize=None):
+    """
+    Transforms qualitative feedback (Very Poor → Excellent)
+    into numeric format, retains text feedback,
+    and saves as a clean new CSV.
+
+    Ratings are stored as int8 codes (1–5, 0 for missing/unknown labels). Writing
+    to a ``.parquet`` path keeps that compact binary layout so ``analyze_feedback``
+    can load it without re-parsing CSV text. With ``chunksize`` the export is
+    streamed chunk by chunk. Returns the row count and unknown-label report.
+    """
+    to_parquet = str(output_csv).lower().endswith(".parquet")
+    # Categorical reads keep one copy of each label instead of an object per row
+    header = pd.read_csv(input_csv, nrows=0).columns
+    categorical = {col: "category" for col in header if col not in ("student_id", TEXT_COLUMN)}
+    reader = pd.read_csv(input_csv, chunksize=chunksize, dtype=categorical)
+    chunks = reader if chunksize else [reader]
 
-    # Keep numeric columns + identifying + text feedback column
-    transformed_df = df[["student_id", "course"] + feedback_columns + ["text_feedback"]]
+    rows = 0
+    unknown = {}
+    parquet_writer = None
+    try:
+        for i, chunk in enumerate(chunks):
+            transformed, chunk_unknown = transform_feedback_frame(chunk)
+            _merge_unknown(unknown, chunk_unknown)
+            rows += len(transformed)
 
-    # Save the numeric + text feedback file
-    transformed_df.to_csv(output_csv, index=False)
+            if to_parquet:
+                # Plain strings for the course so every chunk shares one schema
+                table = pa.Table.from_pandas(transformed.astype({"course": str}), preserve_index=False)
+                if parquet_writer is None:
+                    parquet_writer = pq.ParquetWriter(str(output_csv), table.schema)
+                parquet_writer.write_table(table)
+            else:
+                transformed.to_csv(output_csv, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
 
+    if unknown:
+        print(f"⚠️ Unknown rating labels (stored as {MISSING_RATING}): {unknown}")
     print(f"✅ Transformed feedback (numeric + text) saved to:\n{output_csv}")
-    return output_csv
+    return {"output_path": str(output_csv), "rows": rows, "unknown_labels": unknown}
 
 
 if __name__ == "__main__":
@@ -1,5 +1,11 @@
+import os
+import time
+
 from mcp import Client
 
+# Wall-clock budget of one pipeline run, shared by all agent calls
+PIPELINE_BUDGET_SECONDS = float(os.getenv("PIPELINE_BUDGET_SECONDS", 600))
+
 def run_pipeline(course_name):
     feedback_client = Client("http://localhost:9001")
     perf_client = Client("http://localhost:9002")
@@ -13,36 +19,42 @@ def run_pipeline(course_name):
     job_file = "data/job_trends/job_market_trends.csv"
     curriculum_pdf = f"data/curriculum/{course_name}.pdf"
     output_pdf = f"results/{course_name}_final_report.pdf"
+    deadline = time.time() + PIPELINE_BUDGET_SECONDS
 
     feedback_res = feedback_client.call("analyze_feedback", {
         "course_name": course_name,
         "file_path": feedback_file,
-        "output_path": f"results/{course_name}_feedback.csv"
+        "output_path": f"results/{course_name}_feedback.csv",
+        "deadline": deadline
     })
     performance_res = perf_client.call("evaluate_performance", {
         "course_name": course_name,
         "file_path": performance_file,
-        "output_path": f"results/{course_name}_performance.csv"
+        "output_path": f"results/{course_name}_performance.csv",
+        "deadline": deadline
     })
     trend_res = trend_client.call("analyze_job_trends", {
         "course_name": course_name,
         "file_path": job_file,
-        "output_path": f"results/{course_name}_trends.csv"
+        "output_path": f"results/{course_name}_trends.csv",
+        "deadline": deadline
     })
     rec_res = rec_client.call("recommend_curriculum_updates", {
         "course_name": course_name,
         "curriculum_path": curriculum_pdf,
-        "feedback_summary": feedback_res["summary"],
-        "performance_summary": performance_res["summary"],
-        "trend_summary": trend_res["summary"]
+        "feedback_summary": feedback_res.get("data") or feedback_res["summary"],
+        "performance_summary": performance_res.get("data") or performance_res["summary"],
+        "trend_summary": trend_res.get("data") or trend_res["summary"],
+        "deadline": deadline
     })
     report_res = report_client.call("generate_report", {
         "course_name": course_name,
-        "feedback_summary": feedback_res["summary"],
-        "performance_summary": performance_res["summary"],
-        "trend_summary": trend_res["summary"],
+        "feedback_summary": feedback_res.get("data") or feedback_res["summary"],
+        "performance_summary": performance_res.get("data") or performance_res["summary"],
+        "trend_summary": trend_res.get("data") or trend_res["summary"],
         "recommendations": rec_res["curriculum_recommendations"],
-        "output_pdf": output_pdf
+        "output_pdf": output_pdf,
+        "deadline": deadline
     })
 
     print(report_res)
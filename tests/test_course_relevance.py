@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from course_relevance import CourseRelevance  # noqa: E402
+from market_sketch import get_market_sketch  # noqa: E402
+from test_market_snapshot import postings, write_csv  # noqa: E402
+from test_program_store import HashEmbeddings  # noqa: E402
+
+
+def test_blank_course_matches_nothing():
+    relevance = CourseRelevance(HashEmbeddings(), threshold=2.0)
+    assert not relevance.match("  ", ["data scientist", "python"]).any()
+
+
+def test_sketch_vocabulary_is_matched(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 300))
+    sketch = get_market_sketch(source, tmp_path, workers=1)
+    # An unreachable threshold leaves only whole-name containment
+    relevance = CourseRelevance(HashEmbeddings(), threshold=2.0)
+
+    title_match = relevance.match("Data Scientist", sketch.titles)
+    skill_match = relevance.match("Data Scientist", sketch.skills)
+    assert [t for t, m in zip(sketch.titles, title_match) if m] == ["data scientist"]
+    assert not skill_match.any()
+    np.testing.assert_array_equal(sketch.match_weights(title_match, skill_match), [0.0, 1.0, 0.0])
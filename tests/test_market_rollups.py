@@ -0,0 +1,78 @@
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from market_rollups import MarketRollups, get_rollups  # noqa: E402
+from test_market_snapshot import postings, write_csv  # noqa: E402
+
+
+def counts_table(monthly: dict[str, list[int]], totals: list[int]) -> pd.DataFrame:
+    """Month rollup rows for 2024-01 onward: one "total" row and one skill row per value and month."""
+    rows = []
+    for month, total in enumerate(totals, start=1):
+        period = f"2024-{month:02d}-01"
+        if total:
+            rows.append({"period": period, "kind": "total", "value": "", "postings": total})
+        for value, series in monthly.items():
+            if series[month - 1]:
+                rows.append({"period": period, "kind": "skill", "value": value, "postings": series[month - 1]})
+    return pd.DataFrame(rows)
+
+
+def test_momentum_compares_window_shares():
+    rollups = MarketRollups(counts_table(
+        {"python": [10, 10, 20, 30], "sql": [20, 20, 10, 10], "rust": [0, 0, 5, 5]},
+        totals=[100, 100, 100, 100],
+    ))
+    momentum = rollups.momentum("skill", window=2, min_postings=0)
+
+    assert momentum.window == 2 and momentum.since == "2024-03-01"
+    table = momentum.table.set_index("value")
+    assert list(momentum.table["value"]) == ["rust", "python", "sql"]
+    assert math.isinf(table.loc["rust", "growth"])
+    assert table.loc["python", "growth"] == 0.25 / 0.10 - 1
+    assert table.loc["sql", "growth"] == 0.10 / 0.20 - 1
+    assert table.loc["python", "recent"] == 50 and table.loc["python", "previous"] == 20
+    assert [value for value, _ in momentum.rising()] == ["rust", "python"]
+
+
+def test_momentum_counts_empty_months_and_filters_rare_values():
+    # March has no postings at all; it still counts as a month of the window
+    rollups = MarketRollups(counts_table(
+        {"python": [10, 10, 0, 30], "go": [1, 0, 0, 1]},
+        totals=[100, 100, 0, 100],
+    ))
+    assert rollups.periods == ["2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01"]
+    momentum = rollups.momentum("skill", window=10, min_postings=5)
+
+    assert momentum.window == 2
+    assert list(momentum.table["value"]) == ["python"]
+    assert momentum.table.loc[0, "growth"] == (30 / 100) / (20 / 200) - 1
+
+
+def test_momentum_needs_two_periods():
+    rollups = MarketRollups(counts_table({"python": [10]}, totals=[100]))
+    assert rollups.momentum("skill", window=3, min_postings=0) is None
+
+
+def test_append_matches_full_rebuild(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 240))
+    get_rollups(source, root=tmp_path / "incremental")
+    write_csv(source, postings(240, 120), mode="a")
+
+    for granularity in ("month", "week"):
+        incremental = get_rollups(source, granularity, root=tmp_path / "incremental")
+        rebuilt = get_rollups(source, granularity, root=tmp_path / "rebuilt")
+        assert incremental.periods == rebuilt.periods
+        np.testing.assert_array_equal(incremental.totals, rebuilt.totals)
+        assert incremental.totals.sum() == 360
+        for kind in ("skill", "role"):
+            assert incremental.labels[kind] == rebuilt.labels[kind]
+            np.testing.assert_array_equal(incremental.counts[kind], rebuilt.counts[kind])
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from market_sketch import get_market_sketch  # noqa: E402
+from test_market_snapshot import postings, write_csv  # noqa: E402
+
+
+def test_append_matches_full_rebuild(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 200))
+    get_market_sketch(source, tmp_path / "incremental", workers=1)
+    write_csv(source, postings(200, 150), mode="a")
+
+    incremental = get_market_sketch(source, tmp_path / "incremental", workers=1)
+    rebuilt = get_market_sketch(source, tmp_path / "rebuilt", workers=1)
+    assert incremental.postings == rebuilt.postings == 350
+    for name, table in rebuilt.tables.items():
+        keys = [col for col in table.columns if col not in ("count", "postings", "salaried", "salary_sum",
+                                                            "salary_min", "salary_max")]
+        pd.testing.assert_frame_equal(incremental.tables[name].sort_values(keys).reset_index(drop=True),
+                                      table.sort_values(keys).reset_index(drop=True), check_dtype=False)
+
+
+def test_courses_are_filtered_at_query_time(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 300))
+    sketch = get_market_sketch(source, tmp_path, workers=1)
+    assert sketch.titles == ["data analyst", "data scientist", "ml engineer"]
+
+    # "tableau" is only listed by data analysts; "ml" only matches the ml engineer title
+    tableau = sketch.summarize(sketch.profile_weights(["tableau"]))
+    assert tableau.matched and tableau.postings == 100 and tableau.top_roles == ["data analyst"]
+    ml = sketch.summarize(sketch.profile_weights(["ml"]))
+    assert ml.top_roles == ["ml engineer"] and ml.top_skills == ["docker", "python", "pytorch"]
+
+    # Nothing matches: the whole market comes from the same sketch
+    everything = sketch.summarize(sketch.profile_weights(["astronomy"]))
+    assert not everything.matched and everything.postings == 300
+    assert everything.exp_dist == {"En": 33.3, "Mi": 33.3, "Se": 33.3}
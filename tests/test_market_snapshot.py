@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+
+from market_snapshot import PROFILE_KEYS, get_snapshot, refresh_snapshot  # noqa: E402
+
+HEADER = ["job_id", "job_title", "required_skills", "salary_usd", "experience_level", "industry",
+          "salary_bucket", "posting_date"]
+TITLES = ["data scientist", "ml engineer", "data analyst"]
+SKILLS = ["python, sql", "pytorch, python, docker", "sql, tableau"]
+
+
+def postings(start, count):
+    return [[f"AI{i:05d}", TITLES[i % 3], SKILLS[i % 3], 50000 + 1000 * (i % 40), ["En", "Mi", "Se"][i % 3],
+             ["Tech", "Finance"][i % 2], "50–100K", f"2024-{i % 12 + 1:02d}-15"] for i in range(start, start + count)]
+
+
+def write_csv(path, rows, mode="w"):
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        if mode == "w":
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def tables(path):
+    manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+    profiles = pd.read_parquet(path / manifest["profiles"])
+    skills = pd.read_parquet(path / manifest["profile_skills"])
+    return (manifest,
+            profiles.sort_values(PROFILE_KEYS).reset_index(drop=True),
+            skills.sort_values(PROFILE_KEYS + ["skill"]).reset_index(drop=True))
+
+
+def test_append_matches_full_rebuild(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 200))
+    refresh_snapshot(source, tmp_path / "incremental")
+    write_csv(source, postings(200, 150), mode="a")
+    manifest, profiles, skills = tables(refresh_snapshot(source, tmp_path / "incremental"))
+
+    rebuilt_manifest, rebuilt_profiles, rebuilt_skills = tables(refresh_snapshot(source, tmp_path / "rebuilt"))
+    assert manifest["rows_ingested"] == rebuilt_manifest["rows_ingested"] == 350
+    assert manifest["bytes_ingested"] == source.stat().st_size
+    pd.testing.assert_frame_equal(profiles, rebuilt_profiles, check_dtype=False)
+    pd.testing.assert_frame_equal(skills, rebuilt_skills, check_dtype=False)
+
+
+def test_unchanged_file_is_not_reingested(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 50))
+    path = refresh_snapshot(source, tmp_path)
+    stamp = (path / "manifest.json").stat().st_mtime_ns
+    refresh_snapshot(source, tmp_path)
+    assert (path / "manifest.json").stat().st_mtime_ns == stamp
+
+
+def test_same_size_rewrite_rebuilds(tmp_path):
+    source = tmp_path / "jobs.csv"
+    write_csv(source, postings(0, 100))
+    before = get_snapshot(source, tmp_path).summarize()
+
+    # Rewrite the last salary in place: same size, same head
+    data = source.read_bytes()
+    salary = data.rindex(b",89000,")
+    with open(source, "r+b") as f:
+        f.seek(salary)
+        f.write(b",99000,")
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert source.stat().st_size == len(data)
+
+    after = get_snapshot(source, tmp_path).summarize()
+    assert after.avg_salary == before.avg_salary + 10000 / 100
@@ -0,0 +1,60 @@
+import hashlib
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+
+from program_store import matching_rows, upsert_course  # noqa: E402
+from retrieval import faiss_documents  # noqa: E402
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic 16-dimensional vectors derived from the text."""
+
+    def embed_documents(self, texts):
+        return [np.frombuffer(hashlib.sha256(t.encode("utf-8")).digest()[:16], dtype=np.uint8)
+                .astype(np.float32).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def deck(name, pages):
+    return [Document(page_content=text, metadata={"source": f"/uploads/{name}", "page": i})
+            for i, text in enumerate(pages)]
+
+
+def course_texts(store, course):
+    documents = faiss_documents(store)
+    return {documents[row].page_content for row in matching_rows(documents, courses=course)}
+
+
+def test_reupsert_drops_replaced_page(tmp_path):
+    embeddings = HashEmbeddings()
+    upsert_course(tmp_path, "ML", deck("ml.pdf", ["intro to ml", "linear models", "old trees page"]), embeddings)
+    store = upsert_course(tmp_path, "ML", deck("ml_v2.pdf", ["intro to ml", "linear models", "new trees page"]),
+                          embeddings)
+
+    assert course_texts(store, "ML") == {"intro to ml", "linear models", "new trees page"}
+    # Left with no course, the old page is removed from the store entirely
+    assert "old trees page" not in {doc.page_content for doc in faiss_documents(store)}
+    assert store.index.ntotal == 3
+    intro = next(doc for doc in faiss_documents(store) if doc.page_content == "intro to ml")
+    assert intro.metadata["files"] == ["ml_v2.pdf"]
+
+
+def test_shared_page_keeps_other_course(tmp_path):
+    embeddings = HashEmbeddings()
+    upsert_course(tmp_path, "ML", deck("ml.pdf", ["python basics", "ml only"]), embeddings)
+    upsert_course(tmp_path, "Data", deck("data.pdf", ["python basics", "sql joins"]), embeddings)
+    store = upsert_course(tmp_path, "ML", deck("ml.pdf", ["ml only"]), embeddings)
+
+    assert course_texts(store, "ML") == {"ml only"}
+    assert course_texts(store, "Data") == {"python basics", "sql joins"}
+    shared = next(doc for doc in faiss_documents(store) if doc.page_content == "python basics")
+    assert shared.metadata["courses"] == ["Data"]
+    assert shared.metadata["files"] == ["data.pdf"]
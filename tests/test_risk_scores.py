@@ -0,0 +1,83 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src_code" / "agents"))
+
+from performance_mcp_server import query_at_risk_students  # noqa: E402
+from risk_scores import get_at_risk, score_records  # noqa: E402
+
+
+def records(course, semester, marks, attendance, start=0):
+    return pd.DataFrame({
+        "student_id": [f"S{start + i:03d}" for i in range(len(marks))],
+        "student_name": [f"Student_{start + i}" for i in range(len(marks))],
+        "course": course,
+        "marks_obtained": marks,
+        "total_marks": 100,
+        "grade": "B",
+        "grade_points": 3.0,
+        "attendance_percentage": attendance,
+        "semester": semester,
+    })
+
+
+def export(path, *frames):
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def test_scores_against_own_cohort():
+    # The same marks are average in one cohort and low in the other
+    df = pd.concat([
+        records("ML", "Spring 2024", [70, 72, 74, 76, 78, 80, 82, 84, 86, 30], [90] * 9 + [88]),
+        records("ML", "Fall 2024", [30, 31, 32, 33, 34], [90, 90, 90, 90, 50], start=10),
+    ], ignore_index=True)
+    scores = score_records(df).set_index("student_id")
+
+    assert scores.loc["S000", "cohort_size"] == 10 and scores.loc["S010", "cohort_size"] == 5
+    spring = df["marks_obtained"][:10]
+    assert np.isclose(scores.loc["S009", "z_percentage"], (30 - spring.mean()) / spring.std())
+    assert scores.loc["S009", ["iqr_outlier", "mad_outlier", "at_risk"]].all()
+    assert not scores.loc["S010", "at_risk"]
+    assert scores.loc["S014", "low_attendance"] and scores.loc["S014", "at_risk"]
+    assert not scores.loc[[f"S{i:03d}" for i in range(9)], "at_risk"].any()
+
+
+def test_blank_cohort_keys_are_a_cohort(tmp_path):
+    source = export(
+        tmp_path / "performance.csv",
+        records("ML", "Spring 2024", [70, 72, 74, 76, 78, 30], [90] * 6),
+        records("ML", None, [60, 65], [90, 40], start=6),
+        records(None, "Spring 2024", [55], [90], start=8),
+    )
+    manifest, at_risk = get_at_risk(source, tmp_path / "scores")
+
+    assert manifest["records"] == 9
+    assert sorted((c["course"], c["semester"], c["records"]) for c in manifest["cohorts"]) == [
+        ("ML", "Spring 2024", 6), ("ML", "nan", 2), ("nan", "Spring 2024", 1)]
+    assert {"S005", "S007"} <= set(at_risk["student_id"])
+
+
+def test_query_pages_through_at_risk_students(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = export(
+        tmp_path / "performance.csv",
+        records("ML", "Spring 2024", [80] * 20, [60 + i for i in range(5)] + [95] * 15),
+        records("Data", "Spring 2024", [80] * 10, [50, 55] + [95] * 8, start=20),
+    )
+
+    first = asyncio.run(query_at_risk_students(str(source), page=1, page_size=4))
+    second = asyncio.run(query_at_risk_students(str(source), page=2, page_size=4))
+    assert (first["total"], first["records"], first["pages"]) == (7, 30, 2)
+    assert len(first["students"]) == 4 and len(second["students"]) == 3
+    risks = [s["risk_score"] for s in first["students"] + second["students"]]
+    assert risks == sorted(risks, reverse=True)
+    assert len({s["student_id"] for s in first["students"] + second["students"]}) == 7
+
+    data = asyncio.run(query_at_risk_students(str(source), course="data", semester="spring 2024"))
+    assert data["total"] == 2 and {s["student_id"] for s in data["students"]} == {"S020", "S021"}
+    assert "error" in asyncio.run(query_at_risk_students(str(source), page=0))